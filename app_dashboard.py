@@ -1,54 +1,82 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 import os
+import new_lib as nl
 
 # --- CAMINHO RELATIVO (ROBUSTO) ---
-# O arquivo é esperado na subpasta 'dados' dentro da pasta de execução.
-CAMINHO_DO_ARQUIVO = 'dados/base_final_tratada_unica.csv'
+# Os arquivos são esperados na subpasta 'dados' dentro da pasta de execução.
+# A base Parquet (dados/base_final_parquet) é preferida; o CSV fica como alternativa.
+# `python main.py serve --destino PASTA` aponta para outra pasta via BACEN_PASTA_DADOS.
+PASTA_DADOS = os.environ.get('BACEN_PASTA_DADOS', 'dados')
+CAMINHO_DO_ARQUIVO = os.path.join(PASTA_DADOS, nl.ARQUIVO_CSV_FINAL)
 
 
 # --- Funções Auxiliares de Análise ---
 
 def formatar_valor(valor):
-    """Formata valor em USD com separador de milhar brasileiro."""
-    # A verificação garante que a formatação só seja tentada em números válidos
-    if pd.isna(valor):
-        return None
-    return f"US$ {valor:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.')
+    """Formata valor(es) em USD com separador de milhar brasileiro (número, Series ou DataFrame)."""
+    # NaN vira None: a formatação só é aplicada a números válidos
+    return nl.formatar_moeda_br(valor)
 
-def carregar_dados_e_analisar():
-    """Carrega o DataFrame e prepara a análise, exibindo o dashboard."""
-    st.set_page_config(layout="wide")
-    st.title("🏦 Relatório Final de Análise de Câmbio (BACEN)")
-    st.markdown("---")
-    
-    try:
-        # Tenta carregar usando o caminho RELATIVO.
-        df = pd.read_csv(CAMINHO_DO_ARQUIVO, sep=';', encoding='utf-8-sig')
-    except FileNotFoundError:
-        st.error("🚨 ERRO CRÍTICO: Arquivo não encontrado!")
-        st.warning(f"O Streamlit não encontrou o arquivo no caminho relativo:")
-        st.code(CAMINHO_DO_ARQUIVO)
-        st.markdown("Verifique se você está executando o comando **`streamlit run app_dashboard.py`** na pasta **raiz** do projeto e se a pasta `dados` existe e não está vazia.")
-        return
 
-    if df.empty:
-        st.warning("O DataFrame está vazio. Execute o main.py para preencher a base.")
-        return
+# --- Camada de Dados (cache compartilhado entre sessões) ---
+# O cubo é lido uma vez por assinatura dos arquivos (tamanho + mtime): quando o main.py
+# regrava os dados, a assinatura muda e o cache é refeito. Filtros e agregados de cada
+# seção também ficam em cache, valendo para todos os usuários conectados.
+
+@st.cache_resource(max_entries=1, show_spinner="Carregando o cubo de agregados...")
+def carregar_cubo(assinatura):
+    """Cubo da pasta de dados; `assinatura` (nl.assinatura_dados) é só a chave do cache."""
+    return nl.obter_cubo(PASTA_DADOS)
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def indice_temporal(assinatura):
+    """Somas acumuladas instituição x mês (nl.IndiceTemporal) para comparar períodos quaisquer."""
+    return nl.IndiceTemporal(carregar_cubo(assinatura))
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def cubo_filtrado(assinatura, anos, instituicoes):
+    """Cubo restrito aos filtros (anos=None e instituicoes=() devolvem o cubo completo)."""
+    return nl.filtrar_cubo(carregar_cubo(assinatura), anos=anos, instituicoes=list(instituicoes))
+
+def _valor_por_ano(cubo):
+    return cubo['ano'].set_index('Ano')['Total_Geral_Valor']
 
-    # Preparação dos dados para análise
-    df['Ano'] = df['Data_Ref'].str[:4]
-    
+def _top_5_instituicoes(cubo):
+    return cubo['instituicao'].set_index('Instituicao')['Total_Geral_Valor'].nlargest(5)
+
+def _importacao_exportacao(cubo):
+    return cubo['ano'].set_index('Ano')[['Importacao_Valor', 'Exportacao_Valor']]
+
+def _transferencias(cubo):
+    return cubo['ano'].set_index('Ano')[['Transf_Exterior_Valor', 'Transf_pExterior_Valor']]
+
+# Seção -> agregado que ela exibe. Só as seções selecionadas são calculadas.
+AGREGADOS_SECOES = {
+    '1. Valor total por ano': _valor_por_ano,
+    '2. Top 5 instituições': _top_5_instituicoes,
+    '3. Importação e Exportação por ano': _importacao_exportacao,
+    '6. Transferências por ano': _transferencias,
+    'Respostas Detalhadas': nl.responder_perguntas,
+}
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def agregado_da_secao(secao, assinatura, anos, instituicoes):
+    """Agregado de uma seção para os filtros dados, calculado na primeira vez que é exibido."""
+    return AGREGADOS_SECOES[secao](cubo_filtrado(assinatura, anos, instituicoes))
+
+
+# --- Seções do Dashboard ---
+
+def exibir_valor_por_ano(serie):
     # ----------------------------------------------------
     # PERGUNTA 1: Valor total de operações de câmbio por ano
     # ----------------------------------------------------
     st.header("1. Valor total de operações de câmbio por ano")
-    valor_por_ano = df.groupby('Ano')['Total_Geral_Valor'].sum().reset_index()
-    
-    # CORREÇÃO APLICADA: Aplicamos o apply diretamente na coluna Series e convertemos de volta para DataFrame
-    df_formatado_p1 = valor_por_ano.set_index('Ano')['Total_Geral_Valor'].apply(formatar_valor).to_frame()
-    
+    valor_por_ano = serie.reset_index()
+
+    df_formatado_p1 = formatar_valor(serie).to_frame()
+
     # Gráfico Plotly
     fig1 = px.bar(
         valor_por_ano,
@@ -63,15 +91,16 @@ def carregar_dados_e_analisar():
     st.dataframe(df_formatado_p1, use_container_width=True) # Usando DF formatado
     st.markdown("---")
 
+def exibir_top_5(serie):
     # ----------------------------------------------------
     # PERGUNTA 2: Top 5 Instituições com maior valor total de operações
     # ----------------------------------------------------
     st.header("2. Top 5 Instituições (Valor Total de Operações)")
-    top_5_inst = df.groupby('Instituicao')['Total_Geral_Valor'].sum().nlargest(5).reset_index()
-    
+    top_5_inst = serie.reset_index()
+
     # CORREÇÃO APLICADA
-    df_formatado_p2 = top_5_inst.set_index('Instituicao')['Total_Geral_Valor'].apply(formatar_valor).to_frame()
-    
+    df_formatado_p2 = formatar_valor(serie).to_frame()
+
     fig2 = px.pie(
         top_5_inst,
         values='Total_Geral_Valor',
@@ -82,18 +111,18 @@ def carregar_dados_e_analisar():
     st.dataframe(df_formatado_p2, use_container_width=True) # Usando DF formatado
     st.markdown("---")
 
+def exibir_importacao_exportacao(tabela):
     # ----------------------------------------------------
     # PERGUNTA 3: Valor total de Importação e Exportação por ano
     # ----------------------------------------------------
     st.header("3. Valor total de Importação e Exportação por ano")
-    df_impexp = df.groupby('Ano')[['Importacao_Valor', 'Exportacao_Valor']].sum().reset_index()
-    
-    # CORREÇÃO APLICADA: Aplicamos apply com lambda para formatar múltiplas colunas (cell-wise)
-    df_formatado_p3 = df_impexp.set_index('Ano').apply(lambda s: s.apply(formatar_valor))
-    
+    df_impexp = tabela.reset_index()
+
+    df_formatado_p3 = formatar_valor(tabela)
+
     df_plot = df_impexp.melt(id_vars='Ano', value_vars=['Importacao_Valor', 'Exportacao_Valor'],
                              var_name='Tipo', value_name='Valor')
-                             
+
     fig3 = px.line(
         df_plot,
         x='Ano',
@@ -105,15 +134,16 @@ def carregar_dados_e_analisar():
     st.plotly_chart(fig3, use_container_width=True)
     st.dataframe(df_formatado_p3, use_container_width=True) # Usando DF formatado
     st.markdown("---")
-    
+
+def exibir_transferencias(tabela):
     # ----------------------------------------------------
     # PERGUNTA 6: Valor total de Transferências
     # ----------------------------------------------------
     st.header("6. Valor total de Transferências (Entrada/Saída) por ano")
-    df_transf = df.groupby('Ano')[['Transf_Exterior_Valor', 'Transf_pExterior_Valor']].sum().reset_index()
+    df_transf = tabela.reset_index()
 
     # CORREÇÃO APLICADA
-    df_formatado_p6 = df_transf.set_index('Ano').apply(lambda s: s.apply(formatar_valor))
+    df_formatado_p6 = formatar_valor(tabela)
 
     df_plot_transf = df_transf.melt(id_vars='Ano', value_vars=['Transf_Exterior_Valor', 'Transf_pExterior_Valor'],
                              var_name='Tipo', value_name='Valor')
@@ -131,57 +161,148 @@ def carregar_dados_e_analisar():
     st.dataframe(df_formatado_p6, use_container_width=True)
     st.markdown("---")
 
-
+def exibir_respostas_detalhadas(resultado):
     # ----------------------------------------------------
     # PERGUNTAS DE TEXTO (Adaptadas)
     # ----------------------------------------------------
-    
+
     st.header("Respostas Detalhadas")
 
     # 4. Qual a Instituição com maior valor de Exportação no último ano completo?
-    ultimo_ano_base = df['Ano'].max()
-    if df[df['Ano'] == ultimo_ano_base]['Data_Ref'].nunique() < 12:
-         penultimo_ano = str(int(ultimo_ano_base) - 1)
+    penultimo_ano = resultado.ano_exportacao
+    top_exp_penultimo = resultado.maior_exportacao
+    if not top_exp_penultimo.empty:
+        st.markdown(f"**4. Instituição com maior Exportação em {penultimo_ano}:**")
+        st.success(f"{top_exp_penultimo.index[0]} | Valor: {formatar_valor(top_exp_penultimo.iloc[0])}")
     else:
-         penultimo_ano = ultimo_ano_base
-    df_penultimo = df[df['Ano'] == penultimo_ano]
-    top_exp_penultimo = df_penultimo.groupby('Instituicao')['Exportacao_Valor'].sum().nlargest(1)
-    st.markdown(f"**4. Instituição com maior Exportação em {penultimo_ano}:**")
-    st.success(f"{top_exp_penultimo.index[0]} | Valor: {formatar_valor(top_exp_penultimo.iloc[0])}")
+        st.warning(f"4. Não há dados para {penultimo_ano}.")
 
     # 5. Qual a Instituição com maior valor de Importação no ano de 2018?
-    df_2018 = df[df['Ano'] == '2018']
-    if not df_2018.empty:
-        top_imp_2018 = df_2018.groupby('Instituicao')['Importacao_Valor'].sum().nlargest(1)
+    top_imp_2018 = resultado.maior_importacao_2018
+    if not top_imp_2018.empty:
         st.markdown("**5. Instituição com maior Importação em 2018:**")
         st.success(f"{top_imp_2018.index[0]} | Valor: {formatar_valor(top_imp_2018.iloc[0])}")
     else:
         st.warning("5. Não há dados para 2018.")
 
     # 7. Qual o maior volume de Transações (Quantidade) de Exportação em 2020 (mês/instituição)?
-    df_2020 = df[df['Ano'] == '2020']
-    if not df_2020.empty:
-        idx_max = df_2020['Exportacao_Quant'].idxmax()
-        resultado = df_2020.loc[idx_max, ['Data_Ref', 'Instituicao', 'Exportacao_Quant']]
-        quant_formatada = f"{resultado['Exportacao_Quant']:,.0f}".replace(',', '_').replace('.', ',').replace('_', '.')
+    maior_quant = resultado.maior_quant_exportacao_2020
+    if maior_quant is not None:
+        quant_formatada = nl.formatar_moeda_br(maior_quant['Exportacao_Quant'], prefixo='', casas=0)
         st.markdown("**7. Maior volume (Quantidade) de Exportação em 2020 (Mês/Instituição):**")
-        st.info(f"Mês/Ano: {resultado['Data_Ref']} | Instituição: {resultado['Instituicao']} | Quantidade: {quant_formatada}")
+        st.info(f"Mês/Ano: {maior_quant['Data_Ref']} | Instituição: {maior_quant['Instituicao']} | Quantidade: {quant_formatada}")
     else:
         st.warning("7. Não há dados para 2020.")
 
     # 8. Qual a média de valor de operações de câmbio por instituição ao longo de todo o período?
     st.markdown("**8. Média de valor de operações de câmbio por instituição (Top 5):**")
-    media_por_inst = df.groupby('Instituicao')['Total_Geral_Valor'].mean().sort_values(ascending=False)
-    
+    media_por_inst = resultado.media_por_instituicao
+
     # CORREÇÃO APLICADA
-    st.dataframe(media_por_inst.nlargest(5).apply(formatar_valor).to_frame(), use_container_width=True)
+    st.dataframe(formatar_valor(media_por_inst.head(5)).to_frame(), use_container_width=True)
     st.markdown("...")
 
 
     # 9. Qual o total de operações (Valor) do Mercado Primário de Câmbio em todo o período?
-    total_primario = df['Mercado_Primario_Valor'].sum()
+    total_primario = resultado.total_mercado_primario
     st.markdown("**9. Valor Total de Operações do Mercado Primário de Câmbio (Período Completo):**")
     st.success(f"Valor Total: {formatar_valor(total_primario)}")
 
+def exibir_comparacao_periodos(indice, anos, instituicoes):
+    # ----------------------------------------------------
+    # COMPARAÇÃO DE PERÍODOS (consulta livre sobre o índice temporal)
+    # ----------------------------------------------------
+    st.header("Comparação de Períodos")
+    meses = [m for m in indice.meses if anos is None or anos[0] <= int(m[:4]) <= anos[1]]
+    if len(meses) < 2:
+        st.warning("São necessários ao menos dois meses para comparar períodos.")
+        return
+
+    coluna = st.selectbox("Métrica", [c for c in indice.metricas if c.endswith('_Valor')],
+                          index=[c for c in indice.metricas if c.endswith('_Valor')].index('Total_Geral_Valor'))
+    meio = len(meses) // 2
+    col_a, col_b = st.columns(2)
+    periodo_a = col_a.select_slider("Período A", options=meses, value=(meses[0], meses[meio - 1]))
+    periodo_b = col_b.select_slider("Período B", options=meses, value=(meses[meio], meses[-1]))
+
+    # Cada período é uma subtração de colunas das somas acumuladas: não há releitura de linhas.
+    comparacao = indice.comparar_periodos(coluna, periodo_a, periodo_b, instituicoes=instituicoes or None).head(10)
+    df_plot = comparacao.reset_index().melt(id_vars='Instituicao', value_vars=['Periodo_A', 'Periodo_B'],
+                                            var_name='Período', value_name='Valor')
+    fig = px.bar(
+        df_plot,
+        x='Instituicao',
+        y='Valor',
+        color='Período',
+        title=f'{coluna}: {periodo_a[0]} a {periodo_a[1]} vs. {periodo_b[0]} a {periodo_b[1]} (Top 10 do Período B)',
+        barmode='group',
+        labels={'Valor': 'Valor (US$)', 'Instituicao': 'Instituição'}
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    tabela = formatar_valor(comparacao[['Periodo_A', 'Periodo_B', 'Variacao']])
+    tabela['Variacao_%'] = comparacao['Variacao_%'].round(1)
+    st.dataframe(tabela, use_container_width=True)
+    st.markdown("---")
+
+SECAO_COMPARACAO = 'Comparação de períodos'
+
+EXIBICAO_SECOES = {
+    '1. Valor total por ano': exibir_valor_por_ano,
+    '2. Top 5 instituições': exibir_top_5,
+    '3. Importação e Exportação por ano': exibir_importacao_exportacao,
+    '6. Transferências por ano': exibir_transferencias,
+    'Respostas Detalhadas': exibir_respostas_detalhadas,
+    SECAO_COMPARACAO: exibir_comparacao_periodos,
+}
+
+
+def carregar_dados_e_analisar():
+    """Carrega o DataFrame e prepara a análise, exibindo o dashboard."""
+    st.set_page_config(layout="wide")
+    st.title("🏦 Relatório Final de Análise de Câmbio (BACEN)")
+    st.markdown("---")
+
+    try:
+        # Tenta carregar usando o caminho RELATIVO: o cubo de agregados gravado pelo main.py
+        # ou, na falta dele, só as colunas da base final usadas no relatório (em cache até a
+        # próxima gravação dos arquivos).
+        assinatura = nl.assinatura_dados(PASTA_DADOS)
+        cubo = carregar_cubo(assinatura)
+    except FileNotFoundError:
+        st.error("🚨 ERRO CRÍTICO: Arquivo não encontrado!")
+        st.warning(f"O Streamlit não encontrou o arquivo no caminho relativo:")
+        st.code(CAMINHO_DO_ARQUIVO)
+        st.markdown("Verifique se você está executando o comando **`streamlit run app_dashboard.py`** na pasta **raiz** do projeto e se a pasta `dados` existe e não está vazia.")
+        return
+
+    if cubo is None:
+        st.warning("O DataFrame está vazio. Execute o main.py para preencher a base.")
+        return
+
+    # --- Filtros: aplicados sobre o cubo em cache, sem reler a base ---
+    st.sidebar.header("Filtros")
+    anos_disponiveis = sorted(int(a) for a in cubo['ano']['Ano'])
+    anos = None
+    if len(anos_disponiveis) > 1:
+        intervalo = st.sidebar.slider("Anos", anos_disponiveis[0], anos_disponiveis[-1],
+                                      (anos_disponiveis[0], anos_disponiveis[-1]))
+        if intervalo != (anos_disponiveis[0], anos_disponiveis[-1]):
+            anos = intervalo
+    instituicoes = tuple(sorted(st.sidebar.multiselect(
+        "Instituições (vazio = todas)", cubo['instituicao']['Instituicao'].tolist())))
+    secoes = st.sidebar.multiselect("Seções exibidas", list(EXIBICAO_SECOES), default=list(EXIBICAO_SECOES))
+
+    if cubo_filtrado(assinatura, anos, instituicoes)['mes_instituicao'].empty:
+        st.warning("Nenhum dado para os filtros selecionados.")
+        return
+
+    # Todas as respostas saem do cubo (tabelas pequenas), sem varrer as linhas da base;
+    # cada seção só é agregada quando está selecionada.
+    for secao in secoes:
+        if secao == SECAO_COMPARACAO:
+            exibir_comparacao_periodos(indice_temporal(assinatura), anos, instituicoes)
+        else:
+            EXIBICAO_SECOES[secao](agregado_da_secao(secao, assinatura, anos, instituicoes))
+
 # Chama a função principal
-carregar_dados_e_analisar()
\ No newline at end of file
+carregar_dados_e_analisar()
@@ -0,0 +1,85 @@
+"""
+Benchmark do caminho anual: as perguntas por ano (1, 3 e 6) respondidas pela base
+mensal (unificar_bases + tratar_dados + construir_cubo, todos os meses) e só pelo
+acumulado mais recente de cada ano (ler_acumulados_anuais), sobre um corpus
+sintético (gerador_corpus.py). Confere as respostas com conferir_acumulados.
+
+Uso:
+    python benchmarks/bench_acumulados.py [--meses 120] [--instituicoes 150] [--zip]
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import numpy as np
+
+import new_lib as nl
+from gerador_corpus import empacotar_em_zips, gerar_corpus
+
+
+def cronometrar(funcao):
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        inicio = time.perf_counter()
+        resultado = funcao()
+    return resultado, time.perf_counter() - inicio
+
+
+def caminho_mensal(pasta):
+    cubo = nl.construir_cubo(nl.tratar_dados(nl.unificar_bases(pasta), verboso=False))
+    return nl.responder_perguntas_anuais(cubo['ano']), cubo
+
+
+def caminho_anual(pasta):
+    df, meses = nl.ler_acumulados_anuais(pasta)
+    tabela = nl.tabela_anual_acumulada(df, meses)
+    return nl.responder_perguntas_anuais(tabela), tabela
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--meses', type=int, default=120)
+    parser.add_argument('--instituicoes', type=int, default=150)
+    parser.add_argument('--zip', action='store_true', help='Lê os arquivos de dentro dos ZIPs armazenados (modo ZIP).')
+    args = parser.parse_args()
+
+    temporaria = tempfile.mkdtemp(prefix='bench_acumulados_')
+    try:
+        pasta = os.path.join(temporaria, 'zipfiles')
+        gerar_corpus(pasta, meses=args.meses, instituicoes=args.instituicoes, xlsx=False)
+        if args.zip:
+            pasta_zips = os.path.join(temporaria, 'zips')
+            empacotar_em_zips(pasta, pasta_zips)
+            pasta = pasta_zips
+
+        (mensal, cubo), t_mensal = cronometrar(lambda: caminho_mensal(pasta))
+        (anual, tabela), t_anual = cronometrar(lambda: caminho_anual(pasta))
+        n_mensal, n_anual = len(nl.listar_arquivos_mensais(pasta)), len(nl.listar_acumulados_anuais(pasta))
+
+        print(f"{'Caminho':<36}{'Arquivos':>10}{'Tempo (s)':>12}")
+        print(f"{'base mensal (todos os meses)':<36}{n_mensal:>10}{t_mensal:>12.3f}")
+        print(f"{'acumulados (um por ano)':<36}{n_anual:>10}{t_anual:>12.3f}")
+        print(f'\nGanho: {t_mensal / t_anual:.1f}x com {n_mensal / n_anual:.0f}x menos arquivos')
+
+        for campo in ('valor_por_ano', 'importacao_exportacao_por_ano', 'transferencias_por_ano'):
+            esperado, obtido = getattr(mensal, campo), getattr(anual, campo)
+            assert list(esperado.index) == list(obtido.index), f'{campo}: anos divergentes'
+            assert np.allclose(esperado.to_numpy(), obtido.to_numpy(), rtol=1e-9), f'{campo}: totais divergentes'
+        conferencia = nl.conferir_acumulados(tabela, cubo)
+        print(f"Conferência: {(conferencia['Situacao'] == 'confere').sum()}/{len(conferencia)} anos conferem; "
+              f"respostas 1, 3 e 6 idênticas nos dois caminhos.")
+    finally:
+        shutil.rmtree(temporaria, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
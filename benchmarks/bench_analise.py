@@ -0,0 +1,120 @@
+"""
+Benchmark da fase de análise sobre uma base sintética N vezes maior que a atual
+(padrão 100x): a análise antiga (Ano por fatiamento de string, um groupby por
+pergunta e formatação com apply + três str.replace) contra construir_cubo +
+responder_perguntas + formatar_moeda_br só nas linhas exibidas. Confere que as
+respostas numéricas coincidem.
+
+A base sintética repete a base tratada deslocando os anos (cada cópia ocupa um
+bloco de anos próprio), então o histórico cresce e as instituições se repetem.
+
+Uso:
+    python benchmarks/bench_analise.py [--base dados/base_final_tratada_unica.csv] [--fator 100]
+"""
+import argparse
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import numpy as np
+import pandas as pd
+import new_lib as nl
+
+
+def formatar_legado(serie):
+    return serie.apply(lambda x: f"US$ {x:,.2f}").str.replace(',', '_').str.replace('.', ',').str.replace('_', '.')
+
+
+def analise_legada(df):
+    """As 9 perguntas como eram calculadas em analisar_dados, sem os prints."""
+    df = df.copy()
+    df['Ano'] = df['Data_Ref'].str[:4]
+    r = {}
+    r[1] = formatar_legado(df.groupby('Ano')['Total_Geral_Valor'].sum())
+    r[2] = formatar_legado(df.groupby('Instituicao')['Total_Geral_Valor'].sum().nlargest(5))
+    impexp = df.groupby('Ano')[['Importacao_Valor', 'Exportacao_Valor']].sum()
+    r[3] = impexp.apply(formatar_legado)
+    ultimo = df['Ano'].max()
+    ano_exp = str(int(ultimo) - 1) if df[df['Ano'] == ultimo]['Data_Ref'].nunique() < 12 else ultimo
+    r[4] = df[df['Ano'] == ano_exp].groupby('Instituicao')['Exportacao_Valor'].sum().nlargest(1)
+    r[5] = df[df['Ano'] == '2018'].groupby('Instituicao')['Importacao_Valor'].sum().nlargest(1)
+    r[6] = df.groupby('Ano')[['Transf_Exterior_Valor', 'Transf_pExterior_Valor']].sum().apply(formatar_legado)
+    df_2020 = df[df['Ano'] == '2020']
+    r[7] = df_2020.loc[df_2020['Exportacao_Quant'].idxmax(), ['Data_Ref', 'Instituicao', 'Exportacao_Quant']]
+    r[8] = formatar_legado(df.groupby('Instituicao')['Total_Geral_Valor'].mean().sort_values(ascending=False)).head(5)
+    r[9] = df['Mercado_Primario_Valor'].sum()
+    return r
+
+
+def analise_nova(df):
+    resultado = nl.responder_perguntas(nl.construir_cubo(df))
+    exibidos = [
+        nl.formatar_moeda_br(resultado.valor_por_ano),
+        nl.formatar_moeda_br(resultado.top_5_instituicoes),
+        nl.formatar_moeda_br(resultado.importacao_exportacao_por_ano),
+        nl.formatar_moeda_br(resultado.transferencias_por_ano),
+        nl.formatar_moeda_br(resultado.media_por_instituicao.head(5)),
+    ]
+    return resultado, exibidos
+
+
+def base_sintetica(df, fator):
+    anos = df['Data_Ref'].str[:4].astype(int)
+    bloco = anos.max() - anos.min() + 1
+    copias = []
+    for k in range(fator):
+        copia = df.copy()
+        copia['Data_Ref'] = (anos + k * bloco).astype(str) + df['Data_Ref'].str[4:]
+        copias.append(copia)
+    return pd.concat(copias, ignore_index=True)
+
+
+def cronometrar(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base', default=os.path.join(RAIZ, 'dados', nl.ARQUIVO_CSV_FINAL))
+    parser.add_argument('--fator', type=int, default=100)
+    args = parser.parse_args()
+
+    base = pd.read_csv(args.base, sep=';', encoding='utf-8-sig', usecols=nl.COLUNAS_ANALISE)
+    df = base_sintetica(base, args.fator)
+    print(f'Base sintética: {len(df)} linhas ({args.fator}x {len(base)})\n')
+
+    legado, t_legado = cronometrar(analise_legada, df)
+    cubo, t_cubo = cronometrar(nl.construir_cubo, df)
+    resultado, t_respostas = cronometrar(nl.responder_perguntas, cubo)
+    (_, _), t_novo = cronometrar(analise_nova, df)
+
+    assert np.allclose(legado[4].to_numpy(), resultado.maior_exportacao.to_numpy())
+    assert legado[4].index.equals(resultado.maior_exportacao.index)
+    assert legado[5].index.equals(resultado.maior_importacao_2018.index)
+    assert legado[7]['Instituicao'] == resultado.maior_quant_exportacao_2020['Instituicao']
+    assert np.isclose(legado[9], resultado.total_mercado_primario)
+    assert legado[1].equals(nl.formatar_moeda_br(resultado.valor_por_ano).astype(str))
+    assert legado[8].equals(nl.formatar_moeda_br(resultado.media_por_instituicao.head(5)).astype(str))
+
+    amostra = df['Total_Geral_Valor'].dropna()
+    _, t_fmt_legado = cronometrar(formatar_legado, amostra)
+    _, t_fmt_novo = cronometrar(nl.formatar_moeda_br, amostra)
+
+    print(f"{'Etapa':<48}{'Tempo (s)':>10}")
+    print(f"{'análise antiga (9 groupbys + apply/replace)':<48}{t_legado:>10.3f}")
+    print(f"{'análise nova (cubo + respostas + formatação)':<48}{t_novo:>10.3f}")
+    print(f"{'  construir_cubo':<48}{t_cubo:>10.3f}")
+    print(f"{'  responder_perguntas (cubo pronto)':<48}{t_respostas:>10.4f}")
+    print(f"\nFormatação de {len(amostra)} valores:")
+    print(f"{'  apply + 3 str.replace':<48}{t_fmt_legado:>10.3f}")
+    print(f"{'  formatar_moeda_br':<48}{t_fmt_novo:>10.3f}")
+    print(f'\nRespostas coincidem | análise {t_legado / t_novo:.1f}x mais rápida')
+
+
+if __name__ == '__main__':
+    main()
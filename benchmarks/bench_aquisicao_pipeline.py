@@ -0,0 +1,102 @@
+"""
+Benchmark da aquisição em pipeline: download (servidor HTTP local com latência)
+seguido da consolidação, em sequência, contra adquirir_em_pipeline, que trata
+cada mês enquanto os seguintes ainda estão baixando.
+
+Nos dois modos a base final vem de consolidar_incremental e é conferida; no
+pipeline ela encontra as partições prontas e só remonta a base.
+
+Uso:
+    python benchmarks/bench_aquisicao_pipeline.py [--meses 48] [--latencia 0.03] [--fila 4] [--workers 1] [--processos] [--zip]
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import pandas as pd
+
+import new_lib as nl
+from gerador_corpus import empacotar_em_zips, gerar_corpus
+from servidor_local import iniciar_servidor
+
+
+def cronometrar(funcao):
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        inicio = time.perf_counter()
+        resultado = funcao()
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--meses', type=int, default=48)
+    parser.add_argument('--instituicoes', type=int, default=1500, help='Instituições por mês (arquivos maiores, tratamento mais pesado).')
+    parser.add_argument('--latencia', type=float, default=0.03, help='Latência artificial por requisição (s).')
+    parser.add_argument('--fila', type=int, default=4, help='Tamanho da fila entre download e tratamento.')
+    parser.add_argument('--workers', type=int, default=1, help='Threads de tratamento no pipeline.')
+    parser.add_argument('--processos', action='store_true', help='Tratamento em processos (sem disputar o GIL com o download).')
+    parser.add_argument('--zip', action='store_true', help='Modo ZIP (manter_zip=True) em vez de extrair.')
+    args = parser.parse_args()
+
+    temporaria = tempfile.mkdtemp(prefix='bench_aquisicao_')
+    try:
+        corpus = os.path.join(temporaria, 'corpus')
+        gerar_corpus(corpus, meses=args.meses, instituicoes=args.instituicoes, xlsx=False)
+        publicados = os.path.join(temporaria, 'publicados')
+        empacotar_em_zips(corpus, publicados)
+
+        arquivos, tarefas = {}, []
+        for nome_zip in sorted(os.listdir(publicados)):
+            ano, mes = map(int, nl.PADRAO_ZIP_ARMAZENADO.match(nome_zip).groups())
+            with open(os.path.join(publicados, nome_zip), 'rb') as f:
+                arquivos[nl.gerar_padroes_url(ano, mes)[0]] = f.read()
+        servidor, base_url = iniciar_servidor(arquivos, latencia=args.latencia)
+        tarefas = [(base_url + nome, int(nome[11:15]), int(nome[15:17]), False) for nome in arquivos]
+
+        def pastas(modo):
+            destino = os.path.join(temporaria, modo, 'zipfiles')
+            os.makedirs(destino)
+            return destino, os.path.join(temporaria, modo, 'cache_consolidacao')
+
+        destino, cache = pastas('sequencial')
+        sessao = nl.criar_sessao()
+        t_download, _ = cronometrar(lambda: [nl.baixar_e_extrair_zip(url, destino, ano, mes, sessao=sessao, manter_zip=args.zip)
+                                             for url, ano, mes, _ in tarefas])
+        t_consolidar, base_sequencial = cronometrar(lambda: nl.consolidar_incremental(destino, cache))
+
+        destino, cache = pastas('pipeline')
+        t_pipeline, _ = cronometrar(lambda: nl.adquirir_em_pipeline(tarefas, destino, cache, sessao=nl.criar_sessao(),
+                                                                     tamanho_fila=args.fila, workers=args.workers, processos=args.processos,
+                                                                     manter_zip=args.zip))
+        t_remontar, base_pipeline = cronometrar(lambda: nl.consolidar_incremental(destino, cache))
+        servidor.shutdown()
+
+        pd.testing.assert_frame_equal(base_sequencial, base_pipeline)
+
+        sequencial = t_download + t_consolidar
+        pipeline = t_pipeline + t_remontar
+        print(f'{len(tarefas)} meses | latência {args.latencia * 1000:.0f} ms | fila {args.fila} | {args.workers} worker(s)\n')
+        print(f"{'Etapa':<36}{'Tempo (s)':>11}")
+        print(f"{'download':<36}{t_download:>11.2f}")
+        print(f"{'consolidar_incremental (frio)':<36}{t_consolidar:>11.2f}")
+        print(f"{'SEQUENCIAL (soma)':<36}{sequencial:>11.2f}")
+        print(f"{'adquirir_em_pipeline':<36}{t_pipeline:>11.2f}")
+        print(f"{'consolidar_incremental (remontagem)':<36}{t_remontar:>11.2f}")
+        print(f"{'PIPELINE':<36}{pipeline:>11.2f}")
+        print(f'\nmax(download, consolidar) = {max(t_download, t_consolidar):.2f} s | ganho: {sequencial / pipeline:.2f}x | bases idênticas.')
+    finally:
+        shutil.rmtree(temporaria, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
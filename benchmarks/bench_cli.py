@@ -0,0 +1,87 @@
+"""
+Benchmark da CLI (main.py) sobre um corpus sintético servido por um servidor HTTP local
+(gerador_corpus.py + servidor_local.py): tempo de cada subcomando em um processo novo,
+primeiro sem checkpoints (a etapa roda) e depois com eles (entradas inalteradas, etapa
+pulada), além do custo de só importar main.py e new_lib. Confere que o analyze pulado
+imprime o mesmo relatório da execução completa.
+
+Uso:
+    python benchmarks/bench_cli.py [--meses 48] [--instituicoes 150]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import new_lib as nl
+from gerador_corpus import empacotar_em_zips, gerar_corpus
+from servidor_local import iniciar_servidor
+
+ETAPAS = ('discover', 'download', 'unify', 'clean', 'analyze')
+
+
+def rodar(argumentos, ambiente):
+    """(segundos, saída) de um processo Python novo na raiz do projeto."""
+    inicio = time.perf_counter()
+    processo = subprocess.run([sys.executable, *argumentos], cwd=RAIZ, env=ambiente, capture_output=True,
+                              text=True, encoding='utf-8')
+    decorrido = time.perf_counter() - inicio
+    if processo.returncode != 0:
+        raise RuntimeError(f'{argumentos} falhou:\n{processo.stdout[-2000:]}\n{processo.stderr[-2000:]}')
+    return decorrido, processo.stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--meses', type=int, default=48)
+    parser.add_argument('--instituicoes', type=int, default=150)
+    args = parser.parse_args()
+
+    temporaria = tempfile.mkdtemp(prefix='bench_cli_')
+    try:
+        corpus = os.path.join(temporaria, 'corpus')
+        gerar_corpus(corpus, meses=args.meses, instituicoes=args.instituicoes, xlsx=False)
+        publicados = os.path.join(temporaria, 'publicados')
+        empacotar_em_zips(corpus, publicados)
+        arquivos = {}
+        for nome_zip in sorted(os.listdir(publicados)):
+            ano, mes = map(int, nl.PADRAO_ZIP_ARMAZENADO.match(nome_zip).groups())
+            with open(os.path.join(publicados, nome_zip), 'rb') as f:
+                arquivos[nl.gerar_padroes_url(ano, mes)[0]] = f.read()
+        servidor, base_url = iniciar_servidor(arquivos, latencia=0.0)
+
+        destino = os.path.join(temporaria, 'dados')
+        ambiente = dict(os.environ, BACEN_BASE_URL=base_url, PYTHONIOENCODING='utf-8')
+        t_import_main, _ = rodar(['-c', 'import main'], ambiente)
+        t_import_nl, _ = rodar(['-c', 'import new_lib'], ambiente)
+
+        frio, quente = {}, {}
+        for etapa in ETAPAS:
+            frio[etapa], saida_fria = rodar(['main.py', etapa, '--destino', destino], ambiente)
+        for etapa in ETAPAS:
+            quente[etapa], saida_quente = rodar(['main.py', etapa, '--destino', destino], ambiente)
+            assert 'etapa pulada' in saida_quente, f'{etapa}: não foi pulada com as entradas inalteradas'
+        t_forcado, _ = rodar(['main.py', 'analyze', '--forcar', '--destino', destino], ambiente)
+        servidor.shutdown()
+
+        print(f"{'Subcomando':<16}{'Sem checkpoint (s)':>20}{'Com checkpoint (s)':>20}")
+        for etapa in ETAPAS:
+            print(f'{etapa:<16}{frio[etapa]:>20.2f}{quente[etapa]:>20.2f}')
+        print(f'\nanalyze --forcar (relê o cubo): {t_forcado:.2f} s')
+        print(f'import main: {t_import_main:.2f} s | import new_lib: {t_import_nl:.2f} s')
+
+        relatorio = saida_fria[saida_fria.index('=' * 70):saida_fria.rindex('=' * 70)]
+        assert relatorio in saida_quente, 'analyze pulado imprimiu um relatório diferente'
+        print('Relatório do analyze pulado idêntico ao da execução completa.')
+    finally:
+        shutil.rmtree(temporaria, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
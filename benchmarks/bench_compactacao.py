@@ -0,0 +1,73 @@
+"""
+Benchmark da base compacta (compactar_base) sobre uma base sintética N vezes maior
+que a atual (padrão 100x): memória antes/depois, tempo da compactação e tempo de
+agrupamentos por Instituicao, Data_Ref e Data_Ref x Instituicao, além de
+construir_cubo, nas duas representações. Confere que os resultados coincidem.
+
+Uso:
+    python benchmarks/bench_compactacao.py [--base dados/base_final_tratada_unica.csv] [--fator 100]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import pandas as pd
+import new_lib as nl
+from bench_analise import base_sintetica
+
+
+def cronometrar(funcao, *args, repeticoes=3):
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(*args)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return resultado, melhor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base', default=os.path.join(RAIZ, 'dados', nl.ARQUIVO_CSV_FINAL))
+    parser.add_argument('--fator', type=int, default=100)
+    args = parser.parse_args()
+
+    base = pd.read_csv(args.base, sep=';', encoding='utf-8-sig', dtype={'Rank': str, 'Codigo_Instituicao': str})
+    df = base_sintetica(base, args.fator)
+    print(f'Base sintética: {len(df)} linhas ({args.fator}x {len(base)})\n')
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        compacto, t_compactar = cronometrar(nl.compactar_base, df, repeticoes=1)
+    relatorio = nl.relatorio_memoria(df, compacto)
+
+    consultas = {
+        'groupby Instituicao (soma)': lambda d: d.groupby('Instituicao', observed=True)['Total_Geral_Valor'].sum(),
+        'groupby Data_Ref (soma)': lambda d: d.groupby('Data_Ref')['Total_Geral_Valor'].sum(),
+        'groupby Data_Ref x Instituicao': lambda d: d.groupby(['Data_Ref', 'Instituicao'], observed=True)['Exportacao_Valor'].sum(),
+        'construir_cubo': nl.construir_cubo,
+    }
+
+    print(f"{'Consulta':<34}{'texto (s)':>11}{'compacta (s)':>14}{'ganho':>8}")
+    for nome, consulta in consultas.items():
+        r_texto, t_texto = cronometrar(consulta, df)
+        r_compacto, t_compacto = cronometrar(consulta, compacto)
+        if isinstance(r_texto, dict):
+            for tabela in r_texto:
+                pd.testing.assert_frame_equal(r_texto[tabela], r_compacto[tabela])
+        else:
+            assert (r_texto.to_numpy() == r_compacto.to_numpy()).all()
+        print(f'{nome:<34}{t_texto:>11.3f}{t_compacto:>14.3f}{t_texto / t_compacto:>7.1f}x')
+
+    total_antes, total_depois = relatorio.loc['TOTAL', 'MB_Antes'], relatorio.loc['TOTAL', 'MB_Depois']
+    print(f'\nMemória: {total_antes:.1f} MB -> {total_depois:.1f} MB ({total_antes / total_depois:.1f}x menor) | '
+          f'compactação em {t_compactar:.2f} s')
+    print('\n' + relatorio.to_string())
+
+
+if __name__ == '__main__':
+    main()
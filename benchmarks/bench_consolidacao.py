@@ -0,0 +1,89 @@
+"""
+Benchmark da consolidação incremental: consolidação completa (unificar_bases +
+tratar_dados) contra consolidar_incremental a frio, sem mudanças, com um mês novo e
+com um arquivo alterado. Trabalha sobre uma cópia temporária da pasta, confere que as
+bases são iguais e que o cache de encodings continua com todos os arquivos atuais.
+
+Uso:
+    python benchmarks/bench_consolidacao.py [--pasta dados/zipfiles]
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import pandas as pd
+import new_lib as nl
+
+
+def cronometrar(funcao, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        inicio = time.perf_counter()
+        resultado = funcao(*args)
+        return resultado, time.perf_counter() - inicio
+
+
+def completa(pasta):
+    return nl.tratar_dados(nl.unificar_bases(pasta))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pasta', default=os.path.join(RAIZ, 'dados', 'zipfiles'))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pasta = os.path.join(tmp, 'csv')
+        cache = os.path.join(tmp, 'cache')
+        cache_encoding = os.path.join(tmp, 'cache_encoding.json')
+        shutil.copytree(args.pasta, pasta)
+        arquivos = nl.listar_arquivos_mensais(pasta)
+
+        # O último mês fica de fora e "chega" no final, como numa atualização mensal.
+        ultimo = os.path.join(tmp, arquivos[-1])
+        shutil.move(os.path.join(pasta, arquivos[-1]), ultimo)
+
+        medicoes = []
+        _, t = cronometrar(completa, pasta)
+        medicoes.append(('completa (unificar + tratar)', t))
+        _, t = cronometrar(nl.consolidar_incremental, pasta, cache, 1, cache_encoding)
+        medicoes.append(('incremental a frio', t))
+        _, t = cronometrar(nl.consolidar_incremental, pasta, cache, 1, cache_encoding)
+        medicoes.append(('incremental sem mudanças', t))
+
+        shutil.move(ultimo, os.path.join(pasta, arquivos[-1]))
+        _, t = cronometrar(nl.consolidar_incremental, pasta, cache, 1, cache_encoding)
+        medicoes.append(('incremental + 1 mês novo', t))
+
+        # Um arquivo alterado (linha em branco no fim), consolidado duas vezes.
+        with open(os.path.join(pasta, arquivos[0]), 'ab') as f:
+            f.write(b'\n')
+        _, t = cronometrar(nl.consolidar_incremental, pasta, cache, 1, cache_encoding)
+        medicoes.append(('incremental + 1 arquivo alterado', t))
+        incremental, t = cronometrar(nl.consolidar_incremental, pasta, cache, 1, cache_encoding)
+        medicoes.append(('incremental sem mudanças', t))
+        referencia, t = cronometrar(completa, pasta)
+        medicoes.append(('completa com as mudanças', t))
+
+        atuais = {nl.chave_arquivo(os.path.join(pasta, f)) for f in arquivos}
+        gravadas = set(nl.ler_json(cache_encoding))
+        assert gravadas == atuais, f'cache de encodings com {len(gravadas)} entradas, esperado {len(atuais)}'
+
+    pd.testing.assert_frame_equal(incremental, referencia.reset_index(drop=True))
+
+    print(f'{len(arquivos)} arquivos mensais em {args.pasta}\n')
+    print(f"{'Modo':<36}{'Tempo (s)':>10}")
+    for nome, t in medicoes:
+        print(f'{nome:<36}{t:>10.3f}')
+    print(f'\nBases idênticas ({len(referencia)} linhas); cache de encodings com os {len(atuais)} arquivos atuais.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark da conversão numérica: a antiga cadeia astype(str)/replace/replace/replace/strip
+sobre o corpus lido como texto, contra a conversão na leitura (ler_com_layout com
+numerico=True) seguida de converter_numero_br. Confere que os valores são idênticos.
+
+Uso:
+    python benchmarks/bench_conversao_numerica.py [--pasta dados/zipfiles] [--repeticoes 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import pandas as pd
+import new_lib as nl
+
+
+def conversao_encadeada(serie):
+    """Conversão original do tratar_dados, mantida aqui como referência."""
+    if serie.dtype == 'object':
+        serie = (serie
+                 .astype(str)
+                 .str.replace(r'[^\d\.\,\-]', '', regex=True)
+                 .str.replace('.', '', regex=False)
+                 .str.replace(',', '.', regex=False)
+                 .str.strip())
+    return pd.to_numeric(serie, errors='coerce')
+
+
+def ler_corpus(caminhos, numerico):
+    dfs = []
+    for caminho in caminhos:
+        df = nl.ler_com_layout(caminho, nl.resolver_encoding(caminho), numerico=numerico)
+        df.columns = nl.COLUNAS_PADRAO[:df.shape[1]]
+        dfs.append(df)
+    return pd.concat(dfs, ignore_index=True)
+
+
+def medir(caminhos, numerico, converter, repeticoes):
+    melhor_leitura = melhor_conversao = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        df = ler_corpus(caminhos, numerico)
+        meio = time.perf_counter()
+        cols = [c for c in df.columns if 'Valor' in c or 'Quant' in c]
+        convertido = pd.DataFrame({c: converter(df[c]) for c in cols})
+        fim = time.perf_counter()
+        melhor_leitura = min(melhor_leitura, meio - inicio)
+        melhor_conversao = min(melhor_conversao, fim - meio)
+    return melhor_leitura, melhor_conversao, convertido
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pasta', default=os.path.join(RAIZ, 'dados', 'zipfiles'))
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    caminhos = [os.path.join(args.pasta, f) for f in nl.listar_arquivos_mensais(args.pasta)]
+    caminhos = [c for c in caminhos if nl.detectar_layout(open(c, 'rb').read()) is not None]
+    print(f'{len(caminhos)} arquivos mensais em {args.pasta}\n')
+
+    l_antigo, c_antigo, df_antigo = medir(caminhos, False, conversao_encadeada, args.repeticoes)
+    l_novo, c_novo, df_novo = medir(caminhos, True, nl.converter_numero_br, args.repeticoes)
+
+    pd.testing.assert_frame_equal(df_novo, df_antigo.astype('float64'))
+    celulas = df_novo.size
+
+    print(f"{'Modo':<40}{'Leitura (s)':>12}{'Conversão (s)':>15}{'Total (s)':>11}")
+    print(f"{'texto + cadeia de str.replace':<40}{l_antigo:>12.3f}{c_antigo:>15.3f}{l_antigo + c_antigo:>11.3f}")
+    print(f"{'conversão na leitura + converter_numero_br':<40}{l_novo:>12.3f}{c_novo:>15.3f}{l_novo + c_novo:>11.3f}")
+    print(f'\n{celulas} células numéricas idênticas | conversão {c_antigo / c_novo:.1f}x mais rápida')
+
+
+if __name__ == '__main__':
+    main()
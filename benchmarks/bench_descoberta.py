@@ -0,0 +1,80 @@
+"""
+Benchmark da descoberta de URLs: laço sequencial de gerar_info_data contra
+descobrir_urls (a frio e com o cache de padrões já preenchido).
+
+Uso:
+    python benchmarks/bench_descoberta.py [--anos 10] [--latencia 0.02]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import new_lib as nl
+from servidor_local import iniciar_servidor
+
+
+def publicar_meses(meses):
+    """Escolhe um padrão 'publicado' por mês, variando como acontece no site real."""
+    arquivos = {}
+    for ano, mes in meses:
+        padroes = nl.gerar_padroes_url(ano, mes)
+        arquivos[padroes[(ano + mes) % len(padroes)]] = b''
+    return arquivos
+
+
+def cronometrar(funcao):
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultado = funcao()
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--anos', type=int, default=10, help='Tamanho do backfill em anos.')
+    parser.add_argument('--latencia', type=float, default=0.02, help='Latência artificial por requisição (s).')
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--max-por-host', type=int, default=8)
+    args = parser.parse_args()
+
+    meses = [(ano, mes) for ano in range(2015, 2015 + args.anos) for mes in range(1, 13)]
+    servidor, base_url = iniciar_servidor(publicar_meses(meses), latencia=args.latencia)
+
+    print(f'Backfill de {len(meses)} meses | latência {args.latencia * 1000:.0f} ms por requisição\n')
+
+    servidor.requisicoes = 0
+    t_seq, urls_seq = cronometrar(lambda: {(a, m): nl.gerar_info_data(a, m, base_url=base_url) for a, m in meses})
+    req_seq = servidor.requisicoes
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_cache = os.path.join(pasta, 'cache_padroes_url.json')
+        kwargs = dict(base_url=base_url, caminho_cache=caminho_cache,
+                      max_workers=args.workers, max_por_host=args.max_por_host)
+
+        servidor.requisicoes = 0
+        t_frio, urls_frio = cronometrar(lambda: nl.descobrir_urls(meses, **kwargs))
+        req_frio = servidor.requisicoes
+
+        servidor.requisicoes = 0
+        t_quente, urls_quente = cronometrar(lambda: nl.descobrir_urls(meses, **kwargs))
+        req_quente = servidor.requisicoes
+
+    servidor.shutdown()
+
+    assert urls_frio == urls_quente == {k: v for k, v in urls_seq.items() if v}, 'URLs divergentes!'
+
+    print(f"{'Modo':<36}{'Tempo (s)':>12}{'Requisições':>14}")
+    print(f"{'gerar_info_data (sequencial)':<36}{t_seq:>12.2f}{req_seq:>14}")
+    print(f"{'descobrir_urls (cache vazio)':<36}{t_frio:>12.2f}{req_frio:>14}")
+    print(f"{'descobrir_urls (cache preenchido)':<36}{t_quente:>12.2f}{req_quente:>14}")
+    print(f'\nGanho a frio: {t_seq / t_frio:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Benchmark da detecção de encoding em todo o corpus: chardet em todos os arquivos
+(detectar_encoding) contra resolver_encoding a frio e com o cache preenchido.
+
+Uso:
+    python benchmarks/bench_encoding.py [--pasta dados/zipfiles]
+"""
+import argparse
+import collections
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import new_lib as nl
+
+
+def cronometrar(funcao, caminhos):
+    inicio = time.perf_counter()
+    resultado = [funcao(caminho) for caminho in caminhos]
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pasta', default=os.path.join(RAIZ, 'dados', 'zipfiles'))
+    args = parser.parse_args()
+
+    caminhos = sorted(os.path.join(args.pasta, f) for f in os.listdir(args.pasta) if f.lower().endswith('.csv'))
+    print(f'{len(caminhos)} arquivos CSV em {args.pasta}\n')
+
+    cache = {}
+    t_chardet, encs_chardet = cronometrar(nl.detectar_encoding, caminhos)
+    t_frio, encs = cronometrar(lambda c: nl.resolver_encoding(c, cache=cache), caminhos)
+    t_quente, _ = cronometrar(lambda c: nl.resolver_encoding(c, cache=cache), caminhos)
+
+    print(f"{'Modo':<34}{'Tempo (s)':>12}{'ms/arquivo':>12}")
+    for nome, t in [('chardet (detectar_encoding)', t_chardet),
+                    ('resolver_encoding (a frio)', t_frio),
+                    ('resolver_encoding (cache)', t_quente)]:
+        print(f"{nome:<34}{t:>12.3f}{t / len(caminhos) * 1000:>12.2f}")
+
+    print(f'\nEconomia por consolidação: {t_chardet - t_frio:.2f} s a frio, {t_chardet - t_quente:.2f} s com cache')
+    print(f'Encodings (chardet):  {dict(collections.Counter(encs_chardet))}')
+    print(f'Encodings (resolver): {dict(collections.Counter(encs))}')
+
+
+if __name__ == '__main__':
+    main()
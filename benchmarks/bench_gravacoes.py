@@ -0,0 +1,85 @@
+"""
+Benchmark do cache record/replay (AdaptadorGravacoes): a mesma aquisição
+(descoberta + download + extração) contra o servidor local com latência,
+gravando, e depois reproduzida do disco com o servidor desligado.
+
+Uso:
+    python benchmarks/bench_gravacoes.py [--meses 60] [--latencia 0.05] [--tamanho-kb 400]
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import new_lib as nl
+from servidor_local import iniciar_servidor
+
+
+def publicar_zips(meses, tamanho_kb):
+    """Um ZIP por mês, no segundo padrão de nome, com um CSV mensal de ~tamanho_kb."""
+    arquivos = {}
+    for ano, mes in meses:
+        linhas = (f'BANCO {i % 150} S.A.;{i * 7919 % 99991};{i * 104729 % 9999991},{i % 100:02d}\n' for i in range(tamanho_kb * 30))
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as z:
+            z.writestr(f'{ano}{mes:02d}IF.csv', f'{ano}{mes:02d}\n' + ''.join(linhas))
+        arquivos[nl.gerar_padroes_url(ano, mes)[1]] = buffer.getvalue()
+    return arquivos
+
+
+def adquirir(meses, base_url, pasta_gravacoes, modo, destino):
+    """Descobre e baixa todos os meses com uma sessão no modo de gravações indicado."""
+    os.makedirs(destino)
+    sessao = nl.criar_sessao(gravacoes=pasta_gravacoes, modo_gravacoes=modo)
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        urls = nl.descobrir_urls(meses, base_url=base_url, sessao=sessao)
+        baixados = sum(nl.baixar_e_extrair_zip(url, destino, ano, mes, sessao=sessao) for (ano, mes), url in urls.items())
+    return time.perf_counter() - inicio, baixados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--meses', type=int, default=60)
+    parser.add_argument('--latencia', type=float, default=0.05, help='Latência artificial por requisição (s).')
+    parser.add_argument('--tamanho-kb', type=int, default=400, help='Tamanho aproximado de cada CSV mensal.')
+    args = parser.parse_args()
+
+    meses = [(2015 + i // 12, i % 12 + 1) for i in range(args.meses)]
+    servidor, base_url = iniciar_servidor(publicar_zips(meses, args.tamanho_kb), latencia=args.latencia)
+    print(f'{len(meses)} meses | latência {args.latencia * 1000:.0f} ms por requisição\n')
+
+    temporaria = tempfile.mkdtemp(prefix='bench_gravacoes_')
+    try:
+        gravacoes = os.path.join(temporaria, 'gravacoes')
+        t_gravar, n_gravar = adquirir(meses, base_url, gravacoes, 'gravar', os.path.join(temporaria, 'ao_vivo'))
+        requisicoes = servidor.requisicoes
+        servidor.shutdown()  # daqui em diante, nenhuma requisição chega à rede
+        t_reproduzir, n_reproduzir = adquirir(meses, base_url, gravacoes, 'reproduzir', os.path.join(temporaria, 'reproduzido'))
+
+        for nome in os.listdir(os.path.join(temporaria, 'ao_vivo')):
+            with open(os.path.join(temporaria, 'ao_vivo', nome), 'rb') as a, \
+                 open(os.path.join(temporaria, 'reproduzido', nome), 'rb') as b:
+                assert a.read() == b.read(), f'Arquivo divergente: {nome}'
+        assert n_gravar == n_reproduzir == len(meses), 'Meses faltando!'
+
+        pasta_objetos = os.path.join(gravacoes, 'objetos')
+        mb = sum(os.path.getsize(os.path.join(r, a)) for r, _, nomes in os.walk(pasta_objetos) for a in nomes) / 1e6
+        print(f"{'Modo':<28}{'Tempo (s)':>12}{'Requisições':>14}")
+        print(f"{'ao vivo (gravando)':<28}{t_gravar:>12.2f}{requisicoes:>14}")
+        print(f"{'reproduzido do disco':<28}{t_reproduzir:>12.2f}{0:>14}")
+        print(f'\nGravações: {mb:.1f} MB | ganho: {t_gravar / t_reproduzir:.1f}x')
+    finally:
+        shutil.rmtree(temporaria, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark de consultas de período arbitrário (top-N por instituição entre dois meses
+quaisquer) sobre uma base sintética N vezes maior que a atual (base_sintetica de
+bench_analise.py): filtro + groupby na base tratada, fatia + groupby no cubo
+(mes_instituicao) e IndiceTemporal (subtração de duas colunas das somas acumuladas).
+Confere que os três caminhos devolvem as mesmas instituições e totais.
+
+Uso:
+    python benchmarks/bench_indice_temporal.py [--base dados/base_final_tratada_unica.csv] [--fator 20] [--consultas 200]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import numpy as np
+import pandas as pd
+import new_lib as nl
+from bench_analise import base_sintetica
+
+COLUNA = 'Total_Geral_Valor'
+
+
+def top_na_base(df, inicio, fim, n):
+    fatia = df[(df['Data_Ref'] >= inicio) & (df['Data_Ref'] <= fim)]
+    return fatia.groupby('Instituicao')[COLUNA].sum().nlargest(n)
+
+
+def top_no_cubo(mes_inst, inicio, fim, n):
+    datas = mes_inst['Data_Ref']
+    fatia = mes_inst.iloc[datas.searchsorted(inicio):datas.searchsorted(f'{fim}~')]
+    return fatia.groupby('Instituicao')[COLUNA].sum().nlargest(n)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base', default=os.path.join(RAIZ, 'dados', nl.ARQUIVO_CSV_FINAL))
+    parser.add_argument('--fator', type=int, default=20, help='Quantas cópias da base (histórico N vezes maior).')
+    parser.add_argument('--consultas', type=int, default=200, help='Intervalos aleatórios consultados.')
+    parser.add_argument('--top', type=int, default=5)
+    args = parser.parse_args()
+
+    df = base_sintetica(pd.read_csv(args.base, sep=';', encoding='utf-8-sig', usecols=nl.COLUNAS_ANALISE), args.fator)
+    inicio = time.perf_counter()
+    cubo = nl.construir_cubo(df)  # sem a dimensão: mesmos nomes de instituição da base
+    t_cubo = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    indice = nl.IndiceTemporal(cubo)
+    t_indice = time.perf_counter() - inicio
+    print(f'Base: {len(df):,} linhas | {len(indice.meses)} meses x {len(indice.instituicoes)} instituições')
+    print(f'Construção: cubo {t_cubo:.2f} s | índice temporal {t_indice:.3f} s '
+          f'({indice._acumulado.nbytes / 1e6:.1f} MB)\n')
+
+    sorteio = random.Random(0)
+    intervalos = [tuple(sorted(sorteio.sample(list(indice.meses), 2))) for _ in range(args.consultas)]
+    caminhos = [
+        ('base tratada (filtro + groupby)', lambda i, f: top_na_base(df, i, f, args.top)),
+        ('cubo (fatia + groupby)', lambda i, f: top_no_cubo(cubo['mes_instituicao'], i, f, args.top)),
+        ('IndiceTemporal.top', lambda i, f: indice.top(COLUNA, i, f, n=args.top)),
+    ]
+
+    respostas = {}
+    print(f"{'Caminho':<34}{'ms/consulta':>13}{'Consultas/s':>14}")
+    for nome, consulta in caminhos:
+        inicio = time.perf_counter()
+        respostas[nome] = [consulta(i, f) for i, f in intervalos]
+        decorrido = time.perf_counter() - inicio
+        print(f'{nome:<34}{decorrido / len(intervalos) * 1000:>13.2f}{len(intervalos) / decorrido:>14,.0f}')
+
+    referencia = respostas[caminhos[0][0]]
+    for nome, _ in caminhos[1:]:
+        for esperado, obtido in zip(referencia, respostas[nome]):
+            assert list(esperado.index) == list(obtido.index), f'{nome}: instituições divergentes'
+            assert np.allclose(esperado.to_numpy(), obtido.to_numpy(), rtol=1e-9), f'{nome}: totais divergentes'
+    print('\nRespostas idênticas nos três caminhos.')
+
+
+if __name__ == '__main__':
+    main()
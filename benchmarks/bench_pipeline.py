@@ -0,0 +1,107 @@
+"""
+Benchmark de ponta a ponta sobre um corpus sintético no layout do BACEN
+(gerador_corpus.py): mede cada etapa do pipeline sem depender do bcb.gov.br.
+
+Para cada etapa informa o tempo, a vazão (arquivos/s e linhas/s) e o pico de
+memória alocada (tracemalloc, medido em uma segunda execução para não distorcer
+o tempo). Etapas: unificar_bases, tratar_dados, consolidar_incremental (cache
+frio e quente), compactar_base, separar_dimensao_instituicoes, construir_cubo,
+salvar_base_parquet e analisar_dados.
+
+Uso:
+    python benchmarks/bench_pipeline.py [--meses 120] [--instituicoes 150] [--pasta CORPUS_EXISTENTE] [--workers 1] [--xlsx]
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import new_lib as nl
+from gerador_corpus import gerar_corpus
+
+
+def medir(funcao, memoria=True):
+    """(resultado, segundos, pico_MB) de funcao(); o pico vem de uma segunda execução sob tracemalloc."""
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)  # avisos do pandas repetidos a cada execução
+        inicio = time.perf_counter()
+        resultado = funcao()
+        decorrido = time.perf_counter() - inicio
+        pico = None
+        if memoria:
+            tracemalloc.start()
+            funcao()
+            pico = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+    return resultado, decorrido, pico
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pasta', help='Corpus já gerado (senão, gera um em pasta temporária).')
+    parser.add_argument('--meses', type=int, default=120)
+    parser.add_argument('--instituicoes', type=int, default=150)
+    parser.add_argument('--workers', type=int, default=1, help='Processos de leitura em unificar_bases/consolidar_incremental.')
+    parser.add_argument('--xlsx', action='store_true', help='Gera também os .xlsx (não são lidos pelo pipeline).')
+    parser.add_argument('--sem-memoria', action='store_true', help='Não mede o pico de memória (metade do tempo).')
+    args = parser.parse_args()
+
+    temporaria = tempfile.mkdtemp(prefix='bench_pipeline_')
+    try:
+        pasta = args.pasta
+        if pasta is None:
+            pasta = os.path.join(temporaria, 'zipfiles')
+            inicio = time.perf_counter()
+            resumo = gerar_corpus(pasta, meses=args.meses, instituicoes=args.instituicoes, xlsx=args.xlsx)
+            print(f"Corpus sintético: {resumo['arquivos']} arquivos, {resumo['linhas']} linhas mensais, "
+                  f"{resumo['bytes'] / 1e6:.1f} MB (gerado em {time.perf_counter() - inicio:.1f} s)")
+
+        caminhos = [os.path.join(pasta, f) for f in nl.listar_arquivos_mensais(pasta)]
+        n_arquivos = len(caminhos)
+        mb_arquivos = sum(os.path.getsize(c) for c in caminhos) / 1e6
+        print(f'{n_arquivos} rankings mensais ({mb_arquivos:.1f} MB) em {pasta}\n')
+
+        cache = os.path.join(temporaria, 'cache_consolidacao')
+        def consolidar_frio():
+            shutil.rmtree(cache, ignore_errors=True)
+            return nl.consolidar_incremental(pasta, cache, workers=args.workers)
+
+        estado = {}
+        etapas = [
+            ('unificar_bases', True, lambda: nl.unificar_bases(pasta, workers=args.workers)),
+            ('tratar_dados', False, lambda: nl.tratar_dados(estado['unificar_bases'])),
+            ('consolidar (cache frio)', True, consolidar_frio),
+            ('consolidar (cache quente)', True, lambda: nl.consolidar_incremental(pasta, cache, workers=args.workers)),
+            ('compactar_base', False, lambda: nl.compactar_base(estado['tratar_dados'], relatorio=False)),
+            ('separar_dimensao', False, lambda: nl.separar_dimensao_instituicoes(estado['compactar_base'])),
+            ('construir_cubo', False, lambda: nl.construir_cubo(*estado['separar_dimensao'])),
+            ('salvar_base_parquet', False, lambda: nl.salvar_base_parquet(estado['tratar_dados'], os.path.join(temporaria, nl.PASTA_PARQUET))),
+            ('analisar_dados', False, lambda: nl.analisar_dados(estado['construir_cubo'])),
+        ]
+
+        print(f"{'Etapa':<28}{'Tempo (s)':>11}{'Arquivos/s':>12}{'Linhas/s':>13}{'Pico (MB)':>11}")
+        total = 0.0
+        for nome, le_arquivos, funcao in etapas:
+            resultado, decorrido, pico = medir(funcao, memoria=not args.sem_memoria)
+            estado[nome] = resultado
+            total += decorrido
+            linhas = len(estado['tratar_dados'] if 'tratar_dados' in estado else resultado)
+            arquivos_s = f'{n_arquivos / decorrido:>12.1f}' if le_arquivos else f"{'-':>12}"
+            pico_txt = f'{pico:>11.1f}' if pico is not None else f"{'-':>11}"
+            print(f'{nome:<28}{decorrido:>11.3f}{arquivos_s}{linhas / decorrido:>13,.0f}{pico_txt}')
+        print(f"{'TOTAL':<28}{total:>11.3f}")
+    finally:
+        shutil.rmtree(temporaria, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
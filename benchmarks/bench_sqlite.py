@@ -0,0 +1,117 @@
+"""
+Benchmark do modo de consulta SQL: "top 10 importadores por trimestre" em um
+intervalo de trimestres, respondido carregando a base CSV inteira no pandas
+(read_csv + filtro + groupby) e pelo SQLite de atualizar_base_sqlite (consulta com
+filtro indexado em Trimestre), sobre uma base sintética N vezes maior que a atual
+(base_sintetica de bench_analise.py).
+
+Cada consulta roda em um processo novo, para medir o crescimento do pico de memória
+residente (RSS, via /proc: só Linux) do processo. Mede também a carga inicial do SQLite e a atualização
+incremental (nenhum mês alterado e um mês alterado), e confere que as respostas coincidem.
+
+Uso:
+    python benchmarks/bench_sqlite.py [--base dados/base_final_tratada_unica.csv] [--fator 50]
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import numpy as np
+import pandas as pd
+import new_lib as nl
+from bench_analise import base_sintetica
+
+PARAMETROS = {'top': 10}
+
+
+def consulta_pandas(caminho_csv, inicio, fim):
+    df = pd.read_csv(caminho_csv, sep=';', encoding='utf-8-sig',
+                     usecols=['Data_Ref', 'Instituicao', 'Importacao_Valor'])
+    df['Trimestre'] = nl._trimestre(df['Data_Ref'])
+    df = df[df['Trimestre'].between(inicio, fim)]
+    somas = df.groupby(['Trimestre', 'Instituicao'])['Importacao_Valor'].sum().reset_index()
+    somas = somas.sort_values(['Trimestre', 'Importacao_Valor'], ascending=[True, False])
+    return somas.groupby('Trimestre').head(PARAMETROS['top']).reset_index(drop=True)
+
+
+def consulta_sqlite(caminho_db, inicio, fim):
+    return nl.consultar_sql(caminho_db, 'top_importadores_trimestre', dict(PARAMETROS, inicio=inicio, fim=fim))
+
+
+def memoria_kb(campo):
+    with open('/proc/self/status') as f:
+        for linha in f:
+            if linha.startswith(campo + ':'):
+                return int(linha.split()[1])
+
+
+def medir_em_processo(nome, caminho, inicio, fim):
+    """(resultado, segundos, MB de pico de RSS acima do processo já com pandas carregado)."""
+    funcao = consulta_pandas if nome == 'pandas' else consulta_sqlite
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')  # zera o pico (VmHWM): o pico dos imports não conta
+    base_kb = memoria_kb('VmRSS')
+    comeco = time.perf_counter()
+    resultado = funcao(caminho, inicio, fim)
+    decorrido = time.perf_counter() - comeco
+    return resultado, decorrido, (memoria_kb('VmHWM') - base_kb) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base', default=os.path.join(RAIZ, 'dados', nl.ARQUIVO_CSV_FINAL))
+    parser.add_argument('--fator', type=int, default=50, help='Quantas cópias da base (histórico N vezes maior).')
+    args = parser.parse_args()
+
+    temporaria = tempfile.mkdtemp(prefix='bench_sqlite_')
+    try:
+        df = base_sintetica(pd.read_csv(args.base, sep=';', encoding='utf-8-sig'), args.fator)
+        caminho_csv = os.path.join(temporaria, nl.ARQUIVO_CSV_FINAL)
+        caminho_db = os.path.join(temporaria, nl.ARQUIVO_SQLITE)
+        df.to_csv(caminho_csv, index=False, sep=';', encoding='utf-8-sig')
+
+        etapas = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for nome, base in [('carga inicial', df), ('atualização (nada mudou)', df),
+                               ('atualização (1 mês mudou)', df.assign(Total_Geral_Valor=df['Total_Geral_Valor'].where(
+                                   df['Data_Ref'] != df['Data_Ref'].iloc[-1], 0.0)))]:
+                comeco = time.perf_counter()
+                resumo = nl.atualizar_base_sqlite(caminho_db, base)
+                etapas.append((nome, time.perf_counter() - comeco, resumo['gravados']))
+        print(f'Base: {len(df):,} linhas, {df["Data_Ref"].nunique()} meses | CSV {os.path.getsize(caminho_csv) / 1e6:.0f} MB '
+              f'| SQLite {os.path.getsize(caminho_db) / 1e6:.0f} MB\n')
+        print(f"{'SQLite':<30}{'Tempo (s)':>11}{'Meses gravados':>16}")
+        for nome, decorrido, gravados in etapas:
+            print(f'{nome:<30}{decorrido:>11.2f}{gravados:>16}')
+
+        trimestres = sorted(nl._trimestre(pd.Series(df['Data_Ref'].unique())).dropna().unique())
+        inicio, fim = trimestres[len(trimestres) // 2], trimestres[len(trimestres) // 2 + 3]
+        print(f'\nTop {PARAMETROS["top"]} importadores por trimestre, {inicio} a {fim}:')
+        print(f"{'Caminho':<30}{'Tempo (s)':>11}{'Pico RSS (+MB)':>16}")
+        respostas = {}
+        contexto = multiprocessing.get_context('spawn')
+        for nome, caminho in [('pandas', caminho_csv), ('sqlite', caminho_db)]:
+            with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as executor:
+                respostas[nome], decorrido, pico = executor.submit(medir_em_processo, nome, caminho, inicio, fim).result()
+            print(f"{'read_csv + groupby' if nome == 'pandas' else 'consultar_sql':<30}{decorrido:>11.2f}{pico:>16.1f}")
+
+        esperado, obtido = respostas['pandas'], respostas['sqlite']
+        assert list(esperado['Instituicao']) == list(obtido['Instituicao']), 'Instituições divergentes'
+        assert np.allclose(esperado['Importacao_Valor'], obtido['Importacao_Valor']), 'Valores divergentes'
+        print('\nRespostas idênticas nos dois caminhos.')
+    finally:
+        shutil.rmtree(temporaria, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark da consolidação em streaming: a base inteira em memória
+(tratar_dados(unificar_bases(...)) + to_csv + salvar_base_parquet) contra
+consolidar_em_streaming, que trata e grava arquivo a arquivo.
+
+Informa o tempo e o pico de memória alocada (tracemalloc, medido em uma segunda
+execução) e confere que o CSV gravado é idêntico byte a byte.
+
+Uso:
+    python benchmarks/bench_streaming.py [--meses 240] [--instituicoes 150] [--pasta CORPUS_EXISTENTE]
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import new_lib as nl
+from gerador_corpus import gerar_corpus
+
+
+def medir(funcao):
+    """(segundos, pico_MB) de funcao(); o pico vem de uma segunda execução sob tracemalloc."""
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        inicio = time.perf_counter()
+        funcao()
+        decorrido = time.perf_counter() - inicio
+        tracemalloc.start()
+        funcao()
+        pico = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return decorrido, pico
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pasta', help='Corpus já gerado (senão, gera um em pasta temporária).')
+    parser.add_argument('--meses', type=int, default=240)
+    parser.add_argument('--instituicoes', type=int, default=150)
+    args = parser.parse_args()
+
+    temporaria = tempfile.mkdtemp(prefix='bench_streaming_')
+    try:
+        pasta = args.pasta
+        if pasta is None:
+            pasta = os.path.join(temporaria, 'zipfiles')
+            gerar_corpus(pasta, meses=args.meses, instituicoes=args.instituicoes, xlsx=False, acumulado=False)
+        n_arquivos = len(nl.listar_arquivos_mensais(pasta))
+
+        saidas = {modo: (os.path.join(temporaria, f'{modo}.csv'), os.path.join(temporaria, f'{modo}_parquet'))
+                  for modo in ('memoria', 'streaming')}
+
+        def em_memoria():
+            df = nl.tratar_dados(nl.unificar_bases(pasta))
+            caminho_csv, pasta_parquet = saidas['memoria']
+            df.to_csv(caminho_csv, index=False, sep=';', encoding='utf-8-sig')
+            nl.salvar_base_parquet(df, pasta_parquet)
+
+        def em_streaming():
+            nl.consolidar_em_streaming(pasta, *saidas['streaming'])
+
+        resultados = [('base inteira em memória', *medir(em_memoria)), ('consolidar_em_streaming', *medir(em_streaming))]
+
+        with open(saidas['memoria'][0], 'rb') as a, open(saidas['streaming'][0], 'rb') as b:
+            assert a.read() == b.read(), 'CSV divergente!'
+        mb_csv = os.path.getsize(saidas['streaming'][0]) / 1e6
+
+        print(f'{n_arquivos} arquivos mensais -> CSV de {mb_csv:.1f} MB (idêntico nos dois modos)\n')
+        print(f"{'Modo':<28}{'Tempo (s)':>11}{'Pico (MB)':>11}")
+        for nome, decorrido, pico in resultados:
+            print(f'{nome:<28}{decorrido:>11.2f}{pico:>11.1f}')
+        print(f'\nPico de memória {resultados[0][2] / resultados[1][2]:.1f}x menor em streaming.')
+    finally:
+        shutil.rmtree(temporaria, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
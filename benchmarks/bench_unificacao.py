@@ -0,0 +1,56 @@
+"""
+Benchmark de escalabilidade do unificar_bases: modo serial contra o pool de
+processos com 1..N workers, conferindo que o resultado é sempre idêntico.
+
+Uso:
+    python benchmarks/bench_unificacao.py [--pasta dados/zipfiles] [--max-workers N] [--repeticoes 3]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import pandas as pd
+import new_lib as nl
+
+
+def cronometrar(pasta, workers, repeticoes):
+    melhor, df = None, None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            df = nl.unificar_bases(pasta, workers=workers)
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor, df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pasta', default=os.path.join(RAIZ, 'dados', 'zipfiles'))
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--repeticoes', type=int, default=3, help='Mantém o melhor tempo de N execuções.')
+    args = parser.parse_args()
+
+    n_arquivos = len(nl.listar_arquivos_mensais(args.pasta))
+    print(f'{n_arquivos} arquivos em {args.pasta} | {os.cpu_count()} núcleos disponíveis\n')
+
+    t_serial, df_serial = cronometrar(args.pasta, 1, args.repeticoes)
+    print(f"{'Workers':<10}{'Tempo (s)':>12}{'Arquivos/s':>14}{'Speedup':>10}")
+    print(f"{'serial':<10}{t_serial:>12.2f}{n_arquivos / t_serial:>14.1f}{1.0:>10.2f}")
+
+    workers = 2
+    while workers <= max(args.max_workers, 2):
+        t, df = cronometrar(args.pasta, workers, args.repeticoes)
+        pd.testing.assert_frame_equal(df, df_serial)
+        print(f"{workers:<10}{t:>12.2f}{n_arquivos / t:>14.1f}{t_serial / t:>10.2f}")
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
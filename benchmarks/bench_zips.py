@@ -0,0 +1,94 @@
+"""
+Benchmark do modo ZIP: a mesma pasta de downloads guardada extraída (todos os
+membros em disco, como o download padrão deixa) e só com os ZIPs originais,
+lidos direto pelo pipeline.
+
+Mede a ocupação em disco, os bytes gravados na aquisição (extração contra cópia
+do ZIP) e o tempo de unificar_bases e consolidar_incremental (cache frio) em cada
+modo, conferindo que as bases resultantes são idênticas.
+
+Uso:
+    python benchmarks/bench_zips.py [--meses 120] [--instituicoes 150] [--sem-xlsx]
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+import zipfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import pandas as pd
+
+import new_lib as nl
+from gerador_corpus import empacotar_em_zips, gerar_corpus
+
+
+def tamanho_pasta(pasta):
+    return sum(os.path.getsize(os.path.join(pasta, f)) for f in os.listdir(pasta))
+
+
+def cronometrar(funcao):
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        inicio = time.perf_counter()
+        resultado = funcao()
+    return time.perf_counter() - inicio, resultado
+
+
+def adquirir(pasta_zips, destino, manter_zip):
+    """Repete o passo final do download (extrair ou armazenar) para cada ZIP."""
+    os.makedirs(destino)
+    for nome_zip in sorted(os.listdir(pasta_zips)):
+        ano, mes = nl.PADRAO_ZIP_ARMAZENADO.match(nome_zip).groups()
+        with open(os.path.join(pasta_zips, nome_zip), 'rb') as arquivo_zip, zipfile.ZipFile(arquivo_zip) as z:
+            if manter_zip:
+                nl.armazenar_zip(arquivo_zip, z, destino, ano, mes)
+            else:
+                nl.extrair_membros_padronizados(z, destino, ano, mes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--meses', type=int, default=120)
+    parser.add_argument('--instituicoes', type=int, default=150)
+    parser.add_argument('--sem-xlsx', action='store_true', help='Corpus sem os .xlsx (geração mais rápida).')
+    args = parser.parse_args()
+
+    temporaria = tempfile.mkdtemp(prefix='bench_zips_')
+    try:
+        corpus = os.path.join(temporaria, 'corpus')
+        gerar_corpus(corpus, meses=args.meses, instituicoes=args.instituicoes, xlsx=not args.sem_xlsx)
+        publicados = os.path.join(temporaria, 'publicados')
+        empacotar_em_zips(corpus, publicados)
+        print(f'{args.meses} meses | {len(os.listdir(corpus))} arquivos | ZIPs publicados: {tamanho_pasta(publicados) / 1e6:.1f} MB\n')
+
+        resultados = {}
+        for modo, manter_zip in [('extraído', False), ('só ZIPs', True)]:
+            pasta = os.path.join(temporaria, 'zipfiles_' + ('zip' if manter_zip else 'extraido'))
+            t_aquisicao, _ = cronometrar(lambda: adquirir(publicados, pasta, manter_zip))
+            t_unificar, df = cronometrar(lambda: nl.unificar_bases(pasta))
+            cache = os.path.join(temporaria, 'cache_' + modo)
+            t_consolidar, df_consolidado = cronometrar(lambda: nl.consolidar_incremental(pasta, cache))
+            resultados[modo] = (tamanho_pasta(pasta), t_aquisicao, t_unificar, t_consolidar, df, df_consolidado)
+
+        extraido, so_zips = resultados['extraído'], resultados['só ZIPs']
+        pd.testing.assert_frame_equal(extraido[4], so_zips[4])
+        pd.testing.assert_frame_equal(extraido[5], so_zips[5])
+
+        print(f"{'Modo':<12}{'Disco (MB)':>12}{'Aquisição (s)':>15}{'unificar (s)':>14}{'consolidar (s)':>16}")
+        for modo, (disco, t_aquisicao, t_unificar, t_consolidar, _, _) in resultados.items():
+            print(f'{modo:<12}{disco / 1e6:>12.1f}{t_aquisicao:>15.2f}{t_unificar:>14.2f}{t_consolidar:>16.2f}')
+        print(f'\nDisco: {extraido[0] / so_zips[0]:.1f}x menor no modo ZIP; bases idênticas.')
+    finally:
+        shutil.rmtree(temporaria, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
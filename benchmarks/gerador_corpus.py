@@ -0,0 +1,273 @@
+"""
+Gerador de um corpus sintético no layout exato dos rankings do BACEN.
+
+Para cada mês grava, como o download padronizado deixa em dados/zipfiles:
+  - ranking_AAAA-MM_mensal.csv    (latin-1, ';', 5 linhas de preâmbulo + cabeçalho em
+                                   duas linhas, números no formato brasileiro, '-' para
+                                   vazio, linha Total e rodapé Fonte/Obs.);
+  - ranking_AAAA-MM_acumulado.csv (mesmo layout, acumulado de janeiro até o mês);
+  - ranking_AAAA-MM.xlsx          (abas do mês e do acumulado, como o BACEN publica).
+
+Meses a partir de 2024 usam o layout com a coluna Conglomerado; os anteriores, o
+layout clássico ('Nº Oper.' até 2015, 'CNPJ da Instituição' no lugar de 'Código
+Instit.' a partir de 2021). Uma parte das
+instituições muda de nome no meio do histórico ou aparece com grafias alternativas,
+como na base real. A semente fixa torna o corpus reprodutível.
+
+Uso:
+    python benchmarks/gerador_corpus.py PASTA [--meses 120] [--instituicoes 150] [--ano-inicial 2015] [--sem-xlsx]
+"""
+import argparse
+import os
+import sys
+import zipfile
+
+import numpy as np
+
+ENCODING_BACEN = 'latin-1'
+ANO_LAYOUT_CONGLOMERADO = 2024
+ANO_CABECALHO_CNPJ = 2021
+
+MESES_PT = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 'Julho',
+            'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+
+# Grupos de colunas (Quant. + Valor) na ordem do BACEN; os totais são somas dos anteriores.
+GRUPOS = ['Exportação', 'Importação', 'Transferência do Exterior', 'Transferência p/ Exterior',
+          'Total do Primário', 'Interbancário - Compra', 'Interbancário - Venda',
+          'Total do Interbancário', 'Total']
+
+_PREFIXOS = ['BANCO', 'BANCO DE CÂMBIO', 'CORRETORA DE CÂMBIO', 'DISTRIBUIDORA DE TÍTULOS E VALORES MOBILIÁRIOS',
+             'SOCIEDADE CORRETORA DE CÂMBIO', 'BANCO MÚLTIPLO']
+_RAIZES = ['ALFA', 'BRAVO', 'CÉU', 'DELTA', 'ÉPICA', 'FÊNIX', 'GAMA', 'HORIZONTE', 'ÍNDIGO', 'JUREMA',
+           'KAPPA', 'LÓTUS', 'MARÉ', 'NÚCLEO', 'ÔMEGA', 'PAMPA', 'QUÓRUM', 'RIO', 'SERTÃO', 'TUPÃ']
+_SUFIXOS = ['S.A.', 'S/A', 'LTDA.', 'LTDA']
+
+
+def formatar_br(valor):
+    """' 1.234.567 ' como nas células do BACEN; zero vira '-   '."""
+    return f' {valor:,} '.replace(',', '.') if valor else ' -   '
+
+
+def _gerar_instituicoes(n, n_meses, rng):
+    """Cadastro sintético: CNPJ raiz, nome por mês (renomeações e grafias alternativas) e porte."""
+    cnpjs = rng.choice(99_999_999, size=n, replace=False)
+    instituicoes = []
+    for i in range(n):
+        raiz = _RAIZES[i % len(_RAIZES)] + ('' if i < len(_RAIZES) else f' {i // len(_RAIZES) + 1}')
+        nome = f'{_PREFIXOS[rng.integers(len(_PREFIXOS))]} {raiz} {_SUFIXOS[rng.integers(len(_SUFIXOS))]}'
+        cnpj = f'{cnpjs[i]:08d}'
+        inst = {
+            'cnpj': f'{cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:]}',
+            'nomes': [nome] * n_meses,
+            'conglomerado': f'{raiz} - PRUDENCIAL',
+            'porte': rng.lognormal(mean=17.0, sigma=2.0),
+            'atividade': rng.uniform(0.6, 1.0),
+        }
+        sorteio = rng.random()
+        if sorteio < 0.10 and n_meses > 1:
+            # Renomeação: o nome novo vale a partir de um mês sorteado.
+            corte = int(rng.integers(1, n_meses))
+            inst['nomes'][corte:] = [f'{_PREFIXOS[rng.integers(len(_PREFIXOS))]} {raiz} NOVO {_SUFIXOS[0]}'] * (n_meses - corte)
+        elif sorteio < 0.15:
+            # Grafia alternativa em alguns meses (acento perdido, '?' no lugar de caractere).
+            alternativa = nome.replace('Â', 'A').replace('Í', '?').replace('Ú', 'U')
+            inst['nomes'] = [alternativa if rng.random() < 0.3 else nome for _ in range(n_meses)]
+        instituicoes.append(inst)
+    return instituicoes
+
+
+def _valores_do_mes(instituicoes, ativos, rng):
+    """Matriz (instituições ativas x 18) com Quant/Valor dos 9 grupos, na ordem de GRUPOS."""
+    porte = np.array([instituicoes[i]['porte'] for i in ativos])[:, None]
+    base = porte * rng.lognormal(0.0, 0.4, size=(len(ativos), 6)) * (rng.random((len(ativos), 6)) < 0.85)
+    valores = np.floor(base).astype('int64')
+    quant = np.ceil(base / rng.uniform(2e4, 2e6, size=(len(ativos), 6))).astype('int64')
+    exp, imp, tex, tpx, ic, iv = range(6)
+    colunas = []
+    for q, v in [(quant[:, k], valores[:, k]) for k in (exp, imp, tex, tpx)]:
+        colunas += [q, v]
+    colunas += [quant[:, :4].sum(1), valores[:, :4].sum(1)]                      # Total do Primário
+    colunas += [quant[:, ic], valores[:, ic], quant[:, iv], valores[:, iv]]
+    colunas += [quant[:, 4:].sum(1), valores[:, 4:].sum(1)]                      # Total do Interbancário
+    colunas += [colunas[8] + colunas[14], colunas[9] + colunas[15]]               # Total
+    return np.column_stack(colunas)
+
+
+def _cabecalho(ano, mes, acumulado, conglomerado, n_campos):
+    vazio = ';' * (n_campos - 1)
+    if acumulado:
+        titulo = f'Registros de câmbio contratado - Acumulado Janeiro-{MESES_PT[mes - 1]}/{ano}'
+    elif conglomerado:
+        titulo = f'Registros de câmbio contratado em {MESES_PT[mes - 1]}/{ano}.'
+    else:
+        titulo = f'Registros de câmbio contratado em {MESES_PT[mes - 1].upper()} / {ano}'
+    diretoria = ('Diretoria de Fiscalização - Departamento de Monitoramento do Sistema Financeiro (Desig)'
+                 if conglomerado else 'Diretoria de Fiscalização - Depto de Monitoramento do Sistema Financeiro (Desig)')
+
+    texto = ['Rank ', 'CNPJ da Instituição' if ano >= ANO_CABECALHO_CNPJ else 'Código Instit.', ' Nome da Instituição ']
+    if conglomerado:
+        texto.append(' Conglomerado ')
+    quant = ' Quant. ' if ano > 2015 else ' Nº Oper. '
+    grupos, sub = [], [''] * len(texto)
+    for grupo in GRUPOS:
+        grupos += [f' {grupo} ', '']
+        sub += [quant, ' Valor (US$) ']
+    linha_grupos = ';'.join(texto + grupos)
+    linha_sub = ';'.join(sub)
+    return [
+        'Banco Central do Brasil' + vazio,
+        diretoria + vazio,
+        'Mercado de Câmbio - Ranking Mensal das Instituições Financeiras' + vazio,
+        vazio,
+        titulo + vazio,
+        linha_grupos + ';' * (n_campos - 1 - linha_grupos.count(';')),
+        linha_sub + ';' * (n_campos - 1 - linha_sub.count(';')),
+    ]
+
+
+def _rodape(ano, mes, conglomerado, n_campos, totais):
+    vazio = ';' * (n_campos - 1)
+    total = 'Total' + ';' * (4 if conglomerado else 3) + ';'.join(formatar_br(int(v)) for v in totais)
+    total += ';' * (n_campos - 1 - total.count(';'))
+    proximo = f'{mes % 12 + 1:02d}/{ano + mes // 12}'
+    if conglomerado:
+        return [total, vazio, 'Fonte: Sistema Câmbio.' + vazio, f'Obs1: Dados extraídos em: 28/{proximo}.' + vazio,
+                'Obs2: Os dados para o Mercado Primário não incluem os registros ACAM204 (Ingresso Direcionado).' + vazio,
+                'Obs3: Os dados para o Mercado Interbancário referem-se a registros de operações de arbitragens.' + vazio,
+                vazio]
+    return [vazio, total, f'"Fonte: Sistema Câmbio; Dados extraídos em: 10.{proximo.replace("/", ".")}"' + vazio,
+            'Obs. Os dados para o Mercado Interbancário incluem os registros de contratos de Arbitragens no País ' + vazio,
+            vazio, vazio, ';; ' + vazio[2:]]
+
+
+def _linhas_ranking(instituicoes, ativos, valores, indice_mes, conglomerado):
+    """Linhas de dados (texto para o CSV e valores para o XLSX), ordenadas pelo Total (US$)."""
+    ordem = np.argsort(-valores[:, -1], kind='stable')
+    csv, xlsx = [], []
+    for rank, k in enumerate(ordem, start=1):
+        inst = instituicoes[ativos[k]]
+        texto = [str(rank), inst['cnpj'], inst['nomes'][indice_mes]]
+        if conglomerado:
+            texto.append(inst['conglomerado'])
+        numeros = valores[k].tolist()
+        csv.append(';'.join(texto + [formatar_br(v) for v in numeros]) + (';' if conglomerado else ';;;;'))
+        xlsx.append([rank] + texto[1:] + numeros)
+    return csv, xlsx
+
+
+def _gravar_csv(caminho, linhas):
+    with open(caminho, 'w', encoding=ENCODING_BACEN, newline='\n') as f:
+        f.write('\n'.join(linhas) + '\n')
+    return os.path.getsize(caminho)
+
+
+def _aba_xlsx(wb, titulo, cabecalho, linhas, rodape):
+    ws = wb.create_sheet(titulo)
+    for linha in cabecalho:
+        ws.append([c or None for c in linha.split(';')])
+    for linha in linhas:
+        ws.append(linha)
+    for linha in rodape:
+        ws.append([c.strip() or None for c in linha.split(';')])
+
+
+def gerar_corpus(pasta, meses=24, instituicoes=150, ano_inicial=2015, semente=0, xlsx=True, acumulado=True):
+    """
+    Grava `meses` meses consecutivos a partir de janeiro de `ano_inicial`, com até
+    `instituicoes` instituições por mês. Devolve {arquivos, linhas, bytes} do que
+    foi gravado (linhas = linhas de dados dos CSVs mensais).
+    """
+    if xlsx:
+        import openpyxl
+
+    os.makedirs(pasta, exist_ok=True)
+    rng = np.random.default_rng(semente)
+    cadastro = _gerar_instituicoes(instituicoes, meses, rng)
+    resumo = {'arquivos': 0, 'linhas': 0, 'bytes': 0}
+    acumulados = {}
+
+    for indice_mes in range(meses):
+        ano, mes = ano_inicial + indice_mes // 12, indice_mes % 12 + 1
+        conglomerado = ano >= ANO_LAYOUT_CONGLOMERADO
+        n_campos = 23 if conglomerado else 25
+
+        ativos = [i for i, inst in enumerate(cadastro) if rng.random() < inst['atividade']]
+        valores = _valores_do_mes(cadastro, ativos, rng)
+        if mes == 1:
+            acumulados = {}
+        for i, linha in zip(ativos, valores):
+            acumulados[i] = acumulados.get(i, 0) + linha
+
+        saidas = [('mensal', ativos, valores)]
+        if acumulado:
+            ativos_acum = sorted(acumulados)
+            saidas.append(('acumulado', ativos_acum, np.array([acumulados[i] for i in ativos_acum])))
+
+        abas = []
+        for tipo, ativos_tipo, valores_tipo in saidas:
+            cabecalho = _cabecalho(ano, mes, tipo == 'acumulado', conglomerado, n_campos)
+            linhas_csv, linhas_xlsx = _linhas_ranking(cadastro, ativos_tipo, valores_tipo, indice_mes, conglomerado)
+            rodape = _rodape(ano, mes, conglomerado, n_campos, valores_tipo.sum(0))
+            resumo['bytes'] += _gravar_csv(os.path.join(pasta, f'ranking_{ano}-{mes:02d}_{tipo}.csv'),
+                                           cabecalho + linhas_csv + rodape)
+            resumo['arquivos'] += 1
+            if tipo == 'mensal':
+                resumo['linhas'] += len(linhas_csv)
+            abas.append((cabecalho, linhas_xlsx, rodape))
+
+        if xlsx:
+            wb = openpyxl.Workbook(write_only=True)
+            abrev = MESES_PT[mes - 1][:3]
+            for titulo, (cabecalho, linhas_xlsx, rodape) in zip([f'{abrev} {ano}', f'Jan-{abrev} {ano}'], abas):
+                _aba_xlsx(wb, titulo, cabecalho, linhas_xlsx, rodape)
+            caminho = os.path.join(pasta, f'ranking_{ano}-{mes:02d}.xlsx')
+            wb.save(caminho)
+            resumo['bytes'] += os.path.getsize(caminho)
+            resumo['arquivos'] += 1
+
+    return resumo
+
+
+def empacotar_em_zips(pasta, destino):
+    """
+    Empacota o corpus como o BACEN publica: um ZIP por mês, com os nomes originais
+    dos membros (ESTATCAMBIFAAAAMM-IF.csv, ..._acumulado.csv, .xlsx), gravado como o
+    modo ZIP do download deixa: ranking_AAAA-MM.zip. Devolve os bytes gravados.
+    """
+    os.makedirs(destino, exist_ok=True)
+    por_mes = {}
+    for nome in sorted(os.listdir(pasta)):
+        if nome.startswith('ranking_'):
+            por_mes.setdefault(nome[8:15], []).append(nome)
+
+    total = 0
+    for mes_ref, nomes in por_mes.items():
+        base = 'ESTATCAMBIF' + mes_ref.replace('-', '') + '-IF'
+        caminho = os.path.join(destino, f'ranking_{mes_ref}.zip')
+        with zipfile.ZipFile(caminho, 'w', zipfile.ZIP_DEFLATED) as z:
+            for nome in nomes:
+                sufixo = '_acumulado.csv' if nome.endswith('_acumulado.csv') else os.path.splitext(nome)[1]
+                z.write(os.path.join(pasta, nome), base + sufixo)
+        total += os.path.getsize(caminho)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pasta')
+    parser.add_argument('--meses', type=int, default=120)
+    parser.add_argument('--instituicoes', type=int, default=150)
+    parser.add_argument('--ano-inicial', type=int, default=2015)
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--sem-xlsx', action='store_true', help='Não grava os .xlsx (geração mais rápida).')
+    parser.add_argument('--sem-acumulado', action='store_true', help='Não grava os _acumulado.csv.')
+    args = parser.parse_args()
+
+    resumo = gerar_corpus(args.pasta, meses=args.meses, instituicoes=args.instituicoes, ano_inicial=args.ano_inicial,
+                          semente=args.semente, xlsx=not args.sem_xlsx, acumulado=not args.sem_acumulado)
+    print(f"✅ Corpus sintético em {args.pasta}: {resumo['arquivos']} arquivos, "
+          f"{resumo['linhas']} linhas mensais, {resumo['bytes'] / 1e6:.1f} MB.")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
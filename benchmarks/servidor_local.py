@@ -0,0 +1,74 @@
+"""
+Servidor HTTP local que imita o endpoint de rankings do BACEN nos benchmarks.
+
+Responde HEAD/GET apenas para os arquivos publicados e aplica uma latência
+artificial por requisição, para que os testes reflitam o custo de ida e volta
+sem depender do site real. Envia ETag/Last-Modified e responde 304 a GETs
+condicionais, como o servidor do BACEN.
+"""
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _HandlerBacen(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _responder(self, com_corpo):
+        time.sleep(self.server.latencia)
+        nome = self.path.rsplit('/', 1)[-1]
+        conteudo = self.server.arquivos.get(nome)
+        with self.server.trava:
+            self.server.requisicoes += 1
+
+        if conteudo is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        etag = '"' + hashlib.md5(conteudo).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/zip')
+        self.send_header('Content-Length', str(len(conteudo)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', self.server.last_modified)
+        self.end_headers()
+        if com_corpo:
+            self.wfile.write(conteudo)
+
+    def do_HEAD(self):
+        self._responder(com_corpo=False)
+
+    def do_GET(self):
+        self._responder(com_corpo=True)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def iniciar_servidor(arquivos, latencia=0.02):
+    """
+    Sobe o servidor em uma thread e retorna (servidor, base_url).
+
+    `arquivos` é um dicionário {nome_do_arquivo: bytes}; qualquer outro nome recebe 404.
+    """
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), _HandlerBacen)
+    servidor.daemon_threads = True
+    servidor.arquivos = arquivos
+    servidor.latencia = latencia
+    servidor.requisicoes = 0
+    servidor.last_modified = time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime())
+    servidor.trava = threading.Lock()
+
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    host, porta = servidor.server_address
+    return servidor, f'http://{host}:{porta}/'
@@ -1,99 +1,436 @@
-import sys
-import os
+"""
+Pipeline do ranking de câmbio do BACEN, uma etapa por subcomando:
+
+    discover   descobre o padrão de URL de cada mês pendente (cache_padroes_url.json)
+    download   baixa os meses pendentes e trata cada um enquanto o seguinte baixa
+    unify      consolida os arquivos mensais na base tratada (CSV + Parquet)
+    clean      compacta a base, separa a dimensão de instituições e grava o cubo e o SQLite
+    analyze    responde às perguntas do case a partir do cubo gravado
+    serve      abre o dashboard (streamlit run app_dashboard.py)
+
+Sem subcomando, roda de discover até analyze. Cada etapa grava em checkpoints.json
+(na pasta de dados) o SHA-256 das entradas e das saídas e é pulada enquanto nada disso
+mudar; --forcar ignora o checkpoint. Só uma etapa que precisa rodar importa new_lib
+(pandas, requests...): analyze com o cubo inalterado só reimprime o relatório gravado.
+
+Uso:
+    python main.py [discover|download|unify|clean|analyze|serve] [--destino PASTA] [--forcar] [--medir-memoria]
+"""
+import argparse
+import contextlib
 import datetime
-import importlib
-import requests as r
-import pandas as pd
-import new_lib as nl
-import zipfile as z 
+import hashlib
 import io
-import shutil 
+import json
+import os
+import subprocess
+import sys
 
-sys.path.append(r'C:\Users\Isis\Documents\webscrapping_bacen')
-print(dir(nl))
-print(nl.soma(2, 2))
-print(nl)
-print(pd)
+RAIZ = os.path.dirname(os.path.abspath(__file__))
 
+DESTINO_BASE = os.environ.get('BACEN_DESTINO', r'C:\Users\Isis\Documents\webscrapping_bacen\dados') # ALVO DE CONFIGURAÇÃO!
 
-DESTINO_BASE = r'C:\Users\Isis\Documents\webscrapping_bacen\dados' # ALVO DE CONFIGURAÇÃO!
-nl.criar_pasta(DESTINO_BASE)
-DESTINO_ZIP_FILES = os.path.join(DESTINO_BASE, 'zipfiles')
-nl.criar_pasta(DESTINO_ZIP_FILES)
+# Instrumentação: tempo, bytes, linhas e pico de memória de cada etapa vão para relatorio_execucao.json.
+MEDIR_MEMORIA = False  # True (ou --medir-memoria): pico por etapa via tracemalloc, ~4x mais lento
+GERAR_PERFIL = False  # True também grava o cProfile da etapa mais lenta (a execução fica mais lenta)
 
+# True: guarda só o ZIP original (ranking_AAAA-MM.zip) e lê os CSVs mensais direto dele, sem extrair;
+# acumulados e .xlsx ficam no ZIP e saem com nl.materializar_membro quando forem necessários.
+GUARDAR_SO_ZIPS = False
 
 ANO_INICIAL = 2015
-ANO_FINAL = datetime.date.today().year
-print('\n--- INICIANDO FASE DE DOWNLOAD DAS BASES NO BACEN ---')
-
-for ano in range(ANO_INICIAL, ANO_FINAL + 1):
-    mes_limite = datetime.date.today().month if ano == ANO_FINAL else 12
-
-    for mes in range(1, mes_limite + 1):
-        url_download = nl.gerar_info_data(ano, mes)
-        if url_download is None: continue
-
-        if nl.baixar_e_extrair_zip(url_download, DESTINO_ZIP_FILES, ano, mes):
-            print(f'Download e extração de {ano}-{mes} concluídos.')
-        else:
-            print(f'Arquivo não encontrado para {ano}-{mes}. Continuando processo de download.')
-
-
-# BLOCO DE EXECUÇÃO MANUAL PARA 2014 (URLS QUE NÃO SEGUEM PADRÃO):
-
-URLS_MANUAIS_2014 = [
-    r'https://www.bcb.gov.br/content/estatisticas/rankingcambioinstituicoes/ESTATCAMBIF201412-IF-201412.zip',
-    r'https://www.bcb.gov.br/content/estatisticas/rankingcambioinstituicoes/ESTATCAMBIF201410-AT_2014-10.zip',
-    r'https://www.bcb.gov.br/content/estatisticas/rankingcambioinstituicoes/ESTATCAMBIF201409-IF-201409.zip',
-    r'https://www.bcb.gov.br/content/estatisticas/rankingcambioinstituicoes/ESTATCAMBIF201408-IF-201408.zip',
-    r'https://www.bcb.gov.br/content/estatisticas/rankingcambioinstituicoes/ESTATCAMBIF201407-IF-201407.zip',
-    r'https://www.bcb.gov.br/content/estatisticas/rankingcambioinstituicoes/ESTATCAMBIF201406-IF-201406.zip',
-    r'https://www.bcb.gov.br/content/estatisticas/rankingcambioinstituicoes/ESTATCAMBIF201405-IF-201405.zip',
-    r'https://www.bcb.gov.br/content/estatisticas/rankingcambioinstituicoes/ESTATCAMBIF201404-IF-201404.zip',
-    r'https://www.bcb.gov.br/content/estatisticas/rankingcambioinstituicoes/ESTATCAMBIF201403-IF-201403.zip',
-    r'https://www.bcb.gov.br/content/estatisticas/rankingcambioinstituicoes/ESTATCAMBIF201402-IF-201402.zip',
-    r'https://www.bcb.gov.br/content/estatisticas/rankingcambioinstituicoes/ESTATCAMBIF201401-IF_201401.zip',
-         ]
-
-print("\n--- INICIANDO DOWNLOAD MANUAL PARA 2014 ---")
-for url_fixa in URLS_MANUAIS_2014:
-    if nl.baixar_e_extrair_zip(url_fixa, DESTINO_ZIP_FILES, 2014, 0):
-        print(f'Download e extração de {url_fixa} concluídos.')
-    else:
-        print(f'Arquivo não encontrado para {url_fixa}. Continuando.')
-
-print("--- Download de 2014 concluído. ---")
-
-print('---Fim da aquisição. Unificando todas as bases.')
-df_consolidado = nl.unificar_bases(DESTINO_ZIP_FILES)
-print(f"DEBUG: df_consolidado (type): {type(df_consolidado)}")
-
-df_limpo = None 
-
-if df_consolidado is not None:
+
+# Fonte dos arquivos: site do BACEN ou um espelho HTTP local com os mesmos nomes de arquivo.
+BASE_URL = os.environ.get('BACEN_BASE_URL')  # ex.: 'http://localhost:8000/' (None: nl.BASE_URL, o site do BACEN)
+# Cache record/replay: cada arquivo baixado fica gravado por conteúdo e é servido do disco nas próximas execuções.
+PASTA_GRAVACOES = None  # ex.: os.path.join(DESTINO_BASE, 'gravacoes_bacen') (None: BACEN_GRAVACOES)
+MODO_GRAVACOES = None   # 'cache' | 'gravar' | 'reproduzir' (sem rede, para máquinas offline)
+
+# Download e tratamento sobrepostos: cada mês baixado entra numa fila limitada e é tratado
+# (partição no cache de consolidação) enquanto os seguintes ainda estão baixando.
+TAMANHO_FILA_PIPELINE = 4
+# Tratamento em processos em vez de threads (seguro agora que o script tem a guarda __main__).
+TRATAR_EM_PROCESSOS = False
+
+# True: cada arquivo é tratado e gravado direto no CSV/Parquet final (pico de memória ~ um mês, sem o
+# cache de partições); a análise lê a base já gravada em Parquet.
+CONSOLIDAR_EM_STREAMING = False
+# True: ao final, responde às perguntas por ano também pelos acumulados do BACEN (um arquivo por ano) e
+# confere as somas contra a base mensal (meses faltando ou revisões grandes aparecem como divergência).
+CONFERIR_ACUMULADOS = True
+
+ARQUIVO_CHECKPOINTS = 'checkpoints.json'
+ARQUIVO_RELATORIO_ANALISE = 'relatorio_analise.txt'
+ETAPAS = ('discover', 'download', 'unify', 'clean', 'analyze')
+# O código que trata e agrega também é entrada: mudar o new_lib.py refaz unify, clean e analyze.
+CODIGO_TRATAMENTO = os.path.join(RAIZ, 'new_lib.py')
+
+
+def meses_backfill(hoje=None):
+    """(ano, mes) de ANO_INICIAL até o mês corrente."""
+    hoje = hoje or datetime.date.today()
+    return [(ano, mes) for ano in range(ANO_INICIAL, hoje.year + 1)
+            for mes in range(1, (hoje.month if ano == hoje.year else 12) + 1)]
+
+
+# =======================================================
+# CHECKPOINTS (SHA-256 DAS ENTRADAS E SAÍDAS DE CADA ETAPA)
+# =======================================================
+
+def _arquivos(caminhos):
+    """Arquivos sob os caminhos (pastas percorridas recursivamente), em ordem estável."""
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            for raiz, pastas, nomes in os.walk(caminho):
+                pastas.sort()
+                for nome in sorted(nomes):
+                    yield os.path.join(raiz, nome)
+        elif os.path.exists(caminho):
+            yield caminho
+
+def _sha256(caminho):
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+def _dentro(caminho, pasta):
+    pasta = os.path.abspath(pasta)
+    return os.path.abspath(caminho).startswith(pasta + os.sep)
+
+class Checkpoints:
+    """
+    checkpoints.json da pasta de dados: para cada etapa, a impressão (SHA-256) das entradas
+    e das saídas gravadas na última execução bem-sucedida.
+
+    O hash de cada arquivo fica guardado com tamanho e mtime: arquivos não tocados não são
+    relidos, então conferir uma etapa custa só um os.stat por arquivo.
+    """
+
+    def __init__(self, destino):
+        self.destino = destino
+        self.caminho = os.path.join(destino, ARQUIVO_CHECKPOINTS)
+        try:
+            with open(self.caminho, encoding='utf-8') as f:
+                dados = json.load(f)
+        except (OSError, ValueError):
+            dados = {}
+        self.etapas = dados.get('etapas', {})
+        self.hashes = dados.get('hashes', {})
+
+    def impressao(self, caminhos, parametros=None):
+        """SHA-256 do conteúdo de todos os arquivos sob `caminhos` mais os `parametros`."""
+        partes = [json.dumps(parametros, sort_keys=True, default=str)]
+        for arquivo in _arquivos(caminhos):
+            relativo = os.path.relpath(arquivo, self.destino) if _dentro(arquivo, self.destino) else os.path.abspath(arquivo)
+            estado = os.stat(arquivo)
+            guardado = self.hashes.get(relativo)
+            if guardado and guardado[:2] == [estado.st_size, estado.st_mtime_ns]:
+                sha256 = guardado[2]
+            else:
+                sha256 = _sha256(arquivo)
+                self.hashes[relativo] = [estado.st_size, estado.st_mtime_ns, sha256]
+            partes.append(f'{relativo}:{sha256}')
+        return hashlib.sha256('\n'.join(partes).encode('utf-8')).hexdigest()
+
+    def em_dia(self, etapa, entradas, saidas):
+        """Registro da etapa se as entradas são as mesmas e as saídas continuam como foram gravadas."""
+        registro = self.etapas.get(etapa)
+        if registro and registro['entradas'] == entradas and registro['saidas'] == self.impressao(saidas):
+            return registro
+        return None
+
+    def registrar(self, etapa, entradas, saidas):
+        self.etapas[etapa] = {
+            'entradas': entradas,
+            'saidas': self.impressao(saidas),
+            'concluida_em': datetime.datetime.now().isoformat(timespec='seconds'),
+        }
+        self.salvar()
+
+    def salvar(self):
+        self.hashes = {k: v for k, v in self.hashes.items() if os.path.exists(os.path.join(self.destino, k))}
+        temporario = f'{self.caminho}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({'etapas': self.etapas, 'hashes': self.hashes}, f, ensure_ascii=False, indent=1)
+        os.replace(temporario, self.caminho)
+
+
+class _Eco(io.StringIO):
+    """Saída que também é guardada (o relatório do analyze é reimpresso quando a etapa é pulada)."""
+
+    def __init__(self, saida):
+        super().__init__()
+        self.saida = saida
+
+    def write(self, texto):
+        self.saida.write(texto)
+        return super().write(texto)
+
+
+# =======================================================
+# ETAPAS
+# =======================================================
+
+class Pipeline:
+    """Etapas do pipeline sobre a pasta `destino`; new_lib só é importado por uma etapa que vai rodar."""
+
+    def __init__(self, destino, forcar=False, medir_memoria=MEDIR_MEMORIA):
+        self.destino = destino
+        self.forcar = forcar
+        self.medir_memoria = medir_memoria
+        os.makedirs(destino, exist_ok=True)
+        self.checkpoints = Checkpoints(destino)
+        self.pasta_zips = os.path.join(destino, 'zipfiles')
+        # Mesmos nomes de nl.ARQUIVO_CSV_FINAL, nl.PASTA_PARQUET etc.: conferir checkpoints não importa new_lib.
+        self.cache_padroes = os.path.join(destino, 'cache_padroes_url.json')
+        self.manifesto = os.path.join(destino, 'manifesto_downloads.json')
+        self.cache_encoding = os.path.join(destino, 'cache_encoding.json')
+        self.cache_consolidacao = os.path.join(destino, 'cache_consolidacao')
+        self.csv_final = os.path.join(destino, 'base_final_tratada_unica.csv')
+        self.pasta_parquet = os.path.join(destino, 'base_final_parquet')
+        self.pasta_cubo = os.path.join(destino, 'cubo_agregados')
+        self.arquivo_sqlite = os.path.join(destino, 'base_final.sqlite')
+        self.relatorio_analise = os.path.join(destino, ARQUIVO_RELATORIO_ANALISE)
+        self._nl = None
+        self._sessao = None
+        self._instrumentacao = None
+        self._urls = None
+        self._base = None  # base tratada / cubo em memória, repassados entre etapas da mesma execução
+        self._cubo = None
+
+    @property
+    def nl(self):
+        if self._nl is None:
+            import new_lib
+            self._nl = new_lib
+            self._instrumentacao = new_lib.iniciar_instrumentacao(memoria=self.medir_memoria, perfil=GERAR_PERFIL)
+        return self._nl
+
+    @property
+    def sessao(self):
+        # Uma única sessão (pool keep-alive + retry) atende descoberta e downloads.
+        if self._sessao is None:
+            self._sessao = self.nl.criar_sessao(gravacoes=PASTA_GRAVACOES, modo_gravacoes=MODO_GRAVACOES)
+        return self._sessao
+
+    def _rodar(self, etapa, entradas, parametros, saidas, funcao):
+        """
+        Roda `funcao` se entradas/parâmetros ou saídas mudaram desde o checkpoint.
+
+        Retorna 'pulada', 'concluida' ou None (a etapa rodou e não produziu resultado).
+        """
+        impressao = self.checkpoints.impressao(entradas, parametros)
+        registro = None if self.forcar else self.checkpoints.em_dia(etapa, impressao, saidas)
+        if registro:
+            print(f"⏭️ {etapa}: entradas inalteradas desde {registro['concluida_em']}; etapa pulada.")
+            return 'pulada'
+        print(f'\n--- ETAPA {etapa.upper()} ---')
+        if not funcao():
+            print(f'❌ {etapa}: etapa sem resultado; checkpoint não gravado.')
+            return None
+        self.checkpoints.registrar(etapa, impressao, saidas)
+        return 'concluida'
+
+    def _meses_pendentes(self):
+        # Manifesto: meses já adquiridos são pulados antes de qualquer requisição. Os meses mais
+        # recentes podem ser republicados pelo BACEN: são revalidados com GET condicional.
+        nl = self.nl
+        backfill = meses_backfill()
+        manifesto = nl.carregar_manifesto(self.manifesto)
+        revalidar = set(backfill[-2:])
+        pendentes = [(ano, mes) for ano, mes in backfill
+                     if (ano, mes) in revalidar or not nl.mes_adquirido(manifesto, ano, mes, self.pasta_zips)]
+        print(f'{len(backfill) - len(pendentes)} meses já adquiridos (manifesto). {len(pendentes)} meses a processar.')
+        return pendentes, revalidar, manifesto
+
+    def _descobrir(self, pendentes):
+        # Testa todos os meses/padrões em paralelo; o padrão vencedor de cada mês fica em cache.
+        # Na mesma execução o download reaproveita o resultado do discover em vez de testar de novo.
+        if self._urls is None:
+            self._urls = self.nl.descobrir_urls(pendentes, base_url=BASE_URL or self.nl.BASE_URL,
+                                                caminho_cache=self.cache_padroes, sessao=self.sessao)
+        return self._urls
+
+    def discover(self):
+        def executar():
+            self._descobrir(self._meses_pendentes()[0])
+            return True
+        # Um mês novo no calendário muda os parâmetros; publicações atrasadas o download ainda procura.
+        parametros = {'base_url': BASE_URL, 'ultimo_mes': meses_backfill()[-1]}
+        return self._rodar('discover', [], parametros, [self.cache_padroes], executar) is not None
+
+    def download(self):
+        def executar():
+            nl = self.nl
+            os.makedirs(self.pasta_zips, exist_ok=True)
+            pendentes, revalidar, manifesto = self._meses_pendentes()
+            urls_encontradas = self._descobrir(pendentes)
+            tarefas = [(urls_encontradas[(ano, mes)], ano, mes, (ano, mes) in revalidar)
+                       for ano, mes in pendentes if (ano, mes) in urls_encontradas]
+            # 2014: URLs que não seguem padrão.
+            tarefas += [(url_fixa, 2014, 0, False) for url_fixa in nl.urls_manuais_2014(BASE_URL or nl.BASE_URL)]
+            resultados = nl.adquirir_em_pipeline(
+                tarefas, self.pasta_zips, self.cache_consolidacao, sessao=self.sessao, manifesto=manifesto,
+                caminho_manifesto=self.manifesto, tamanho_fila=TAMANHO_FILA_PIPELINE,
+                processos=TRATAR_EM_PROCESSOS, manter_zip=GUARDAR_SO_ZIPS, caminho_cache_encoding=self.cache_encoding,
+            )
+            for (url_download, ano, mes, _), sucesso in zip(tarefas, resultados):
+                if not sucesso:
+                    print(f'Arquivo não encontrado para {ano}-{mes} ({url_download}). Continuando.')
+            return any(resultados) or not tarefas
+        # O dia entra nos parâmetros: meses recentes são revalidados no máximo uma vez por dia.
+        parametros = {'base_url': BASE_URL, 'dia': datetime.date.today(), 'so_zips': GUARDAR_SO_ZIPS}
+        return self._rodar('download', [self.cache_padroes], parametros, [self.manifesto, self.pasta_zips], executar) is not None
+
+    def unify(self):
+        def executar():
+            nl = self.nl
+            if CONSOLIDAR_EM_STREAMING:
+                # No modo streaming o CSV e o Parquet são gravados durante a consolidação; a base não
+                # é recarregada aqui (o pico de memória fica em um mês).
+                return bool(nl.consolidar_em_streaming(self.pasta_zips, self.csv_final, self.pasta_parquet,
+                                                       caminho_cache_encoding=self.cache_encoding))
+            df_limpo = nl.consolidar_incremental(self.pasta_zips, self.cache_consolidacao,
+                                                 caminho_cache_encoding=self.cache_encoding)
+            if df_limpo is None or len(df_limpo) == 0:
+                return False
+            # Requisito 3.b: Salvar arquivo final em disco
+            with nl.medir_etapa('salvar_csv', linhas=len(df_limpo)) as registro:
+                df_limpo.to_csv(self.csv_final, index=False, sep=';', encoding='utf-8-sig')
+                registro['bytes'] = os.path.getsize(self.csv_final)
+            # Cópia colunar (Parquet particionado por ano) lida pelo dashboard; exige pyarrow.
+            nl.salvar_base_parquet(df_limpo, self.pasta_parquet)
+            self._base = df_limpo
+            print(f'A base tratada foi salva em: {self.csv_final}')
+            return True
+        return self._rodar('unify', [self.pasta_zips, CODIGO_TRATAMENTO], {'streaming': CONSOLIDAR_EM_STREAMING},
+                           [self.csv_final, self.pasta_parquet], executar) is not None
+
+    def clean(self):
+        def executar():
+            nl = self.nl
+            if CONSOLIDAR_EM_STREAMING:
+                # Sem a base inteira em memória: o cubo sai só das COLUNAS_ANALISE e o SQLite é
+                # sincronizado um ano (partição Parquet) por vez.
+                df_limpo = nl.carregar_base_final(self.destino, colunas=nl.COLUNAS_ANALISE)
+                base_sqlite = (nl.iterar_base_parquet_por_ano(self.pasta_parquet) if nl.pa is not None
+                               else nl.carregar_base_final(self.destino))
+            else:
+                df_limpo = self._base if self._base is not None else nl.carregar_base_final(self.destino)
+                base_sqlite = df_limpo
+            if df_limpo is None or len(df_limpo) == 0:
+                return False
+            # Base consultável por SQL (nl.consultar_sql, consultas prontas em nl.CONSULTAS_SQL): só meses novos
+            # ou alterados são regravados no SQLite.
+            nl.atualizar_base_sqlite(self.arquivo_sqlite, base_sqlite)
+            # Base compacta (category/int): menos memória e agrupamentos mais rápidos no cubo.
+            df_compacto = nl.compactar_base(df_limpo)
+            # Fato com Id_Instituicao + dimensão por raiz de CNPJ: nomes antigos e grafias somam juntos.
+            df_fato, dimensao_instituicoes = nl.separar_dimensao_instituicoes(df_compacto)
+            self._cubo = nl.construir_cubo(df_fato, dimensao_instituicoes)
+            # Agregados prontos para o dashboard e o analyze responderem às perguntas sem varrer a base.
+            nl.salvar_cubo(self._cubo, self.pasta_cubo)
+            return True
+        return self._rodar('clean', [self.csv_final, CODIGO_TRATAMENTO], None, [self.pasta_cubo, self.arquivo_sqlite], executar) is not None
+
+    def analyze(self):
+        def executar():
+            nl = self.nl
+            cubo = self._cubo if self._cubo is not None else nl.carregar_cubo(self.pasta_cubo)
+            if cubo is None:
+                print(f'🛑 Cubo não encontrado em {self.pasta_cubo}: rode antes as etapas unify e clean.')
+                return False
+            eco = _Eco(sys.stdout)
+            with contextlib.redirect_stdout(eco):
+                if nl.analisar_dados(cubo) is None:
+                    return False
+                if CONFERIR_ACUMULADOS:
+                    nl.analisar_acumulados(self.pasta_zips, cubo, caminho_cache_encoding=self.cache_encoding)
+            with open(self.relatorio_analise, 'w', encoding='utf-8') as f:
+                f.write(eco.getvalue())
+            return True
+        entradas = [self.pasta_cubo, CODIGO_TRATAMENTO] + ([self.pasta_zips] if CONFERIR_ACUMULADOS else [])
+        situacao = self._rodar('analyze', entradas, {'acumulados': CONFERIR_ACUMULADOS}, [self.relatorio_analise],
+                               executar)
+        if situacao == 'pulada':
+            with open(self.relatorio_analise, encoding='utf-8') as f:
+                print(f.read(), end='')
+        return situacao is not None
+
+    def encerrar(self):
+        """Resumo e relatorio_execucao.json da instrumentação, se alguma etapa rodou."""
+        if self._instrumentacao is None:
+            return
+        self.nl.encerrar_instrumentacao()
+        self._instrumentacao.imprimir_resumo()
+        self._instrumentacao.salvar_relatorio(
+            os.path.join(self.destino, 'relatorio_execucao.json'),
+            caminho_perfil=os.path.join(self.destino, 'perfil_etapa_mais_lenta.prof') if GERAR_PERFIL else None,
+        )
+
+
+def servir(destino, porta=None):
+    """Abre o dashboard com a pasta de dados `destino` (BACEN_PASTA_DADOS)."""
+    comando = [sys.executable, '-m', 'streamlit', 'run', os.path.join(RAIZ, 'app_dashboard.py')]
+    if porta:
+        comando += ['--server.port', str(porta)]
+    ambiente = dict(os.environ, BACEN_PASTA_DADOS=os.path.abspath(destino))
+    return subprocess.call(comando, cwd=RAIZ, env=ambiente)
+
+
+def main(argv=None):
+    # As opções valem antes ou depois do subcomando (SUPPRESS: o subcomando não sobrescreve o padrão).
+    def opcoes(parser, padrao):
+        parser.add_argument('--destino', default=padrao(DESTINO_BASE),
+                            help='Pasta de dados (padrão: DESTINO_BASE ou BACEN_DESTINO).')
+        parser.add_argument('--forcar', action='store_true', default=padrao(False),
+                            help='Roda as etapas mesmo com o checkpoint em dia.')
+        parser.add_argument('--medir-memoria', action='store_true', default=padrao(MEDIR_MEMORIA),
+                            help='Mede o pico de memória de cada etapa (tracemalloc; bem mais lento).')
+        return parser
+
+    parser = opcoes(argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter),
+                    lambda valor: valor)
+    comuns = opcoes(argparse.ArgumentParser(add_help=False), lambda valor: argparse.SUPPRESS)
+    subcomandos = parser.add_subparsers(dest='comando', metavar='etapa')
+    for etapa in ETAPAS:
+        subcomandos.add_parser(etapa, parents=[comuns], help=f'Só a etapa {etapa}.')
+    serve = subcomandos.add_parser('serve', help='Abre o dashboard (streamlit).')
+    serve.add_argument('--destino', default=argparse.SUPPRESS, help='Pasta de dados lida pelo dashboard.')
+    serve.add_argument('--porta', type=int)
+    args = parser.parse_args(argv)
+
+    if args.comando == 'serve':
+        return servir(args.destino, args.porta)
+
+    pipeline = Pipeline(args.destino, forcar=args.forcar, medir_memoria=args.medir_memoria)
     try:
-        df_limpo = nl.tratar_dados(df_consolidado)
-        
-        # CHAMA A FASE DE ANÁLISE!
-        if df_limpo is not None:
-            nl.analisar_dados(df_limpo)
-
-    except Exception as e:
-        print(f"ERRO CRÍTICO no tratamento dos dados: {e}")
-
-# Requisito 3.b: Salvar arquivo final em disco
-if df_limpo is not None and len(df_limpo) > 0:
-    NOME_ARQUIVO_FINAL = os.path.join(DESTINO_BASE, 'base_final_tratada_unica.csv')
-
-    # Correção do Encoding
-    df_limpo.to_csv(NOME_ARQUIVO_FINAL, index=False, sep=';', encoding= 'utf-8-sig')
-
-    print("\n========================================================")
-    print(f"SUCESSO! PROJETO CONCLUÍDO.")
-    print(f"A base tratada foi salva em: {NOME_ARQUIVO_FINAL}")
-    print("========================================================")
-else:
-    print("\n========================================================")
-    print("FALHA CRÍTICA! O DataFrame final (df_limpo) é nulo ou vazio. O arquivo não foi salvo.")
-    print("Verifique as etapas de unificação (unificar_bases) ou tratamento (tratar_dados).")
-    print("========================================================")
\ No newline at end of file
+        if args.comando:
+            return 0 if getattr(pipeline, args.comando)() else 1
+        print('\n--- INICIANDO O PIPELINE (DISCOVER → ANALYZE) ---')
+        for etapa in ETAPAS:
+            try:
+                ok = getattr(pipeline, etapa)()
+            except Exception as e:
+                print(f"ERRO CRÍTICO na etapa {etapa}: {e}")
+                ok = False
+            # Falhas na aquisição não impedem consolidar o que já foi baixado.
+            if not ok and etapa not in ('discover', 'download'):
+                print("\n========================================================")
+                print(f"FALHA CRÍTICA! A etapa {etapa} não produziu resultado; as seguintes não rodaram.")
+                print("Verifique as etapas de unificação (consolidar_incremental) ou tratamento (tratar_dados).")
+                print("========================================================")
+                return 1
+        print("\n========================================================")
+        print("SUCESSO! PROJETO CONCLUÍDO.")
+        print(f"A base tratada está em: {pipeline.csv_final}")
+        print("========================================================")
+        return 0
+    finally:
+        pipeline.encerrar()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,10 +4,37 @@ import zipfile
 import io
 import os
 import datetime
+import numpy as np
 import pandas as pd
 import unicodedata 
 import shutil 
-import chardet 
+import codecs
+import json
+import hashlib
+import tempfile
+import threading
+import queue
+import itertools
+import time
+import tracemalloc
+import cProfile
+import contextlib
+import functools
+import pathlib
+import sqlite3
+from dataclasses import dataclass
+from http import HTTPStatus
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # saída Parquet é opcional; sem pyarrow o pipeline segue só com o CSV
+    pa = ds = pq = None
 
 # =======================================================
 # UTILS GERAIS
@@ -22,6 +49,50 @@ def criar_pasta(caminho):
     os.makedirs(caminho, exist_ok=True)
     print(f"Pasta criada/verificada: {caminho}")
 
+def chave_mes(ano, mes):
+    """Chave textual 'AAAA-MM' usada nos caches e manifestos."""
+    return f'{ano}-{str(mes).zfill(2)}'
+
+def ler_json(caminho):
+    """Lê um dicionário JSON do disco (vazio se o arquivo não existir ou estiver corrompido)."""
+    if not caminho or not os.path.exists(caminho):
+        return {}
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        print(f"⚠️ Arquivo JSON ilegível, ignorando: {caminho}")
+        return {}
+
+def gravar_json_atomico(dados, caminho):
+    """Grava um dicionário em JSON de forma atômica (arquivo temporário + os.replace)."""
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(dict(sorted(dados.items())), f, indent=2, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+def nome_padronizado(nome_original, ano, mes):
+    """
+    Traduz o nome de um arquivo do BACEN para o padrão limpo:
+    ranking_AAAA-MM_mensal.csv, ranking_AAAA-MM_acumulado.csv ou ranking_AAAA-MM.xlsx.
+    Retorna None para arquivos que não interessam ao pipeline.
+    """
+    nome_limpo = unicodedata.normalize('NFKD', nome_original).encode('ascii', 'ignore').decode('ascii').lower()
+    ext = os.path.splitext(nome_original)[1].lower()
+    mes_str = str(mes).zfill(2)
+    ano_str = str(ano)
+
+    if "acumulado" in nome_limpo:
+        return f"ranking_{ano_str}-{mes_str}_acumulado{ext}"
+
+    elif ext == '.csv' and "mensal" not in nome_limpo and "acumulado" not in nome_limpo:
+        return f"ranking_{ano_str}-{mes_str}_mensal{ext}"
+
+    elif ext in ['.xlsx', '.xls']:
+        return f"ranking_{ano_str}-{mes_str}{ext}"
+
+    return None
+
 def renomear_arquivos_extraidos(dest_dir, ano, mes):
     """
     Renomeia arquivos extraídos do ZIP para um padrão limpo:
@@ -29,24 +100,11 @@ def renomear_arquivos_extraidos(dest_dir, ano, mes):
     """
     for nome_original in os.listdir(dest_dir):
         caminho_antigo = os.path.join(dest_dir, nome_original)
-        nome_limpo = unicodedata.normalize('NFKD', nome_original).encode('ascii', 'ignore').decode('ascii').lower()
 
         if not os.path.isfile(caminho_antigo):
             continue
 
-        ext = os.path.splitext(nome_original)[1].lower()
-        novo_nome = None
-        mes_str = str(mes).zfill(2)
-        ano_str = str(ano)
-
-        if "acumulado" in nome_limpo:
-            novo_nome = f"ranking_{ano_str}-{mes_str}_acumulado{ext}"
-
-        elif ext == '.csv' and "mensal" not in nome_limpo and "acumulado" not in nome_limpo:
-            novo_nome = f"ranking_{ano_str}-{mes_str}_mensal{ext}"
-
-        elif ext in ['.xlsx', '.xls']:
-            novo_nome = f"ranking_{ano_str}-{mes_str}{ext}"
+        novo_nome = nome_padronizado(nome_original, ano, mes)
 
         if novo_nome:
             caminho_novo = os.path.join(dest_dir, novo_nome)
@@ -61,72 +119,678 @@ def renomear_arquivos_extraidos(dest_dir, ano, mes):
 def detectar_encoding(caminho, amostra=40000):
     """Detecta o encoding do arquivo."""
     try:
+        import chardet  # lento de importar e só usado como último recurso
         with open(caminho, 'rb') as f:
             return chardet.detect(f.read(amostra)).get('encoding', 'latin1')
     except Exception:
         return 'latin1'
 
+_CACHE_ENCODING = {}
+
+def chave_arquivo(caminho):
+    """Identifica a versão de um arquivo (ou membro de ZIP armazenado) por caminho absoluto, tamanho e mtime."""
+    tamanho, mtime_ns = info_arquivo(caminho)
+    return f'{os.path.abspath(caminho)}|{tamanho}|{mtime_ns}'
+
+# utf-8 e cp1252 cobrem quase todos os arquivos; cp850 cobre as exportações em formato DOS (ex.: 2014).
+CANDIDATOS_ENCODING = ('utf-8', 'cp1252', 'cp850')
+
+def _encoding_rapido(amostra_bytes):
+    """Retorna o primeiro candidato que decodifica a amostra em modo estrito e de forma legível."""
+    for enc in CANDIDATOS_ENCODING:
+        try:
+            # Decodificador incremental: um caractere multibyte cortado no fim da amostra não é erro.
+            texto = codecs.getincrementaldecoder(enc)().decode(amostra_bytes, final=False)
+        except UnicodeDecodeError:
+            continue
+        # O cabeçalho do BACEN cita "Instituição": se o termo aparece, precisa sair legível.
+        if 'Institui' in texto and 'Instituição' not in texto:
+            continue
+        if enc == 'utf-8' and amostra_bytes.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        return enc
+    return None
+
+def resolver_encoding(caminho, amostra=40000, cache=None):
+    """
+    Resolve o encoding de um arquivo: candidatos estritos (utf-8, cp1252, cp850) primeiro,
+    chardet só se nenhum deles servir.
+
+    O resultado fica em `cache` (por padrão, um cache do módulo) sob a chave
+    (caminho, tamanho, mtime), então o mesmo arquivo nunca é analisado duas vezes.
+    """
+    cache = _CACHE_ENCODING if cache is None else cache
+    try:
+        chave = chave_arquivo(caminho)
+    except OSError:
+        return 'latin1'
+
+    if chave not in cache:
+        amostra_bytes = ler_bytes(caminho, amostra)
+        enc = _encoding_rapido(amostra_bytes)
+        if enc is None:
+            import chardet
+            with medir_etapa('chardet', arquivo=os.path.basename(caminho), bytes=len(amostra_bytes)):
+                enc = chardet.detect(amostra_bytes).get('encoding')
+        cache[chave] = enc or 'latin1'
+
+    return cache[chave]
+
+# =======================================================
+# INSTRUMENTAÇÃO (TEMPO, BYTES, LINHAS E MEMÓRIA POR ETAPA)
+# =======================================================
+
+class Instrumentacao:
+    """
+    Registra cada etapa do pipeline: tempo de parede, bytes, linhas e pico de memória.
+
+    Etapas podem ser aninhadas (consolidar_incremental -> arquivo -> layout) e cada
+    registro guarda o caminho completo ('consolidar_incremental/arquivo/layout').
+    Com `memoria=True` o tracemalloc fica ligado e o pico de uma etapa é o máximo
+    alocado acima do que já estava em uso quando ela começou. O tracemalloc tem um
+    único pico para o processo: só etapas da thread principal medem pico (as das
+    threads de trabalho, como no adquirir_em_pipeline, ficam sem pico_memoria_mb), e
+    o pico delas inclui o que outras threads alocaram no mesmo intervalo. Com `perfil=True` cada
+    etapa de primeiro nível roda sob cProfile e salvar_relatorio grava o perfil da
+    mais lenta.
+    """
+
+    def __init__(self, memoria=True, perfil=False):
+        self.memoria, self.perfil = memoria, perfil
+        self.registros = []
+        self.inicio = datetime.datetime.now().isoformat(timespec='seconds')
+        self._relogio = time.perf_counter()
+        self._trava = threading.Lock()
+        self._local = threading.local()
+        self._perfis = {}
+        self._ligou_tracemalloc = memoria and not tracemalloc.is_tracing()
+        if self._ligou_tracemalloc:
+            tracemalloc.start()
+
+    def _pilha(self):
+        if not hasattr(self._local, 'pilha'):
+            self._local.pilha = []
+        return self._local.pilha
+
+    def registro_atual(self):
+        """Registro da etapa mais interna em andamento nesta thread (ou um dict descartável)."""
+        pilha = self._pilha()
+        return pilha[-1] if pilha else {}
+
+    @contextlib.contextmanager
+    def etapa(self, nome, **detalhes):
+        pilha = self._pilha()
+        pai = pilha[-1] if pilha else None
+        registro = {'etapa': f"{pai['etapa']}/{nome}" if pai else nome, 'nivel': len(pilha),
+                    'inicio_s': round(time.perf_counter() - self._relogio, 6), **detalhes}
+
+        # reset_peak é global: uma thread de trabalho zeraria o pico de uma etapa em andamento na principal.
+        if self.memoria and tracemalloc.is_tracing() and threading.current_thread() is threading.main_thread():
+            atual, pico = tracemalloc.get_traced_memory()
+            if pai is not None:
+                pai['_pico'] = max(pai['_pico'], pico)
+            tracemalloc.reset_peak()
+            registro['_base'] = registro['_pico'] = atual
+
+        perfil = None
+        if self.perfil and pai is None and threading.current_thread() is threading.main_thread():
+            perfil = cProfile.Profile()
+            perfil.enable()
+
+        pilha.append(registro)
+        inicio = time.perf_counter()
+        try:
+            yield registro
+        finally:
+            registro['tempo_s'] = round(time.perf_counter() - inicio, 6)
+            pilha.pop()
+            if perfil is not None:
+                perfil.disable()
+            if '_base' in registro:
+                registro['_pico'] = max(registro['_pico'], tracemalloc.get_traced_memory()[1])
+                if pai is not None:
+                    pai['_pico'] = max(pai['_pico'], registro['_pico'])
+                registro['pico_memoria_mb'] = round((registro.pop('_pico') - registro.pop('_base')) / 1e6, 3)
+            with self._trava:
+                if perfil is not None:
+                    self._perfis[len(self.registros)] = perfil
+                self.registros.append(registro)
+
+    def resumo(self):
+        """Totais por caminho de etapa (na ordem em que apareceram): execuções, tempo, bytes, linhas e maior pico."""
+        resumo = {}
+        for registro in sorted(self.registros, key=lambda r: r['inicio_s']):
+            item = resumo.setdefault(registro['etapa'], {'execucoes': 0, 'tempo_s': 0.0, 'bytes': 0, 'linhas': 0})
+            item['execucoes'] += 1
+            item['tempo_s'] = round(item['tempo_s'] + registro['tempo_s'], 6)
+            item['bytes'] += int(registro.get('bytes') or 0)
+            item['linhas'] += int(registro.get('linhas') or 0)
+            if 'pico_memoria_mb' in registro:
+                item['pico_memoria_mb'] = max(item.get('pico_memoria_mb', 0.0), registro['pico_memoria_mb'])
+        return resumo
+
+    def relatorio(self):
+        """Relatório em formato JSON-serializável: registros individuais e resumo por etapa."""
+        return {
+            'inicio': self.inicio,
+            'duracao_s': round(time.perf_counter() - self._relogio, 6),
+            'memoria_rastreada': self.memoria,
+            'resumo': self.resumo(),
+            'etapas': sorted(self.registros, key=lambda r: r['inicio_s']),
+        }
+
+    def salvar_relatorio(self, caminho, caminho_perfil=None):
+        """
+        Grava o relatório JSON em `caminho`. Com perfil ativo e `caminho_perfil`, grava
+        também o cProfile da etapa de primeiro nível mais lenta (abra com pstats/snakeviz).
+        """
+        relatorio = self.relatorio()
+        try:
+            if caminho_perfil and self._perfis:
+                indice = max(self._perfis, key=lambda i: self.registros[i]['tempo_s'])
+                self._perfis[indice].dump_stats(caminho_perfil)
+                relatorio['perfil'] = {'etapa': self.registros[indice]['etapa'], 'arquivo': caminho_perfil}
+            gravar_json_atomico(relatorio, caminho)
+            print(f"📊 Relatório de execução salvo em: {caminho}")
+            return True
+        except Exception as e:
+            print(f"❌ Erro ao salvar o relatório de execução: {e}")
+            return False
+
+    def imprimir_resumo(self):
+        """Tabela com as etapas de primeiro nível e as mais custosas dentro delas."""
+        print(f"\n⏱️ {'Etapa':<45}{'Exec.':>6}{'Tempo (s)':>11}{'MB lidos':>10}{'Linhas':>10}{'Pico MB':>9}")
+        for nome, item in self.resumo().items():
+            if nome.count('/') > 1:
+                continue
+            pico = item.get('pico_memoria_mb')
+            print(f"   {nome:<45}{item['execucoes']:>6}{item['tempo_s']:>11.2f}{item['bytes'] / 1e6:>10.1f}"
+                  f"{item['linhas']:>10}{pico if pico is not None else float('nan'):>9.1f}")
+
+    def encerrar(self):
+        if self._ligou_tracemalloc:
+            tracemalloc.stop()
+            self._ligou_tracemalloc = False
+
+_INSTRUMENTACAO = None
+
+def iniciar_instrumentacao(memoria=True, perfil=False):
+    """Liga a instrumentação do módulo: a partir daqui todas as etapas instrumentadas são registradas."""
+    global _INSTRUMENTACAO
+    _INSTRUMENTACAO = Instrumentacao(memoria=memoria, perfil=perfil)
+    return _INSTRUMENTACAO
+
+def encerrar_instrumentacao():
+    """Desliga a instrumentação (e o tracemalloc, se foi ela que ligou) e devolve a instância encerrada."""
+    global _INSTRUMENTACAO
+    instrumentacao, _INSTRUMENTACAO = _INSTRUMENTACAO, None
+    if instrumentacao is not None:
+        instrumentacao.encerrar()
+    return instrumentacao
+
+def medir_etapa(nome, **detalhes):
+    """Context manager de uma etapa; sem instrumentação ativa não mede nada (custo desprezível)."""
+    if _INSTRUMENTACAO is None:
+        return contextlib.nullcontext({})
+    return _INSTRUMENTACAO.etapa(nome, **detalhes)
+
+def registro_atual():
+    """Registro da etapa em andamento, para a função anotar bytes, linhas etc. (dict descartável se inativa)."""
+    return _INSTRUMENTACAO.registro_atual() if _INSTRUMENTACAO is not None else {}
+
+def instrumentar(nome=None):
+    """Decorador: mede a função como uma etapa; se ela devolve um DataFrame, anota as linhas."""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            with medir_etapa(nome or funcao.__name__) as registro:
+                resultado = funcao(*args, **kwargs)
+                if isinstance(resultado, pd.DataFrame):
+                    registro.setdefault('linhas', len(resultado))
+                return resultado
+        return medida
+    return decorador
+
+# =======================================================
+# SESSÃO HTTP (POOL DE CONEXÕES, TIMEOUT E RETRY)
+# =======================================================
+
+TIMEOUT_PADRAO = (5, 60)  # (conexão, leitura) em segundos
+STATUS_RETRY = (429, 500, 502, 503, 504)
+
+class SessaoBacen(requests.Session):
+    """
+    Sessão HTTP compartilhada pela camada de aquisição.
+
+    Mantém conexões keep-alive em pool (evita um novo handshake TCP+TLS por
+    requisição), aplica um timeout padrão a toda chamada e repete HEAD/GET com
+    backoff exponencial quando o servidor responde 429 ou 5xx.
+
+    Com `gravacoes` (pasta), as respostas passam pelo cache record/replay do
+    AdaptadorGravacoes no `modo_gravacoes` indicado.
+    """
+
+    def __init__(self, timeout=TIMEOUT_PADRAO, tentativas=3, backoff=0.5, tamanho_pool=16,
+                 gravacoes=None, modo_gravacoes='cache'):
+        super().__init__()
+        self.timeout = timeout
+
+        retry = Retry(
+            total=tentativas,
+            backoff_factor=backoff,
+            status_forcelist=STATUS_RETRY,
+            allowed_methods=frozenset({'HEAD', 'GET'}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        opcoes = dict(pool_connections=tamanho_pool, pool_maxsize=tamanho_pool, max_retries=retry)
+        if gravacoes:
+            adaptador = AdaptadorGravacoes(gravacoes, modo_gravacoes, **opcoes)
+        else:
+            adaptador = HTTPAdapter(**opcoes)
+        self.mount('https://', adaptador)
+        self.mount('http://', adaptador)
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:  # timeout=None também herda o padrão da sessão
+            kwargs['timeout'] = self.timeout
+        return super().request(method, url, **kwargs)
+
+def criar_sessao(timeout=TIMEOUT_PADRAO, tentativas=3, backoff=0.5, tamanho_pool=16,
+                 gravacoes=None, modo_gravacoes=None):
+    """
+    Cria uma SessaoBacen com os parâmetros informados.
+
+    Sem `gravacoes`/`modo_gravacoes`, valem BACEN_GRAVACOES e BACEN_MODO_GRAVACOES.
+    """
+    return SessaoBacen(timeout=timeout, tentativas=tentativas, backoff=backoff, tamanho_pool=tamanho_pool,
+                       gravacoes=gravacoes or PASTA_GRAVACOES, modo_gravacoes=modo_gravacoes or MODO_GRAVACOES)
+
+_sessao_padrao = None
+_trava_sessao_padrao = threading.Lock()
+
+def obter_sessao_padrao():
+    """Retorna a sessão compartilhada do módulo, criando-a na primeira chamada."""
+    global _sessao_padrao
+    with _trava_sessao_padrao:
+        if _sessao_padrao is None:
+            _sessao_padrao = criar_sessao()
+        return _sessao_padrao
+
+# =======================================================
+# FONTE DOS DADOS (AO VIVO, ESPELHO LOCAL OU GRAVAÇÕES)
+# =======================================================
+
+# Espelho local: basta apontar BACEN_BASE_URL para outro servidor HTTP com os mesmos nomes de arquivo.
+# Gravações: BACEN_GRAVACOES aponta para a pasta do cache record/replay (ver AdaptadorGravacoes).
+PASTA_GRAVACOES = os.environ.get('BACEN_GRAVACOES') or None
+MODO_GRAVACOES = os.environ.get('BACEN_MODO_GRAVACOES', 'cache')
+MODOS_GRAVACOES = ('gravar', 'reproduzir', 'cache')
+
+def _nome_na_url(url):
+    """Nome do arquivo no fim da URL (ex.: 'ESTATCAMBIF201601-201601.zip')."""
+    return os.path.basename(requests.utils.unquote(urlparse(url).path))
+
+class AdaptadorGravacoes(HTTPAdapter):
+    """
+    Adaptador de transporte com cache record/replay das respostas do BACEN.
+
+    Cada corpo baixado é gravado por conteúdo em `pasta/objetos/<sha[:2]>/<sha256>`
+    (arquivos idênticos são guardados uma vez) e `pasta/indice.jsonl` liga cada URL
+    ao status, sha256, ETag e Last-Modified. 404 também é gravado, para a descoberta
+    de URLs funcionar offline. Modos:
+
+    * 'gravar': sempre vai à rede e (re)grava o que vier;
+    * 'cache': responde do disco os 200 já gravados e grava o resto; 404 e GETs
+      condicionais (revalidação) vão à rede, já que o BACEN publica e republica meses;
+    * 'reproduzir': nunca vai à rede; o que não foi gravado vira 404.
+
+    URLs fora do índice são procuradas pelo nome do arquivo: gravações feitas
+    contra o site continuam valendo com outro BASE_URL, e uma pasta com os ZIPs
+    soltos (mesmo nome do arquivo no site) também serve de fonte.
+    """
+
+    def __init__(self, pasta, modo='cache', **kwargs):
+        if modo not in MODOS_GRAVACOES:
+            raise ValueError(f"Modo de gravações inválido: {modo!r} (use {', '.join(MODOS_GRAVACOES)})")
+        super().__init__(**kwargs)
+        self.pasta = pasta
+        self.modo = modo
+        self.caminho_indice = os.path.join(pasta, 'indice.jsonl')
+        self._trava = threading.Lock()
+        self.indice = self._carregar_indice()
+
+    def _carregar_indice(self):
+        indice = {}
+        self._por_nome = {}
+        try:
+            with open(self.caminho_indice, encoding='utf-8') as f:
+                for linha in f:
+                    try:
+                        entrada = json.loads(linha)
+                    except json.JSONDecodeError:
+                        continue  # linha truncada por uma execução interrompida
+                    self._indexar(indice, entrada)
+        except OSError:
+            pass
+        return indice
+
+    def _indexar(self, indice, entrada):
+        indice[entrada['url']] = entrada
+        if entrada.get('sha256'):
+            self._por_nome[_nome_na_url(entrada['url'])] = entrada
+
+    def caminho_objeto(self, sha256):
+        return os.path.join(self.pasta, 'objetos', sha256[:2], sha256)
+
+    def _registrar(self, entrada):
+        with self._trava:
+            os.makedirs(self.pasta, exist_ok=True)
+            with open(self.caminho_indice, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+            self._indexar(self.indice, entrada)
+
+    def _procurar(self, request):
+        """Entrada gravada que responde à requisição (None: precisa ir à rede)."""
+        entrada = self.indice.get(request.url)
+        if entrada is not None:
+            # HEAD gravado não tem corpo: um GET da mesma URL ainda precisa ir à rede.
+            if request.method == 'GET' and entrada['status'] == 200 and not entrada.get('sha256'):
+                return None
+            return entrada
+
+        nome = _nome_na_url(request.url)
+        if nome in self._por_nome and request.method in ('GET', 'HEAD'):
+            return dict(self._por_nome[nome], url=request.url)
+
+        caminho = os.path.join(self.pasta, nome) if nome else None
+        if caminho and os.path.isfile(caminho):
+            stat = os.stat(caminho)
+            return {'url': request.url, 'status': 200, 'caminho': caminho, 'tamanho': stat.st_size,
+                    'etag': f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'}
+        return None
+
+    def _responder(self, request, entrada):
+        """Monta a Response a partir de uma entrada gravada; o corpo é lido do disco sob demanda."""
+        resposta = requests.Response()
+        resposta.status_code = entrada['status']
+        resposta.url = request.url
+        resposta.request = request
+        resposta.connection = self
+        resposta.raw = io.BytesIO(b'')
+
+        cabecalhos = {}
+        if entrada.get('etag'):
+            cabecalhos['ETag'] = entrada['etag']
+        if entrada.get('last_modified'):
+            cabecalhos['Last-Modified'] = entrada['last_modified']
+
+        if entrada['status'] == 200:
+            etag_cliente = request.headers.get('If-None-Match')
+            data_cliente = request.headers.get('If-Modified-Since')
+            if (etag_cliente and etag_cliente == entrada.get('etag')) or \
+               (not etag_cliente and data_cliente and data_cliente == entrada.get('last_modified')):
+                resposta.status_code = 304
+            else:
+                cabecalhos['Content-Length'] = str(entrada.get('tamanho', 0))
+                if entrada.get('content_type'):
+                    cabecalhos['Content-Type'] = entrada['content_type']
+                if request.method == 'GET':
+                    resposta.raw = open(entrada.get('caminho') or self.caminho_objeto(entrada['sha256']), 'rb')
+
+        resposta.reason = HTTPStatus(resposta.status_code).phrase
+        resposta.headers = requests.structures.CaseInsensitiveDict(cabecalhos)
+        resposta.from_cache = True
+        return resposta
+
+    def _gravar(self, request, resposta):
+        """Grava a resposta da rede (corpo em streaming, hash calculado na escrita) e a devolve do disco."""
+        status = resposta.status_code
+        # Só respostas estáveis: 304 depende do cliente e 5xx/429 (após o retry) são transitórios.
+        if status not in (200, 403, 404, 410):
+            return resposta
+
+        entrada = {
+            'url': request.url,
+            'status': status,
+            'etag': resposta.headers.get('ETag'),
+            'last_modified': resposta.headers.get('Last-Modified'),
+            'content_type': resposta.headers.get('Content-Type'),
+            'gravado_em': datetime.datetime.now().isoformat(timespec='seconds'),
+        }
+        if status != 200 or request.method != 'GET':
+            self._registrar(entrada)
+            return resposta
+
+        pasta_objetos = os.path.join(self.pasta, 'objetos')
+        os.makedirs(pasta_objetos, exist_ok=True)
+        sha256 = hashlib.sha256()
+        tamanho = 0
+        with resposta, tempfile.NamedTemporaryFile(dir=pasta_objetos, delete=False) as temporario:
+            try:
+                for bloco in resposta.iter_content(chunk_size=TAMANHO_BLOCO):
+                    temporario.write(bloco)
+                    sha256.update(bloco)
+                    tamanho += len(bloco)
+            except BaseException:
+                temporario.close()
+                os.remove(temporario.name)
+                raise
+
+        entrada['sha256'] = sha256.hexdigest()
+        entrada['tamanho'] = tamanho
+        destino = self.caminho_objeto(entrada['sha256'])
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        os.replace(temporario.name, destino)
+        self._registrar(entrada)
+
+        gravada = self._responder(request, entrada)
+        gravada.from_cache = False
+        return gravada
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if self.modo != 'gravar':
+            entrada = self._procurar(request)
+            condicional = 'If-None-Match' in request.headers or 'If-Modified-Since' in request.headers
+            if entrada is not None and (self.modo == 'reproduzir' or (entrada['status'] == 200 and not condicional)):
+                return self._responder(request, entrada)
+            if self.modo == 'reproduzir':
+                return self._responder(request, {'url': request.url, 'status': 404})
+
+        resposta = super().send(request, stream=True, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+        return self._gravar(request, resposta)
+
+# =======================================================
+# MANIFESTO DE DOWNLOADS (AQUISIÇÃO INCREMENTAL)
+# =======================================================
+
+def carregar_manifesto(caminho):
+    """
+    Lê o manifesto de downloads: {url: entrada}, onde cada entrada registra
+    ano, mes, ETag, Last-Modified, tamanho, sha256 e os arquivos extraídos.
+    """
+    return ler_json(caminho)
+
+def salvar_manifesto(manifesto, caminho):
+    """Grava o manifesto de downloads em disco."""
+    gravar_json_atomico(manifesto, caminho)
+
+def _arquivos_presentes(entrada, destino_pasta):
+    """Verifica se todos os arquivos registrados em uma entrada ainda existem no destino."""
+    arquivos = entrada.get('arquivos') or []
+    return bool(arquivos) and all(os.path.exists(os.path.join(destino_pasta, a)) for a in arquivos)
+
+def mes_adquirido(manifesto, ano, mes, destino_pasta):
+    """Indica se o mês já foi baixado (consta no manifesto e os arquivos seguem no disco)."""
+    chave = chave_mes(ano, mes)
+    return any(
+        entrada.get('chave') == chave and _arquivos_presentes(entrada, destino_pasta)
+        for entrada in manifesto.values()
+    )
+
+def registrar_no_manifesto(manifesto, url, ano, mes, resposta, tamanho, sha256, arquivos):
+    """Cria/atualiza a entrada de uma URL após um download bem-sucedido."""
+    manifesto[url] = {
+        'chave': chave_mes(ano, mes),
+        'ano': ano,
+        'mes': mes,
+        'url': url,
+        'etag': resposta.headers.get('ETag'),
+        'last_modified': resposta.headers.get('Last-Modified'),
+        'tamanho': tamanho,
+        'sha256': sha256,
+        'arquivos': sorted(arquivos),
+        'atualizado_em': datetime.datetime.now().isoformat(timespec='seconds'),
+    }
+
+def cabecalhos_condicionais(entrada):
+    """Monta If-None-Match/If-Modified-Since a partir de uma entrada do manifesto."""
+    cabecalhos = {}
+    if entrada.get('etag'):
+        cabecalhos['If-None-Match'] = entrada['etag']
+    if entrada.get('last_modified'):
+        cabecalhos['If-Modified-Since'] = entrada['last_modified']
+    return cabecalhos
+
 # =======================================================
 # DOWNLOAD E GERAÇÃO DE URL
 # =======================================================
 
-def baixar_e_extrair_zip(url, destino_pasta, ano, mes):
-    """Baixa o arquivo ZIP, extrai para pasta temp, renomeia e move."""
-    mes_str = str(mes).zfill(2)
-    ano_str = str(ano)
+BASE_URL = os.environ.get('BACEN_BASE_URL', "https://www.bcb.gov.br/content/estatisticas/rankingcambioinstituicoes/")
+TAMANHO_BLOCO = 256 * 1024        # leitura/escrita em streaming
+TAMANHO_SPOOL = 8 * 1024 * 1024   # acima disso o ZIP baixado vai para disco
+
+def extrair_membros_padronizados(z, destino_pasta, ano, mes, substituir=False):
+    """
+    Grava cada membro do ZIP direto no nome padronizado final, em blocos.
+
+    Não há pasta temporária nem renomeação/movimentação posterior: cada arquivo é
+    escrito em '<nome>.parcial' e promovido com os.replace ao terminar. Arquivos já
+    existentes no destino só são sobrescritos com `substituir=True`.
+    Retorna a lista de nomes finais correspondentes ao ZIP.
+    """
+    arquivos = []
+    for membro in z.infolist():
+        if membro.is_dir():
+            continue
+
+        nome_original = os.path.basename(membro.filename)
+        novo_nome = nome_padronizado(nome_original, ano, mes)
+        if not novo_nome:
+            print(f"⚠️ Ignorado: {nome_original}")
+            continue
+
+        arquivos.append(novo_nome)
+        destino = os.path.join(destino_pasta, novo_nome)
+        if os.path.exists(destino) and not substituir:
+            print(f"⚠️ Já existe no destino: {novo_nome}, ignorando extração.")
+            continue
+
+        parcial = destino + '.parcial'
+        try:
+            with z.open(membro) as origem, open(parcial, 'wb') as saida:
+                shutil.copyfileobj(origem, saida, TAMANHO_BLOCO)
+            os.replace(parcial, destino)
+        finally:
+            if os.path.exists(parcial):
+                os.remove(parcial)
+        print(f"✅ Extraído: {nome_original} -> {novo_nome}")
+
+    return arquivos
+
+@instrumentar()
+def baixar_e_extrair_zip(url, destino_pasta, ano, mes, sessao=None, manifesto=None, revalidar=False, manter_zip=False):
+    """
+    Baixa o arquivo ZIP em streaming e extrai cada membro direto no nome padronizado.
+
+    A resposta é gravada em blocos num SpooledTemporaryFile (memória até
+    TAMANHO_SPOOL, disco acima disso), então o pico de memória não depende do
+    tamanho do arquivo.
+
+    Com `manifesto`, URLs já adquiridas (arquivos ainda no disco) são puladas antes
+    de qualquer requisição. Com `revalidar=True` elas são checadas por GET condicional
+    (If-None-Match/If-Modified-Since): 304 mantém os arquivos, 200 os substitui.
+    O manifesto é atualizado em memória; cabe ao chamador salvá-lo.
+
+    Com `manter_zip=True` nada é extraído: o ZIP fica como ranking_AAAA-MM.zip e os
+    CSVs mensais são lidos direto dele (ver listar_arquivos_mensais e abrir_arquivo).
+    """
+    sessao = sessao or obter_sessao_padrao()
+    registro = registro_atual()
+    registro['url'] = url
+
+    anterior = manifesto.get(url) if manifesto is not None else None
+    if anterior is not None and not _arquivos_presentes(anterior, destino_pasta):
+        anterior = None
+
+    cabecalhos = {}
+    if anterior is not None:
+        if not revalidar:
+            print(f"⏭️ Já adquirido (manifesto): {url}")
+            registro['status'] = 'manifesto'
+            return True
+        cabecalhos = cabecalhos_condicionais(anterior)
 
     print(f"Baixando ZIP de: {url}")
-    resposta = requests.get(url)
+    try:
+        resposta = sessao.get(url, headers=cabecalhos, stream=True)
+    except requests.RequestException as e:
+        print(f"❌ Erro no download de {url}: {e}")
+        return False
+
+    with resposta:
+        registro['status'] = resposta.status_code
+        if resposta.status_code == 304:
+            print(f"⏭️ Sem alterações no servidor (304): {url}")
+            return True
 
-    if resposta.status_code == 200:
-        temp_dir = os.path.join(destino_pasta, f"temp_{ano_str}_{mes_str}")
-        os.makedirs(temp_dir, exist_ok=True)
+        if resposta.status_code != 200:
+            return False
 
         try:
-            with zipfile.ZipFile(io.BytesIO(resposta.content)) as z:
-                z.extractall(temp_dir)
-            
-            renomear_arquivos_extraidos(temp_dir, ano, mes)
-
-            for arquivo in os.listdir(temp_dir):
-                origem = os.path.join(temp_dir, arquivo)
-                destino = os.path.join(destino_pasta, arquivo)
-                if not os.path.exists(destino):
-                    shutil.move(origem, destino)
-                else:
-                    print(f"⚠️ Já existe no destino: {arquivo}, ignorando movimento.")
-            
-            shutil.rmtree(temp_dir)
+            with tempfile.SpooledTemporaryFile(max_size=TAMANHO_SPOOL) as arquivo_zip:
+                sha256 = hashlib.sha256()
+                tamanho = 0
+                for bloco in resposta.iter_content(chunk_size=TAMANHO_BLOCO):
+                    arquivo_zip.write(bloco)
+                    sha256.update(bloco)
+                    tamanho += len(bloco)
+                arquivo_zip.seek(0)
+                registro['bytes'] = tamanho
+
+                with zipfile.ZipFile(arquivo_zip) as z:
+                    # Revalidação com conteúdo novo: a versão publicada substitui a antiga.
+                    if manter_zip:
+                        arquivos = armazenar_zip(arquivo_zip, z, destino_pasta, ano, mes, substituir=anterior is not None)
+                    else:
+                        arquivos = extrair_membros_padronizados(z, destino_pasta, ano, mes, substituir=anterior is not None)
+
+            if manifesto is not None:
+                registrar_no_manifesto(manifesto, url, ano, mes, resposta, tamanho, sha256.hexdigest(), arquivos)
 
             print(f"Arquivos extraídos e renomeados com sucesso em: {destino_pasta}")
             return True
-        
+
+        except requests.RequestException as e:
+            print(f"❌ Erro no download de {url}: {e}")
+            return False
+
         except zipfile.BadZipFile:
             print('❌ Erro: arquivo não é um ZIP válido.')
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
             return False
-        
+
         except Exception as e:
             print(f"❌ Erro na extração ou renomeação: {e}")
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
             return False
-
-    else:
-        return False
     
-def gerar_info_data(ano, mes):
-    """Gera e testa múltiplos padrões de URL do BACEN."""
-    try:
-        data = datetime.date(ano, mes, 1)
-    except ValueError:
-        return None
+def gerar_padroes_url(ano, mes):
+    """Lista os padrões de nome de arquivo já usados pelo BACEN, em ordem de prioridade."""
+    data = datetime.date(ano, mes, 1)
 
     mes_num_2d = data.strftime("%m")
     ano_str = str(ano)
 
-    padroes = [
+    return [
         f'ESTATCAMBIF{ano_str}{mes_num_2d}-IF-{ano_str}{mes_num_2d}.zip',
         f'ESTATCAMBIF{ano_str}{mes_num_2d}-{ano_str}{mes_num_2d}.zip',
         f'ESTATCAMBIF{ano_str}{mes_num_2d}-IF_{ano_str}{mes_num_2d}.zip',
@@ -136,13 +800,23 @@ def gerar_info_data(ano, mes):
         f'ESTATCAMBIF{ano_str}{mes_num_2d}-Ranking%20Institui%C3%A7%C3%A3o%20{ano_str}%20{mes_num_2d}.xls',
         f'ESTATCABIF{ano_str}{mes_num_2d}IF-{ano_str}{mes_num_2d}.zip',
     ]
-    
-    BASE_URL = "https://www.bcb.gov.br/content/estatisticas/rankingcambioinstituicoes/"
 
+@instrumentar()
+def gerar_info_data(ano, mes, base_url=BASE_URL, sessao=None):
+    """Gera e testa múltiplos padrões de URL do BACEN."""
+    try:
+        padroes = gerar_padroes_url(ano, mes)
+    except ValueError:
+        return None
+
+    sessao = sessao or obter_sessao_padrao()
+    registro = registro_atual()
+    registro.update(mes=chave_mes(ano, mes), requisicoes=0)
     for padrao in padroes:
-        url = BASE_URL + padrao
+        url = base_url + padrao
         try:
-            r = requests.head(url, timeout=5)
+            registro['requisicoes'] += 1
+            r = sessao.head(url)
             if r.status_code == 200:
                 print(f'URL encontrada (Padrão: {padrao})')
                 return url
@@ -151,6 +825,268 @@ def gerar_info_data(ano, mes):
             
     return None
 
+# 2014 não segue nenhum padrão de gerar_padroes_url: os nomes publicados ficam fixos aqui.
+ARQUIVOS_MANUAIS_2014 = [
+    'ESTATCAMBIF201412-IF-201412.zip',
+    'ESTATCAMBIF201410-AT_2014-10.zip',
+    'ESTATCAMBIF201409-IF-201409.zip',
+    'ESTATCAMBIF201408-IF-201408.zip',
+    'ESTATCAMBIF201407-IF-201407.zip',
+    'ESTATCAMBIF201406-IF-201406.zip',
+    'ESTATCAMBIF201405-IF-201405.zip',
+    'ESTATCAMBIF201404-IF-201404.zip',
+    'ESTATCAMBIF201403-IF-201403.zip',
+    'ESTATCAMBIF201402-IF-201402.zip',
+    'ESTATCAMBIF201401-IF_201401.zip',
+]
+
+def urls_manuais_2014(base_url=BASE_URL):
+    """URLs dos arquivos de 2014 na fonte informada (site do BACEN ou espelho local)."""
+    return [base_url + arquivo for arquivo in ARQUIVOS_MANUAIS_2014]
+
+# =======================================================
+# DESCOBERTA CONCORRENTE DE URLS (COM CACHE DE PADRÕES)
+# =======================================================
+
+def carregar_cache_padroes(caminho):
+    """Lê o cache {AAAA-MM: padrão vencedor} salvo em disco (vazio se não existir)."""
+    return ler_json(caminho)
+
+def salvar_cache_padroes(cache, caminho):
+    """Grava o cache de padrões em disco."""
+    gravar_json_atomico(cache, caminho)
+
+def _testar_url(url, semaforo, sessao, timeout):
+    """HEAD em uma URL candidata, respeitando o limite de conexões do host."""
+    with semaforo:
+        try:
+            return sessao.head(url, timeout=timeout).status_code == 200
+        except requests.RequestException:
+            return False
+
+@instrumentar()
+def descobrir_urls(meses, base_url=BASE_URL, caminho_cache=None, max_workers=16, max_por_host=8, timeout=None, sessao=None):
+    """
+    Descobre em paralelo a URL de cada (ano, mes) da lista.
+
+    Todos os padrões de todos os meses são testados ao mesmo tempo em um pool de
+    threads limitado, com no máximo `max_por_host` requisições simultâneas por host.
+    Vence o primeiro padrão da lista (mesma prioridade de gerar_info_data) que
+    responder 200. O padrão vencedor de cada mês é salvo em `caminho_cache`,
+    de modo que execuções seguintes não precisam testar esses meses novamente.
+    As requisições usam `sessao` (ou a sessão compartilhada do módulo), reaproveitando conexões;
+    sem `timeout`, vale o timeout padrão da sessão.
+
+    Retorna um dicionário {(ano, mes): url}; meses sem URL válida ficam de fora.
+    """
+    cache = carregar_cache_padroes(caminho_cache)
+    urls = {}
+    candidatos = {}
+
+    for ano, mes in meses:
+        padrao_cache = cache.get(chave_mes(ano, mes))
+        if padrao_cache:
+            urls[(ano, mes)] = base_url + padrao_cache
+            continue
+        try:
+            candidatos[(ano, mes)] = gerar_padroes_url(ano, mes)
+        except ValueError:
+            continue
+
+    print(f'Descoberta de URLs: {len(urls)} meses no cache, {len(candidatos)} meses para testar.')
+    if not candidatos:
+        return urls
+
+    # Todos os candidatos ficam sob o mesmo host; o semáforo limita as conexões abertas nele.
+    sessao = sessao or obter_sessao_padrao()
+    semaforo_host = threading.BoundedSemaphore(max_por_host)
+    print(f'Testando padrões em {urlparse(base_url).netloc} ({max_por_host} conexões simultâneas)...')
+
+    def _cancelar_seguintes(lista_futuros, i):
+        def callback(futuro):
+            if not futuro.cancelled() and futuro.result():
+                for restante in lista_futuros[i + 1:]:
+                    restante.cancel()
+        return callback
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futuros = {chave: [] for chave in candidatos}
+        # Submete por nível de prioridade (o 1º padrão de todos os meses, depois o 2º...):
+        # quando um mês é resolvido, os padrões seguintes dele ainda estão na fila e são cancelados.
+        for i in range(max(len(p) for p in candidatos.values())):
+            for chave, padroes in candidatos.items():
+                resolvido = any(f.done() and not f.cancelled() and f.result() for f in futuros[chave])
+                if i < len(padroes) and not resolvido:
+                    futuro = executor.submit(_testar_url, base_url + padroes[i], semaforo_host, sessao, timeout)
+                    futuro.add_done_callback(_cancelar_seguintes(futuros[chave], i))
+                    futuros[chave].append(futuro)
+
+        for (ano, mes), lista_futuros in futuros.items():
+            padroes = candidatos[(ano, mes)]
+            for i, futuro in enumerate(lista_futuros):
+                if futuro.result():
+                    urls[(ano, mes)] = base_url + padroes[i]
+                    cache[chave_mes(ano, mes)] = padroes[i]
+                    print(f'URL encontrada para {chave_mes(ano, mes)} (Padrão: {padroes[i]})')
+                    break
+
+    registro_atual()['requisicoes'] = sum(not f.cancelled() for lista in futuros.values() for f in lista)
+    if caminho_cache:
+        salvar_cache_padroes(cache, caminho_cache)
+
+    print(f'✅ Descoberta concluída: {len(urls)} de {len(meses)} meses com URL válida.')
+    return urls
+
+# =======================================================
+# ZIPS ARMAZENADOS (LEITURA DIRETA, SEM EXTRAÇÃO)
+# =======================================================
+
+# No modo ZIP o download fica só como ranking_AAAA-MM.zip e os membros são lidos do
+# arquivo compactado. Um membro é endereçado como se o ZIP fosse uma pasta, pelo nome
+# padronizado: 'dados/zipfiles/ranking_2016-01.zip/ranking_2016-01_mensal.csv'.
+PADRAO_ZIP_ARMAZENADO = re.compile(r'^ranking_(\d{4})-(\d{2})\.zip$', flags=re.IGNORECASE)
+
+def nome_zip_armazenado(ano, mes):
+    """Nome padronizado do ZIP guardado no modo ZIP: ranking_AAAA-MM.zip."""
+    return f'ranking_{ano}-{str(mes).zfill(2)}.zip'
+
+def separar_caminho_zip(caminho):
+    """(caminho_do_zip, nome_padronizado) de um membro de ZIP armazenado; (None, None) para arquivos comuns."""
+    pasta, nome = os.path.split(caminho)
+    if PADRAO_ZIP_ARMAZENADO.match(os.path.basename(pasta)) and os.path.isfile(pasta):
+        return pasta, nome
+    return None, None
+
+def membros_padronizados(z, ano, mes):
+    """{nome_padronizado: ZipInfo} dos membros que interessam ao pipeline (o primeiro de cada nome vale)."""
+    membros = {}
+    for membro in z.infolist():
+        if membro.is_dir():
+            continue
+        novo_nome = nome_padronizado(os.path.basename(membro.filename), ano, mes)
+        if novo_nome and novo_nome not in membros:
+            membros[novo_nome] = membro
+    return membros
+
+def _membros_zip_armazenado(z, caminho_zip):
+    ano, mes = PADRAO_ZIP_ARMAZENADO.match(os.path.basename(caminho_zip)).groups()
+    return membros_padronizados(z, ano, mes)
+
+@contextlib.contextmanager
+def abrir_arquivo(caminho):
+    """Abre para leitura binária um arquivo comum ou um membro de ZIP armazenado (descompactado em streaming)."""
+    caminho_zip, nome = separar_caminho_zip(caminho)
+    if caminho_zip is None:
+        with open(caminho, 'rb') as f:
+            yield f
+        return
+
+    with zipfile.ZipFile(caminho_zip) as z:
+        membro = _membros_zip_armazenado(z, caminho_zip).get(nome)
+        if membro is None:
+            raise FileNotFoundError(caminho)
+        with z.open(membro) as f:
+            yield f
+
+def ler_bytes(caminho, limite=-1):
+    """Conteúdo (ou os primeiros `limite` bytes) de um arquivo comum ou membro de ZIP."""
+    with abrir_arquivo(caminho) as f:
+        return f.read(limite)
+
+def info_arquivo(caminho):
+    """(tamanho, mtime_ns); para um membro de ZIP, o tamanho descompactado e o mtime do ZIP."""
+    caminho_zip, nome = separar_caminho_zip(caminho)
+    if caminho_zip is None:
+        stat = os.stat(caminho)
+        return stat.st_size, stat.st_mtime_ns
+
+    with zipfile.ZipFile(caminho_zip) as z:
+        membro = _membros_zip_armazenado(z, caminho_zip).get(nome)
+    if membro is None:
+        raise FileNotFoundError(caminho)
+    return membro.file_size, os.stat(caminho_zip).st_mtime_ns
+
+def tamanho_arquivo(caminho):
+    return info_arquivo(caminho)[0]
+
+def membros_mensais_do_zip(pasta, nome_zip, padrao=None):
+    """
+    CSVs mensais de um ZIP armazenado, como caminhos relativos 'ranking_AAAA-MM.zip/ranking_AAAA-MM_mensal.csv'
+    (com `padrao`, os membros cujo nome padronizado casa com ele, ex. PADRAO_ARQUIVO_ACUMULADO).
+    """
+    padrao = padrao or PADRAO_ARQUIVO_MENSAL
+    caminho_zip = os.path.join(pasta, nome_zip)
+    try:
+        with zipfile.ZipFile(caminho_zip) as z:
+            nomes = _membros_zip_armazenado(z, caminho_zip)
+    except zipfile.BadZipFile:
+        print(f'⚠️ ZIP inválido ignorado: {nome_zip}')
+        return []
+    return [os.path.join(nome_zip, nome) for nome in nomes if padrao.match(nome)]
+
+def listar_membros_mensais(pasta):
+    """CSVs mensais de todos os ZIPs armazenados da pasta (ver membros_mensais_do_zip)."""
+    membros = []
+    for nome_zip in sorted(f for f in os.listdir(pasta) if PADRAO_ZIP_ARMAZENADO.match(f)):
+        membros.extend(membros_mensais_do_zip(pasta, nome_zip))
+    return membros
+
+def armazenar_zip(arquivo_zip, z, destino_pasta, ano, mes, substituir=False):
+    """
+    Modo ZIP: grava o ZIP baixado inteiro como ranking_AAAA-MM.zip, sem extrair nada.
+    Retorna [nome do ZIP], ou [] se ele não tiver nenhum membro útil.
+    """
+    if not membros_padronizados(z, ano, mes):
+        print('⚠️ ZIP sem arquivos de ranking reconhecidos, nada armazenado.')
+        return []
+
+    nome_zip = nome_zip_armazenado(ano, mes)
+    destino = os.path.join(destino_pasta, nome_zip)
+    if os.path.exists(destino) and not substituir:
+        print(f"⚠️ Já existe no destino: {nome_zip}, ignorando.")
+        return [nome_zip]
+
+    parcial = destino + '.parcial'
+    try:
+        arquivo_zip.seek(0)
+        with open(parcial, 'wb') as saida:
+            shutil.copyfileobj(arquivo_zip, saida, TAMANHO_BLOCO)
+        os.replace(parcial, destino)
+    finally:
+        if os.path.exists(parcial):
+            os.remove(parcial)
+    print(f"✅ ZIP armazenado (sem extração): {nome_zip}")
+    return [nome_zip]
+
+def materializar_membro(pasta, nome, destino_pasta=None):
+    """
+    Extrai sob demanda um membro de um ZIP armazenado, pelo nome padronizado
+    (ex.: 'ranking_2016-01_acumulado.csv' ou 'ranking_2016-01.xlsx'), para
+    `destino_pasta` (padrão: a própria pasta). Se já estiver extraído, só devolve o caminho.
+    Retorna None se o ZIP do mês não existir ou não tiver esse membro.
+    """
+    destino_pasta = destino_pasta or pasta
+    destino = os.path.join(destino_pasta, nome)
+    if os.path.exists(destino):
+        return destino
+
+    match = re.match(r'^ranking_(\d{4})-(\d{2})', nome)
+    caminho_membro = os.path.join(pasta, nome_zip_armazenado(*match.groups()), nome) if match else None
+    if caminho_membro is None or separar_caminho_zip(caminho_membro)[0] is None:
+        return None
+
+    parcial = destino + '.parcial'
+    try:
+        with abrir_arquivo(caminho_membro) as origem, open(parcial, 'wb') as saida:
+            shutil.copyfileobj(origem, saida, TAMANHO_BLOCO)
+        os.replace(parcial, destino)
+    except FileNotFoundError:
+        return None
+    finally:
+        if os.path.exists(parcial):
+            os.remove(parcial)
+    return destino
+
 # =======================================================
 # UNIFICAR BASES
 # =======================================================
@@ -168,84 +1104,289 @@ COLUNAS_PADRAO = [
     "Total_Geral_Quant", "Total_Geral_Valor",
 ]
 
-def unificar_bases(pasta_csv):
-    lista_dfs = []
-    padrao_limpo = re.compile(r'^ranking_(\d{4})-(\d{2})_mensal\.csv$', flags=re.IGNORECASE)
-    arquivos = sorted([f for f in os.listdir(pasta_csv) if padrao_limpo.match(f)])
+PADRAO_ARQUIVO_MENSAL = re.compile(r'^ranking_(\d{4})-(\d{2})_mensal\.csv$', flags=re.IGNORECASE)
+PADRAO_ARQUIVO_ACUMULADO = re.compile(r'^ranking_(\d{4})-(\d{2})_acumulado\.csv$', flags=re.IGNORECASE)
+
+def listar_arquivos_mensais(pasta_csv):
+    """
+    Lista (ordenados) os CSVs mensais padronizados da pasta, incluindo os que estão
+    dentro de ZIPs armazenados ('ranking_AAAA-MM.zip/ranking_AAAA-MM_mensal.csv'),
+    com fallback para qualquer CSV.
+    """
+    arquivos = [f for f in os.listdir(pasta_csv) if PADRAO_ARQUIVO_MENSAL.match(f)]
+    # Modo ZIP: meses guardados só compactados entram como membros; o CSV extraído tem prioridade.
+    extraidos = set(arquivos)
+    arquivos += [m for m in listar_membros_mensais(pasta_csv) if os.path.basename(m) not in extraidos]
+    arquivos = sorted(arquivos, key=os.path.basename)
 
     if not arquivos:
         arquivos = sorted([f for f in os.listdir(pasta_csv) if f.endswith('.csv') and not f.startswith('~')])
-        if not arquivos:
-            print(f'❌ Nenhum DataFrame CSV encontrado para unificar.')
-            return None
-        print(f'✅ Usando fallback: Encontrados {len(arquivos)} arquivos CSV com nomes não padronizados.')
+        if arquivos:
+            print(f'✅ Usando fallback: Encontrados {len(arquivos)} arquivos CSV com nomes não padronizados.')
 
+    return arquivos
 
-    print(f'Iniciando unificação de {len(arquivos)} arquivos na pasta...')
+def _primeiro_campo(linha):
+    return linha.split(b';', 1)[0].strip().strip(b'"').lower()
 
-    for nome_arquivo in arquivos:
-        caminho_completo = os.path.join(pasta_csv, nome_arquivo)
-        df = None
-        
-        match_padrao = padrao_limpo.match(nome_arquivo)
-        if match_padrao:
-            ano_str, mes_str = match_padrao.groups()
-        else:
-            partes_nome = nome_arquivo.split(' ')
-            if len(partes_nome) >= 4:
-                ano_str = partes_nome[2]
-                mes_str = partes_nome[3].split('.')[0].zfill(2)
-            else:
-                ano_str, mes_str = '9999', '99'
+def detectar_layout(conteudo, amostra=8192):
+    """
+    Descobre o layout de um ranking olhando só o início e o fim do arquivo (em bytes).
 
-        enc = detectar_encoding(caminho_completo)
+    Procura, nos primeiros `amostra` bytes, a linha 'Rank;CNPJ…'/'Rank;Código…' seguida
+    do sub-cabeçalho 'Quant./Valor (US$)' e, nos últimos `amostra` bytes, a última linha
+    cujo Rank é numérico (o que vem depois é rodapé: Total, Fonte, Obs., linhas vazias).
 
-        headers = [4, 5, 6]
-        for header_idx in headers:
-            try:
-                df = pd.read_csv(caminho_completo, sep=';', encoding=enc, header=header_idx, thousands='.', skipinitialspace=True)
+    Retorna um dicionário {skiprows, n_colunas, linhas_rodape, nrows, descartar} pronto
+    para um único pd.read_csv no engine C, ou None se o arquivo não seguir o layout
+    esperado. `descartar` lista as colunas de texto fora de COLUNAS_PADRAO (a
+    'Conglomerado' que o BACEN incluiu depois do nome a partir de 2024).
+    """
+    linhas_cabeca = conteudo[:amostra].split(b'\n')
+    idx_rank = None
+    for i, linha in enumerate(linhas_cabeca[:-1]):
+        if _primeiro_campo(linha) == b'rank' and b'valor' in linhas_cabeca[i + 1].lower():
+            idx_rank = i
+            break
+    if idx_rank is None:
+        return None
+
+    total_linhas = conteudo.count(b'\n') + (0 if conteudo.endswith(b'\n') else 1)
+    linhas_cauda = conteudo[-amostra:].split(b'\n')
+    if conteudo.endswith(b'\n'):
+        linhas_cauda = linhas_cauda[:-1]
+
+    linhas_rodape = None
+    for i, linha in enumerate(reversed(linhas_cauda)):
+        if _primeiro_campo(linha).isdigit():
+            linhas_rodape = i
+            break
+    if linhas_rodape is None:
+        return None
+
+    campos = linhas_cabeca[idx_rank].split(b';')
+    skiprows = idx_rank + 2
+    nrows = total_linhas - skiprows - linhas_rodape
+    if nrows <= 0:
+        return None
+
+    return {
+        'skiprows': skiprows,
+        'n_colunas': len(campos),
+        'linhas_rodape': linhas_rodape,
+        'nrows': nrows,
+        'descartar': [i for i, campo in enumerate(campos) if b'conglomerado' in campo.lower()],
+    }
+
+COLUNAS_TEXTO = {0: str, 1: str, 2: str}  # Rank, Codigo_Instituicao, Instituicao
+
+# Campos só com '-' (e espaços) significam "sem operações" nos arquivos do BACEN.
+VALORES_VAZIOS_BACEN = ['-' + ' ' * n for n in range(6)]
+
+def ler_com_layout(caminho_completo, enc, numerico=True):
+    """
+    Lê o arquivo uma única vez, no engine C, com o layout vindo de detectar_layout.
+
+    Com `numerico=True` os valores em formato brasileiro (' 1.948.990.122 ', '1.610,0',
+    '-') já saem convertidos pelo próprio parser (thousands='.', decimal=','); colunas
+    que ainda tiverem texto ficam como object e são tratadas por converter_numero_br.
+    Com `numerico=False` tudo é lido como texto.
+    Retorna None se o layout não for reconhecido ou a leitura falhar.
+    """
+    conteudo = ler_bytes(caminho_completo)
+
+    layout = detectar_layout(conteudo)
+    if layout is None:
+        return None
+
+    # Posição no arquivo de cada coluna de COLUNAS_PADRAO (sem as colunas descartadas).
+    posicoes = [i for i in range(layout['n_colunas']) if i not in layout['descartar']][:len(COLUNAS_PADRAO)]
+    if numerico:
+        # '-' vira NaN já na leitura, exceto em Exportacao_Valor: tratar_dados descarta linhas
+        # com Exportacao_Valor vazio antes da conversão, e '-' não conta como vazio ali.
+        idx_exportacao_valor = COLUNAS_PADRAO.index('Exportacao_Valor')
+        vazios = {i: VALORES_VAZIOS_BACEN for n, i in enumerate(posicoes)
+                  if n >= len(COLUNAS_TEXTO) and n != idx_exportacao_valor}
+        opcoes_tipos = dict(dtype=COLUNAS_TEXTO, thousands='.', decimal=',', na_values=vazios)
+    else:
+        opcoes_tipos = dict(dtype=str)
+
+    try:
+        return pd.read_csv(
+            io.BytesIO(conteudo),
+            sep=';',
+            encoding=enc,
+            header=None,
+            skiprows=layout['skiprows'],
+            nrows=layout['nrows'],
+            usecols=posicoes,
+            skipinitialspace=True,
+            skip_blank_lines=False,
+            engine='c',
+            **opcoes_tipos,
+        )
+    except Exception:
+        return None
+
+def _ler_com_tentativas(caminho_completo, enc):
+    """Estratégia antiga (header=4/5/6, python engine, Excel), usada quando o layout não é reconhecido."""
+    nome_arquivo = os.path.basename(caminho_completo)
+    df = None
+
+    # Membro de ZIP armazenado: lido uma vez, e cada tentativa recebe um buffer novo.
+    conteudo = ler_bytes(caminho_completo) if separar_caminho_zip(caminho_completo)[0] else None
+    def origem():
+        return caminho_completo if conteudo is None else io.BytesIO(conteudo)
+
+    # Cada tentativa é uma etapa própria no relatório de instrumentação.
+    headers = [4, 5, 6]
+    for header_idx in headers:
+        with medir_etapa(f'header={header_idx}'):
+            try:
+                df = pd.read_csv(origem(), sep=';', encoding=enc, header=header_idx, thousands='.', skipinitialspace=True)
                 if df.shape[1] >= 10 and len(df) > 0:
                     break
                 df = None
             except Exception:
                 pass
 
-        if df is None:
-             try: 
-                 df = pd.read_csv(
-                     caminho_completo,
-                     sep=';',
-                     skiprows=7,
-                     header=None,
-                     encoding=enc,
-                     engine='python'
-                 )
-             except Exception:
-                 pass
-
-        if df is None or len(df) == 0:
+    if df is None:
+        with medir_etapa('skiprows=7'):
             try:
-                df = pd.read_excel(caminho_completo, header=4, skipfooter=1, engine='openpyxl')
+                df = pd.read_csv(
+                    origem(),
+                    sep=';',
+                    skiprows=7,
+                    header=None,
+                    encoding=enc,
+                    engine='python'
+                )
+            except Exception:
+                pass
+
+    if df is None or len(df) == 0:
+        with medir_etapa('excel'):
+            try:
+                df = pd.read_excel(origem(), header=4, skipfooter=1, engine='openpyxl')
             except Exception:
                 print(f'⚠️ Falha: Não foi possível ler {nome_arquivo}. Pulando arquivo.')
-                continue
+                return None
 
-        if df is not None and len(df) > 0:
-            
-            num_cols_df = df.shape[1]
-            if num_cols_df < len(COLUNAS_PADRAO):
-                 faltantes = len(COLUNAS_PADRAO) - num_cols_df
-                 for i in range(faltantes):
-                     df[f'Extra_Vazia_{i+1}'] = None
-            elif num_cols_df > len(COLUNAS_PADRAO):
-                 df = df.iloc[:, :len(COLUNAS_PADRAO)]
-            
-            df.columns = COLUNAS_PADRAO 
+    return df
 
-            df['Data_Ref'] = f'{ano_str}-{mes_str}'
-            
-            lista_dfs.append(df)
-            print(f'-> {nome_arquivo} carregado ({len(df)} linhas).')
+@instrumentar('arquivo')
+def ler_arquivo_ranking(caminho_completo, enc=None):
+    """
+    Lê um arquivo de ranking mensal (ou acumulado do ano, com o Data_Ref do nome) e devolve
+    o DataFrame com COLUNAS_PADRAO + Data_Ref (ou None se nenhuma estratégia de leitura
+    funcionar). Sem `enc`, o encoding é obtido por resolver_encoding.
+
+    Função de módulo (e não aninhada) para poder ser executada em um pool de processos.
+    """
+    nome_arquivo = os.path.basename(caminho_completo)
+
+    match_padrao = PADRAO_ARQUIVO_MENSAL.match(nome_arquivo) or PADRAO_ARQUIVO_ACUMULADO.match(nome_arquivo)
+    if match_padrao:
+        ano_str, mes_str = match_padrao.groups()
+    else:
+        partes_nome = nome_arquivo.split(' ')
+        if len(partes_nome) >= 4:
+            ano_str = partes_nome[2]
+            mes_str = partes_nome[3].split('.')[0].zfill(2)
+        else:
+            ano_str, mes_str = '9999', '99'
+
+    enc = enc or resolver_encoding(caminho_completo)
+    registro_atual().update(arquivo=nome_arquivo, bytes=tamanho_arquivo(caminho_completo))
+
+    with medir_etapa('layout'):
+        df = ler_com_layout(caminho_completo, enc)
+    if df is None:
+        df = _ler_com_tentativas(caminho_completo, enc)
+
+    if df is None or len(df) == 0:
+        return None
+
+    # Nas leituras com cabeçalho, a coluna 'Conglomerado' (2024+) sai pelo nome.
+    df = df.drop(columns=[c for c in df.columns if 'conglomerado' in str(c).lower()])
+
+    num_cols_df = df.shape[1]
+    if num_cols_df < len(COLUNAS_PADRAO):
+         faltantes = len(COLUNAS_PADRAO) - num_cols_df
+         for i in range(faltantes):
+             df[f'Extra_Vazia_{i+1}'] = None
+    elif num_cols_df > len(COLUNAS_PADRAO):
+         df = df.iloc[:, :len(COLUNAS_PADRAO)]
+    
+    df.columns = COLUNAS_PADRAO 
+
+    df['Data_Ref'] = f'{ano_str}-{mes_str}'
+    
+    print(f'-> {nome_arquivo} carregado ({len(df)} linhas).')
+    return df
+
+@instrumentar('encodings')
+def _entrada_vigente(chave, versoes):
+    """Se uma entrada do cache de encodings ainda vale: versão atual do arquivo, ou arquivo fora de `versoes` que ainda existe."""
+    caminho = chave.rsplit('|', 2)[0]
+    if caminho in versoes:
+        return chave == versoes[caminho]
+    return os.path.exists(separar_caminho_zip(caminho)[0] or caminho)
+
+def resolver_encodings(caminhos, caminho_cache_encoding=None, vigentes=None):
+    """
+    Resolve o encoding de cada arquivo, persistindo o cache em JSON quando há caminho.
+
+    O cache é compartilhado (mensais e acumulados, chamadas com só parte dos arquivos):
+    ao gravar, saem apenas versões antigas dos arquivos em `vigentes` (padrão: `caminhos`)
+    e entradas de arquivos que não existem mais; as demais são mantidas.
+    """
+    cache_encoding = ler_json(caminho_cache_encoding) if caminho_cache_encoding else None
+    encodings = [resolver_encoding(caminho, cache=cache_encoding) for caminho in caminhos]
+    if caminho_cache_encoding:
+        versoes = {os.path.abspath(c): chave_arquivo(c) for c in (caminhos if vigentes is None else vigentes)}
+        gravar_json_atomico({k: v for k, v in cache_encoding.items() if _entrada_vigente(k, versoes)},
+                            caminho_cache_encoding)
+    return encodings
+
+def ler_arquivos_ranking(caminhos, encodings, workers=1):
+    """Aplica ler_arquivo_ranking a cada arquivo, em série ou em um pool de processos, preservando a ordem."""
+    workers = workers or os.cpu_count() or 1
+
+    if workers > 1:
+        # No pool, as etapas por arquivo rodam em outros processos e não entram na instrumentação.
+        print(f'Iniciando unificação de {len(caminhos)} arquivos na pasta ({workers} processos)...')
+        chunksize = max(1, len(caminhos) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(ler_arquivo_ranking, caminhos, encodings, chunksize=chunksize))
+
+    print(f'Iniciando unificação de {len(caminhos)} arquivos na pasta...')
+    return [ler_arquivo_ranking(caminho, enc) for caminho, enc in zip(caminhos, encodings)]
+
+@instrumentar()
+def unificar_bases(pasta_csv, workers=1, caminho_cache_encoding=None):
+    """
+    Lê e concatena todos os rankings mensais da pasta.
+
+    Com `workers` > 1 (ou None para usar todos os núcleos) cada arquivo é lido em
+    um pool de processos; o resultado é idêntico ao modo serial e mantém a ordem
+    dos arquivos (e portanto de Data_Ref).
+
+    Os encodings são resolvidos antes, no processo principal. Com
+    `caminho_cache_encoding` o cache é persistido em JSON e consolidações
+    seguintes não fazem nenhuma detecção para arquivos inalterados.
+    """
+    arquivos = listar_arquivos_mensais(pasta_csv)
+    if not arquivos:
+        print(f'❌ Nenhum DataFrame CSV encontrado para unificar.')
+        return None
+
+    caminhos = [os.path.join(pasta_csv, f) for f in arquivos]
+    registro_atual().update(arquivos=len(caminhos), bytes=sum(tamanho_arquivo(c) for c in caminhos))
+    encodings = resolver_encodings(caminhos, caminho_cache_encoding)
+    resultados = ler_arquivos_ranking(caminhos, encodings, workers)
+
+    lista_dfs = [df for df in resultados if df is not None]
 
     if not lista_dfs:
         print(f'❌ Nenhum DataFrame válido encontrado para unificar.')
@@ -259,11 +1400,43 @@ def unificar_bases(pasta_csv):
 # =======================================================
 # TRATAMENTO DE DADOS
 # =======================================================
-def tratar_dados(df):
-    
+
+_REGEX_NAO_NUMERICO = re.compile(r'[^\d,\-]')
+
+def converter_numero_br(serie):
+    """
+    Converte uma coluna para float64 a partir do formato brasileiro.
+
+    Valores já numéricos (convertidos na leitura por ler_com_layout) só mudam de tipo.
+    Os que ainda são texto (' 1.948.990.122 ', '-   ') passam
+    por uma única regex que remove tudo que não é dígito, vírgula ou sinal (inclusive o
+    separador de milhar e os espaços) e trocam ',' por '.'; o resultado é o mesmo da
+    antiga sequência replace/replace/replace/strip.
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype('float64')
+
+    # Após o concat, uma mesma coluna pode misturar números (arquivos convertidos na leitura) e texto.
+    eh_texto = serie.map(type).eq(str)
+    resultado = pd.to_numeric(serie.where(~eh_texto), errors='coerce').astype('float64')
+
+    if eh_texto.any():
+        texto = (serie[eh_texto]
+                 .str.replace(_REGEX_NAO_NUMERICO, '', regex=True)
+                 .str.replace(',', '.', regex=False))
+        resultado[eh_texto] = pd.to_numeric(texto, errors='coerce')
+
+    return resultado
+
+@instrumentar()
+def tratar_dados(df, verboso=True):
+    """Limpa a base unificada (ou um único arquivo); `verboso=False` cala as mensagens de progresso."""
+    avisar = print if verboso else (lambda *args: None)
+
     if df is None or len(df) == 0:
-        print("🛑 ERRO: DataFrame consolidado recebido é nulo ou vazio.")
+        avisar("🛑 ERRO: DataFrame consolidado recebido é nulo ou vazio.")
         return None
+    registro_atual()['linhas_entrada'] = len(df)
 
     filtro_remover = [
         'TOTAL GERAL',
@@ -279,10 +1452,10 @@ def tratar_dados(df):
     
     df = df.dropna(subset=['Instituicao', 'Exportacao_Valor'])
     
-    print("✅ Linhas de 'TOTAL GERAL' e metadados removidas.")
+    avisar("✅ Linhas de 'TOTAL GERAL' e metadados removidas.")
     
     if len(df) == 0:
-        print("🛑 ERRO: DataFrame ficou vazio após remover sujeira.")
+        avisar("🛑 ERRO: DataFrame ficou vazio após remover sujeira.")
         return None
 
     novos_nomes = [
@@ -306,7 +1479,7 @@ def tratar_dados(df):
 
     df.columns = nomes_reais[:num_cols_atual]
     
-    print("✅ Colunas renomeadas.")
+    avisar("✅ Colunas renomeadas.")
     
     cols_interbancarias = ['Interbancario_C_Valor', 'Interbancario_V_Valor',
                            'Interbancario_C_Quant', 'Interbancario_V_Quant']
@@ -314,40 +1487,1346 @@ def tratar_dados(df):
     cols_to_drop = [col for col in cols_interbancarias if col in df.columns]
 
     df_final = df.drop(columns=cols_to_drop, errors='ignore')
-    print("✅ Colunas interbancárias removidas.")
+    avisar("✅ Colunas interbancárias removidas.")
     
     cols_valor_quant = [col for col in df_final.columns if 'Valor' in col or 'Quant' in col]
 
     for col in cols_valor_quant:
-        if df_final[col].dtype == 'object':
-            df_final[col] = (df_final[col]
-                             .astype(str)
-                             .str.replace(r'[^\d\.\,\-]', '', regex=True)
-                             .str.replace('.', '', regex=False)
-                             .str.replace(',', '.', regex=False)
-                             .str.strip()
-                            )
-
-        df_final[col] = pd.to_numeric(df_final[col], errors='coerce')
+        df_final[col] = converter_numero_br(df_final[col])
         
-    print("✅ Tipos de dados de valor e quantidade convertidos para numérico.")
+    avisar("✅ Tipos de dados de valor e quantidade convertidos para numérico.")
     
     if len(df_final) == 0:
-        print("🛑 ERRO: DataFrame final está vazio. Retornando None.")
+        avisar("🛑 ERRO: DataFrame final está vazio. Retornando None.")
         return None
         
     return df_final
 
+# =======================================================
+# BASE COMPACTA (TIPOS)
+# =======================================================
+
+_PADRAO_DATA_REF = re.compile(r'^(\d{4})-(\d{2})$')
+
+def _menor_inteiro_nulavel(serie, minimo='Int16'):
+    """Menor tipo inteiro nulável (a partir de `minimo`) que comporta os valores, ou None se nenhum até Int32 serve."""
+    tipos = ['Int16', 'Int32']
+    valores = serie.dropna()
+    for tipo in tipos[tipos.index(minimo):]:
+        info = np.iinfo(tipo.lower())
+        if valores.empty or (valores.min() >= info.min and valores.max() <= info.max):
+            return tipo
+    return None
+
+def data_ref_para_inteiro(serie):
+    """
+    Converte Data_Ref 'AAAA-MM' em inteiro AAAAMM (int32).
+
+    Não usa period[M] porque a base tem meses fora do calendário: os arquivos de 2014
+    baixados manualmente entram como 'AAAA-00' e o fallback de nomes usa '9999-99'.
+    Valores fora do padrão viram <NA> (Int32).
+    """
+    codigos, meses = pd.factorize(serie)
+    inteiros = pd.to_numeric(pd.Index(meses).astype(str).str.replace(_PADRAO_DATA_REF, r'\1\2', regex=True), errors='coerce')
+    tipo = 'int32' if not np.isnan(inteiros).any() and (codigos >= 0).all() else 'Int32'
+    valores = pd.array(inteiros, dtype='Int32').take(codigos, allow_fill=True)
+    return pd.Series(valores, index=serie.index, name=serie.name).astype(tipo)
+
+def data_ref_texto(meses):
+    """Inverso de data_ref_para_inteiro para um Index de meses: AAAAMM -> 'AAAA-MM'. Texto passa direto."""
+    meses = pd.Index(meses)
+    if pd.api.types.is_integer_dtype(meses.dtype):
+        return pd.Index([f'{m // 100:04d}-{m % 100:02d}' for m in meses], dtype=object)
+    return meses.astype(str)
+
+def _converter_por_valores_unicos(serie, conversor, tipo):
+    # Poucos valores distintos: converte só os únicos e espalha pelos códigos do factorize.
+    codigos, unicos = pd.factorize(serie)
+    convertidos = pd.array(conversor(pd.Series(unicos, dtype=object)), dtype=tipo)
+    return pd.Series(convertidos.take(codigos, allow_fill=True), index=serie.index, name=serie.name)
+
+def _cnpj_raiz_texto_para_numero(texto):
+    texto = texto.where(texto.map(type).eq(str)).str.strip()
+    validos = texto.str.fullmatch(r'\d{1,3}(\.\d{3})*|\d{1,8}').fillna(False).astype(bool)
+    return pd.to_numeric(texto.where(validos).str.replace('.', '', regex=False), errors='coerce')
+
+def cnpj_raiz_para_inteiro(serie):
+    """'04.913.711' -> 4913711 (Int32). Códigos fora do formato viram <NA>."""
+    return _converter_por_valores_unicos(serie, _cnpj_raiz_texto_para_numero, 'Int32')
+
+def cnpj_raiz_texto(numero):
+    """Inverso de cnpj_raiz_para_inteiro para um valor: 4913711 -> '04.913.711'."""
+    texto = f'{int(numero):08d}'
+    return f'{texto[:2]}.{texto[2:5]}.{texto[5:]}'
+
+def relatorio_memoria(antes, depois):
+    """Tabela com a memória (MB, deep) de cada coluna antes e depois, mais o total."""
+    mb_antes = antes.memory_usage(deep=True, index=False) / 1e6
+    mb_depois = depois.memory_usage(deep=True, index=False) / 1e6
+    relatorio = pd.DataFrame({
+        'Tipo_Antes': antes.dtypes.astype(str), 'MB_Antes': mb_antes,
+        'Tipo_Depois': depois.dtypes.astype(str), 'MB_Depois': mb_depois,
+    })
+    relatorio.loc['TOTAL'] = ['', mb_antes.sum(), '', mb_depois.sum()]
+    return relatorio.round({'MB_Antes': 3, 'MB_Depois': 3})
+
+@instrumentar()
+def compactar_base(df, relatorio=True):
+    """
+    Aplica o esquema compacto à base tratada (para análise e dashboard; o CSV final
+    continua sendo gravado a partir da base original):
+      - Instituicao: category;
+      - Codigo_Instituicao (raiz do CNPJ '04.913.711'): Int32;
+      - Data_Ref: inteiro AAAAMM (int32);
+      - Rank: Int16 e colunas _Quant: Int32. Colunas _Quant que não cabem em Int32
+        ou que têm casas decimais continuam float64, que ocupa menos que Int64;
+      - colunas _Valor continuam float64.
+    Com `relatorio`, imprime a memória por coluna antes e depois.
+    """
+    compacto = df.copy()
+
+    if 'Instituicao' in compacto.columns:
+        compacto['Instituicao'] = compacto['Instituicao'].astype('category')
+    if 'Codigo_Instituicao' in compacto.columns:
+        compacto['Codigo_Instituicao'] = cnpj_raiz_para_inteiro(compacto['Codigo_Instituicao'])
+    if 'Data_Ref' in compacto.columns:
+        compacto['Data_Ref'] = data_ref_para_inteiro(compacto['Data_Ref'])
+    if 'Rank' in compacto.columns:
+        rank = _converter_por_valores_unicos(compacto['Rank'], lambda u: pd.to_numeric(u, errors='coerce'), 'Float64')
+        compacto['Rank'] = rank.astype(_menor_inteiro_nulavel(rank) or 'float64')
+
+    for col in [c for c in compacto.columns if c.endswith('_Quant')]:
+        valores = pd.to_numeric(compacto[col], errors='coerce')
+        tipo = _menor_inteiro_nulavel(valores, minimo='Int32')
+        if tipo and (valores.dropna() % 1 == 0).all():
+            compacto[col] = valores.astype(tipo)
+
+    if relatorio:
+        tabela = relatorio_memoria(df, compacto)
+        total_antes, total_depois = tabela.loc['TOTAL', 'MB_Antes'], tabela.loc['TOTAL', 'MB_Depois']
+        print('\n📦 Memória da base (MB, deep):')
+        print(tabela.to_string())
+        print(f'✅ Base compactada: {total_antes:.2f} MB -> {total_depois:.2f} MB ({total_antes / total_depois:.1f}x menor).')
+
+    return compacto
+
+# =======================================================
+# DIMENSÃO DE INSTITUIÇÕES
+# =======================================================
+
+_TRAVESSAO_OU_PERDIDO = re.compile(r'\s+[?–—�]\s+')  # ' – ', ' — ' e o '?' de caractere perdido
+
+def _corrigir_mojibake(nome):
+    # 'CÃ‚MBIO' (UTF-8 lido como cp1252) -> 'CÂMBIO'; nomes corretos não fazem o caminho de volta.
+    try:
+        return nome.encode('cp1252').decode('utf-8')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return nome
+
+def normalizar_nome_instituicao(nomes):
+    """
+    Padroniza a grafia dos nomes de instituição (Series ou Index de texto):
+    desfaz mojibake UTF-8/cp1252, troca travessões e '?' soltos por '-', junta
+    espaços repetidos e põe em maiúsculas.
+    """
+    nomes = pd.Series(nomes, dtype=object)
+    return (nomes.map(lambda n: _corrigir_mojibake(n) if isinstance(n, str) else n)
+            .str.replace(_TRAVESSAO_OU_PERDIDO, ' - ', regex=True)
+            .str.replace(r'\s+', ' ', regex=True)
+            .str.strip().str.upper())
+
+def construir_dimensao_instituicoes(df):
+    """
+    Monta a tabela de instituições da base (texto ou compacta) e o id de cada linha.
+
+    A chave é a raiz do CNPJ (Codigo_Instituicao), que junta as grafias e os nomes
+    antigos de uma mesma instituição; linhas sem CNPJ válido são agrupadas pelo nome
+    normalizado. O nome canônico é o nome normalizado usado no mês mais recente.
+    Devolve (dimensao, ids):
+      - dimensao: Id_Instituicao (int32 denso, em ordem alfabética do nome canônico),
+        Cnpj_Raiz (Int32), Instituicao, Variantes (grafias distintas encontradas),
+        Primeiro_Mes e Ultimo_Mes (no formato de Data_Ref da base);
+      - ids: array int32 com o Id_Instituicao de cada linha de df.
+    """
+    cnpj = df['Codigo_Instituicao']
+    if not pd.api.types.is_integer_dtype(cnpj.dtype):
+        cnpj = cnpj_raiz_para_inteiro(cnpj)
+    cnpj = cnpj.to_numpy(dtype='int64', na_value=-1)
+    codigos_nome, nomes = pd.factorize(df['Instituicao'])
+    codigos_mes, meses = pd.factorize(df['Data_Ref'], sort=True)
+
+    # Cada linha vira um par (CNPJ, grafia); as contas seguintes são feitas sobre os poucos pares.
+    codigos_par, pares = pd.factorize((cnpj + 1) * (len(nomes) + 1) + (codigos_nome + 1))
+    par_cnpj = pares // (len(nomes) + 1) - 1
+    par_nome = pares % (len(nomes) + 1) - 1
+    ultimo_mes = np.full(len(pares), -1, dtype='int64')
+    np.maximum.at(ultimo_mes, codigos_par, codigos_mes)
+    primeiro_mes = np.full(len(pares), len(meses), dtype='int64')
+    np.minimum.at(primeiro_mes, codigos_par, np.where(codigos_mes >= 0, codigos_mes, len(meses)))
+    linhas_par = np.bincount(codigos_par, minlength=len(pares))
+
+    nome_normalizado = normalizar_nome_instituicao(pd.Index(nomes, dtype=object)[par_nome].where(par_nome >= 0))
+    tabela = pd.DataFrame({
+        'Cnpj_Raiz': pd.array(np.where(par_cnpj >= 0, par_cnpj, pd.NA), dtype='Int32'),
+        'Nome': nome_normalizado.to_numpy(), 'Grafia': par_nome,
+        'Primeiro': primeiro_mes, 'Ultimo': ultimo_mes, 'Linhas': linhas_par,
+    })
+    # Sem CNPJ nem nome a linha fica fora da dimensão (id -1), como no groupby por Instituicao.
+    tabela['Chave'] = pd.Series(np.where(par_cnpj >= 0, par_cnpj.astype(str), 'nome:' + tabela['Nome'])).where(
+        (par_cnpj >= 0) | tabela['Nome'].notna())
+
+    # Nome canônico: o do mês mais recente (empate: o mais frequente).
+    validos = tabela.dropna(subset=['Chave'])
+    recentes = validos.sort_values(['Chave', 'Ultimo', 'Linhas'], ascending=[True, False, False]).drop_duplicates('Chave')
+    grupos = validos.groupby('Chave')
+    dimensao = pd.DataFrame({
+        'Cnpj_Raiz': recentes.set_index('Chave')['Cnpj_Raiz'],
+        'Instituicao': recentes.set_index('Chave')['Nome'],
+        'Variantes': grupos['Grafia'].nunique(),
+        'Primeiro': grupos['Primeiro'].min(),
+        'Ultimo': grupos['Ultimo'].max(),
+    })
+    # CNPJs diferentes com o mesmo nome canônico recebem a raiz no nome, para não se misturarem no cubo.
+    repetidos = dimensao['Instituicao'].duplicated(keep=False) & dimensao['Cnpj_Raiz'].notna()
+    dimensao.loc[repetidos, 'Instituicao'] = (dimensao.loc[repetidos, 'Instituicao'] + ' (CNPJ '
+                                              + dimensao.loc[repetidos, 'Cnpj_Raiz'].map(cnpj_raiz_texto) + ')')
+
+    dimensao = dimensao.sort_values(['Instituicao', 'Cnpj_Raiz'], kind='stable')
+    id_da_chave = pd.Series(np.arange(len(dimensao), dtype='int32'), index=dimensao.index)
+    ids = id_da_chave.reindex(tabela['Chave']).fillna(-1).to_numpy(dtype='int32')[codigos_par]
+
+    meses_texto = pd.Index(meses)
+    fora = len(meses)
+    dimensao = dimensao.reset_index(drop=True)
+    dimensao.insert(0, 'Id_Instituicao', np.arange(len(dimensao), dtype='int32'))
+    dimensao['Primeiro_Mes'] = [meses_texto[m] if 0 <= m < fora else None for m in dimensao.pop('Primeiro')]
+    dimensao['Ultimo_Mes'] = [meses_texto[m] if 0 <= m < fora else None for m in dimensao.pop('Ultimo')]
+    return dimensao, ids
+
+@instrumentar()
+def separar_dimensao_instituicoes(df):
+    """
+    Separa a base em fato + dimensão de instituições.
+
+    O fato troca Codigo_Instituicao e Instituicao por Id_Instituicao (int32);
+    agrupamentos e junções passam a usar inteiros e somam corretamente uma
+    instituição que mudou de nome. Devolve (fato, dimensao).
+    """
+    dimensao, ids = construir_dimensao_instituicoes(df)
+    registro_atual()['linhas'] = len(df)
+    fato = df.drop(columns=['Codigo_Instituicao', 'Instituicao'])
+    fato.insert(min(1, len(fato.columns)), 'Id_Instituicao', ids)
+    return fato, dimensao
+
+# =======================================================
+# CONSOLIDAÇÃO INCREMENTAL
+# =======================================================
+
+# Incrementar quando a leitura ou o tratamento mudarem: invalida todas as partições em cache.
+VERSAO_CONSOLIDACAO = 2  # 2: coluna Conglomerado (2024+) descartada na leitura
+ARQUIVO_INDICE_CONSOLIDACAO = 'indice.json'
+
+def hash_arquivo(caminho):
+    """SHA-256 do conteúdo do arquivo, lido em blocos."""
+    h = hashlib.sha256()
+    with abrir_arquivo(caminho) as f:
+        for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+def impressao_digital(caminho, anterior=None):
+    """
+    Devolve {tamanho, mtime_ns, sha256} do arquivo.
+
+    Se tamanho e mtime batem com `anterior`, o hash guardado é reaproveitado sem
+    reler o arquivo; só arquivos tocados são relidos para o hash.
+    """
+    tamanho, mtime_ns = info_arquivo(caminho)
+    digital = {'tamanho': tamanho, 'mtime_ns': mtime_ns}
+    if anterior and anterior.get('tamanho') == tamanho and anterior.get('mtime_ns') == mtime_ns:
+        digital['sha256'] = anterior.get('sha256')
+    else:
+        digital['sha256'] = hash_arquivo(caminho)
+    return digital
+
+def _nome_particao(nome_arquivo, data_ref):
+    # Arquivos fora do padrão (fallback) podem compartilhar Data_Ref '9999-99': usam o próprio nome.
+    if PADRAO_ARQUIVO_MENSAL.match(nome_arquivo):
+        return f'{data_ref}.pkl'
+    return f'{os.path.splitext(nome_arquivo)[0]}.pkl'
+
+def tratar_por_arquivo(lidos, verboso=True):
+    """
+    Trata vários arquivos lidos com um único tratar_dados e devolve o resultado separado
+    por arquivo, na mesma ordem (None para arquivos não lidos ou sem linhas válidas).
+
+    O índice do concat (preservado pelos filtros) diz de qual arquivo veio cada linha.
+    """
+    validos = [df for df in lidos if df is not None]
+    df_tratado_todos = tratar_dados(pd.concat(validos, ignore_index=True), verboso=verboso) if validos else None
+    limites = list(itertools.accumulate(len(df) for df in validos))
+    posicoes = iter(range(len(validos)))
+
+    tratados = []
+    for df in lidos:
+        df_tratado = None
+        if df is not None and df_tratado_todos is not None:
+            i = next(posicoes)
+            inicio = limites[i - 1] if i else 0
+            df_tratado = df_tratado_todos[(df_tratado_todos.index >= inicio) & (df_tratado_todos.index < limites[i])]
+            df_tratado = df_tratado.reset_index(drop=True) if len(df_tratado) else None
+        tratados.append(df_tratado)
+    return tratados
+
+def carregar_indice_consolidacao(pasta_cache):
+    """Índice do cache de consolidação ({versao, arquivos}); vazio se não existir ou for de outra versão."""
+    indice = ler_json(os.path.join(pasta_cache, ARQUIVO_INDICE_CONSOLIDACAO))
+    if indice.get('versao') != VERSAO_CONSOLIDACAO:
+        indice = {'versao': VERSAO_CONSOLIDACAO, 'arquivos': {}}
+    return indice
+
+def particao_atualizada(pasta_cache, anterior, digital):
+    """Indica se a partição registrada em `anterior` ainda vale para um arquivo com essa impressão digital."""
+    particao = anterior.get('particao') if anterior else None
+    em_cache = particao is None or os.path.exists(os.path.join(pasta_cache, particao))
+    return bool(anterior) and anterior.get('sha256') == digital['sha256'] and em_cache
+
+def gravar_particao(pasta_cache, nome, df_tratado):
+    """Grava a partição tratada de um arquivo (AAAA-MM.pkl) de forma atômica e devolve o nome dela."""
+    particao = _nome_particao(nome, df_tratado['Data_Ref'].iloc[0])
+    caminho_tmp = os.path.join(pasta_cache, particao + '.tmp')
+    df_tratado.to_pickle(caminho_tmp)
+    os.replace(caminho_tmp, os.path.join(pasta_cache, particao))
+    return particao
+
+@instrumentar()
+def consolidar_incremental(pasta_csv, pasta_cache, workers=1, caminho_cache_encoding=None):
+    """
+    Equivale a tratar_dados(unificar_bases(pasta_csv)), mas relendo só arquivos novos ou alterados.
+
+    Cada arquivo mensal tem uma partição já tratada em `pasta_cache` (AAAA-MM.pkl) e
+    uma impressão digital (nome, tamanho, mtime, SHA-256) em indice.json. Arquivos cuja
+    digital não mudou (um mtime diferente com o mesmo hash também conta como inalterado)
+    vêm do cache; os demais são lidos e tratados juntos em um único tratar_dados e
+    separados de volta por arquivo — o tratamento é linha a linha, então o resultado é
+    o mesmo que tratar a base inteira. Partições de arquivos removidos são apagadas. A base é remontada pela concatenação das
+    partições na ordem dos arquivos, com índice 0..n-1.
+    """
+    arquivos = listar_arquivos_mensais(pasta_csv)
+    if not arquivos:
+        print(f'❌ Nenhum DataFrame CSV encontrado para unificar.')
+        return None
+
+    caminhos = [os.path.join(pasta_csv, f) for f in arquivos]
+    # O índice usa o nome do CSV, extraído ou dentro do ZIP: trocar de modo não invalida o cache.
+    arquivos = [os.path.basename(f) for f in arquivos]
+
+    criar_pasta(pasta_cache)
+    caminho_indice = os.path.join(pasta_cache, ARQUIVO_INDICE_CONSOLIDACAO)
+    indice = carregar_indice_consolidacao(pasta_cache)
+    anteriores = indice['arquivos']
+
+    digitais = {}
+    pendentes = []
+    for nome, caminho in zip(arquivos, caminhos):
+        anterior = anteriores.get(nome)
+        digitais[nome] = impressao_digital(caminho, anterior)
+        if not particao_atualizada(pasta_cache, anterior, digitais[nome]):
+            pendentes.append((nome, caminho))
+
+    print(f'Consolidação incremental: {len(arquivos) - len(pendentes)} arquivos em cache, {len(pendentes)} a processar.')
+    registro_atual().update(arquivos=len(arquivos), pendentes=len(pendentes), bytes=sum(digitais[n]['tamanho'] for n, _ in pendentes))
+
+    novas = {}
+    if pendentes:
+        encodings = resolver_encodings([c for _, c in pendentes], caminho_cache_encoding, vigentes=caminhos)
+        lidos = ler_arquivos_ranking([c for _, c in pendentes], encodings, workers)
+
+        for (nome, _), df_tratado in zip(pendentes, tratar_por_arquivo(lidos)):
+            particao = None
+            if df_tratado is not None:
+                particao = gravar_particao(pasta_cache, nome, df_tratado)
+                novas[nome] = df_tratado
+            anteriores[nome] = {**digitais[nome], 'particao': particao}
+
+    for nome in arquivos:
+        anteriores[nome].update({k: digitais[nome][k] for k in ('tamanho', 'mtime_ns')})
+
+    # Partições de arquivos que sumiram da pasta (ou que ficaram vazias) são apagadas.
+    for nome in [n for n in anteriores if n not in digitais]:
+        del anteriores[nome]
+    particoes_atuais = {anteriores[nome].get('particao') for nome in arquivos}
+    for particao in os.listdir(pasta_cache):
+        if particao.endswith('.pkl') and particao not in particoes_atuais:
+            os.remove(os.path.join(pasta_cache, particao))
+
+    gravar_json_atomico(indice, caminho_indice)
+
+    lista_dfs = []
+    for nome in arquivos:
+        particao = anteriores[nome].get('particao')
+        if nome in novas:
+            lista_dfs.append(novas[nome])
+        elif particao:
+            lista_dfs.append(pd.read_pickle(os.path.join(pasta_cache, particao)))
+
+    if not lista_dfs:
+        print(f'❌ Nenhum DataFrame válido encontrado para unificar.')
+        return None
+
+    df_final = pd.concat(lista_dfs, ignore_index=True)
+    print(f'✅ Base consolidada a partir de {len(lista_dfs)} partições. Total de linhas: {len(df_final)}.')
+    return df_final
+
+# =======================================================
+# AQUISIÇÃO EM PIPELINE (DOWNLOAD -> FILA -> TRATAMENTO)
+# =======================================================
+
+def _arquivos_mensais_baixados(destino_pasta, arquivos):
+    """Caminhos relativos dos CSVs mensais entre os arquivos de um download (extraídos ou dentro do ZIP)."""
+    mensais = []
+    for nome in arquivos:
+        if PADRAO_ARQUIVO_MENSAL.match(nome):
+            mensais.append(nome)
+        elif PADRAO_ZIP_ARMAZENADO.match(nome):
+            mensais.extend(membros_mensais_do_zip(destino_pasta, nome))
+    return mensais
+
+def tratar_e_gravar_particoes(pendentes, encodings, pasta_cache):
+    """
+    Lê, trata (um único tratar_dados) e grava as partições de [(nome, caminho, digital)];
+    devolve {nome: entrada do índice de consolidação}.
+
+    Função de módulo (e não aninhada) para poder ser executada em um pool de processos.
+    """
+    lidos = [ler_arquivo_ranking(caminho, enc) for (_, caminho, _), enc in zip(pendentes, encodings)]
+    entradas = {}
+    for (nome, _, digital), df_tratado in zip(pendentes, tratar_por_arquivo(lidos, verboso=False)):
+        particao = gravar_particao(pasta_cache, nome, df_tratado) if df_tratado is not None else None
+        entradas[nome] = {**digital, 'particao': particao}
+    return entradas
+
+def _consolidar_lote(destino_pasta, relativos, pasta_cache, anteriores, trava, cache_encoding, executor=None):
+    """Trata os arquivos mensais do lote cujas partições não estão atualizadas (no executor, se houver)."""
+    pendentes = []
+    for relativo in dict.fromkeys(relativos):
+        nome = os.path.basename(relativo)
+        caminho = os.path.join(destino_pasta, relativo)
+        with trava:
+            anterior = anteriores.get(nome)
+        digital = impressao_digital(caminho, anterior)
+        if particao_atualizada(pasta_cache, anterior, digital):
+            with trava:
+                anteriores[nome].update(tamanho=digital['tamanho'], mtime_ns=digital['mtime_ns'])
+        else:
+            pendentes.append((nome, caminho, digital))
+    if not pendentes:
+        return
+
+    encodings = [resolver_encoding(caminho, cache=cache_encoding) for _, caminho, _ in pendentes]
+    if executor is not None:
+        entradas = executor.submit(tratar_e_gravar_particoes, pendentes, encodings, pasta_cache).result()
+    else:
+        entradas = tratar_e_gravar_particoes(pendentes, encodings, pasta_cache)
+    with trava:
+        anteriores.update(entradas)
+
+@instrumentar()
+def adquirir_em_pipeline(tarefas, destino_pasta, pasta_cache, sessao=None, manifesto=None, caminho_manifesto=None,
+                         tamanho_fila=4, workers=1, processos=False, manter_zip=False, caminho_cache_encoding=None):
+    """
+    Baixa e trata ao mesmo tempo: enquanto o mês N é lido e tratado, o mês N+1 já está baixando.
+
+    `tarefas` é uma lista de (url, ano, mes, revalidar). O download (baixar_e_extrair_zip,
+    na ordem das tarefas) roda na thread chamadora e põe cada mês numa fila limitada a
+    `tamanho_fila`; `workers` threads consomem a fila, leem e tratam os CSVs mensais do mês
+    e gravam a partição no cache de consolidação, no mesmo formato de consolidar_incremental.
+    Com a fila cheia o download espera (backpressure). O manifesto é salvo a cada download
+    quando há `caminho_manifesto`, e o índice do cache ao final: o consolidar_incremental
+    seguinte encontra esses meses prontos e só remonta a base.
+
+    Retorna a lista de resultados de baixar_e_extrair_zip, na ordem das tarefas.
+    """
+    manifesto = {} if manifesto is None else manifesto
+    criar_pasta(pasta_cache)
+    indice = carregar_indice_consolidacao(pasta_cache)
+    anteriores = indice['arquivos']
+    cache_encoding = ler_json(caminho_cache_encoding) if caminho_cache_encoding else {}
+    trava = threading.Lock()
+    fila = queue.Queue(maxsize=tamanho_fila)
+    fim = object()
+
+    def consumidor():
+        while True:
+            # Leva tudo o que já está na fila: um tratar_dados por lote dilui o custo fixo por chamada.
+            lote = [fila.get()]
+            while lote[-1] is not fim:
+                try:
+                    lote.append(fila.get_nowait())
+                except queue.Empty:
+                    break
+            encerrar = lote[-1] is fim
+            relativos = [relativo for mensais in lote if mensais is not fim for relativo in mensais]
+            try:
+                _consolidar_lote(destino_pasta, relativos, pasta_cache, anteriores, trava, cache_encoding, executor)
+            except Exception as e:
+                print(f'❌ Erro ao tratar {", ".join(relativos)} no pipeline: {e}')
+            if encerrar:
+                fila.put(fim)  # devolve o aviso de fim para as demais threads
+                return
+
+    executor = ProcessPoolExecutor(max_workers=max(1, workers)) if processos else None
+    threads = [threading.Thread(target=consumidor, daemon=True) for _ in range(max(1, workers))]
+    for thread in threads:
+        thread.start()
+
+    resultados = []
+    try:
+        for url, ano, mes, revalidar in tarefas:
+            ok = baixar_e_extrair_zip(url, destino_pasta, ano, mes, sessao=sessao, manifesto=manifesto,
+                                      revalidar=revalidar, manter_zip=manter_zip)
+            resultados.append(ok)
+            if ok and url in manifesto:
+                if caminho_manifesto:
+                    salvar_manifesto(manifesto, caminho_manifesto)
+                fila.put(_arquivos_mensais_baixados(destino_pasta, manifesto[url]['arquivos']))
+    finally:
+        fila.put(fim)
+        for thread in threads:
+            thread.join()
+        if executor is not None:
+            executor.shutdown()
+
+    gravar_json_atomico(indice, os.path.join(pasta_cache, ARQUIVO_INDICE_CONSOLIDACAO))
+    if caminho_cache_encoding:
+        gravar_json_atomico(cache_encoding, caminho_cache_encoding)
+
+    registro_atual().update(tarefas=len(tarefas), baixadas=sum(bool(r) for r in resultados))
+    print(f'✅ Pipeline de aquisição concluído: {sum(bool(r) for r in resultados)} de {len(tarefas)} downloads, '
+          f'{len(anteriores)} arquivos no cache de consolidação.')
+    return resultados
+
+# =======================================================
+# SAÍDA COLUNAR (PARQUET PARTICIONADO)
+# =======================================================
+
+ARQUIVO_CSV_FINAL = 'base_final_tratada_unica.csv'
+PASTA_PARQUET = 'base_final_parquet'
+
+# Colunas lidas por analisar_dados e pelo dashboard.
+COLUNAS_ANALISE = [
+    'Data_Ref', 'Codigo_Instituicao', 'Instituicao', 'Exportacao_Quant', 'Exportacao_Valor', 'Importacao_Valor',
+    'Transf_Exterior_Valor', 'Transf_pExterior_Valor', 'Mercado_Primario_Valor', 'Total_Geral_Valor',
+]
+
+def _particionamento_ano():
+    return ds.partitioning(pa.schema([('Ano', pa.int16())]), flavor='hive')
+
+def _promover_pasta(pasta_nova, pasta_destino):
+    """
+    Troca pasta_destino por pasta_nova só com renomeações: a antiga sai para '<destino>.antigo',
+    a nova entra no lugar e só então a antiga é apagada. Se a troca falhar, a antiga volta.
+    """
+    pasta_antiga = pasta_destino.rstrip(os.sep) + '.antigo'
+    shutil.rmtree(pasta_antiga, ignore_errors=True)
+    if os.path.exists(pasta_destino):
+        os.replace(pasta_destino, pasta_antiga)
+    try:
+        os.replace(pasta_nova, pasta_destino)
+    except OSError:
+        if os.path.exists(pasta_antiga):
+            os.replace(pasta_antiga, pasta_destino)
+        raise
+    shutil.rmtree(pasta_antiga, ignore_errors=True)
+
+@instrumentar()
+def salvar_base_parquet(df, pasta_destino):
+    """
+    Grava a base tratada como Parquet particionado por ano (pasta_destino/Ano=AAAA/).
+
+    Cada ano vira um único arquivo (um row group, compressão zstd) com as linhas
+    ordenadas por Data_Ref; row groups mensais deixariam os arquivos maiores e a
+    leitura mais lenta neste volume. A pasta é montada ao lado e trocada no final por
+    renomeação (_promover_pasta): leitores nunca veem uma gravação pela metade, no
+    máximo a pasta ausente no instante entre as duas renomeações.
+    """
+    if pa is None:
+        print('⚠️ pyarrow não instalado: saída Parquet ignorada (apenas o CSV foi gerado).')
+        return False
+
+    pasta_tmp = pasta_destino.rstrip(os.sep) + '.parcial'
+    try:
+        shutil.rmtree(pasta_tmp, ignore_errors=True)
+        # 'Ano' (criada por analisar_dados) é a própria partição.
+        df = df.drop(columns='Ano', errors='ignore').sort_values('Data_Ref', kind='stable').reset_index(drop=True)
+        esquema = pa.Schema.from_pandas(df, preserve_index=False)
+
+        for ano, df_ano in df.groupby(df['Data_Ref'].str[:4], sort=True):
+            pasta_ano = os.path.join(pasta_tmp, f'Ano={ano}')
+            os.makedirs(pasta_ano, exist_ok=True)
+            tabela = pa.Table.from_pandas(df_ano, schema=esquema, preserve_index=False)
+            pq.write_table(tabela, os.path.join(pasta_ano, 'parte-0.parquet'), compression='zstd')
+
+        _promover_pasta(pasta_tmp, pasta_destino)
+        print(f'✅ Base Parquet salva em: {pasta_destino}')
+        return True
+    except Exception as e:
+        shutil.rmtree(pasta_tmp, ignore_errors=True)
+        print(f'❌ Erro ao salvar a base Parquet: {e}')
+        return False
+
+def ler_base_parquet(pasta, colunas=None, anos=None, data_refs=None):
+    """
+    Lê a base Parquet trazendo só as colunas e partições pedidas.
+
+    `anos` descarta pastas inteiras (Ano=AAAA) sem abri-las; `data_refs` ('AAAA-MM')
+    filtra as linhas dentro dos anos lidos. Sem filtros lê a base inteira.
+    Retorna None se a base não existir ou o pyarrow não estiver instalado.
+    """
+    if pa is None or not os.path.isdir(pasta):
+        return None
+
+    filtro = None
+    if anos is not None:
+        filtro = ds.field('Ano').isin([int(a) for a in anos])
+    if data_refs is not None:
+        filtro_mes = ds.field('Data_Ref').isin(list(data_refs))
+        filtro = filtro_mes if filtro is None else filtro & filtro_mes
+
+    try:
+        dataset = ds.dataset(pasta, format='parquet', partitioning=_particionamento_ano())
+        if colunas is None:
+            colunas = [c for c in dataset.schema.names if c != 'Ano']
+        return dataset.to_table(columns=list(colunas), filter=filtro).to_pandas()
+    except Exception as e:
+        print(f'❌ Erro ao ler a base Parquet {pasta}: {e}')
+        return None
+
+def iterar_base_parquet_por_ano(pasta, colunas=None):
+    """Lê a base Parquet um ano (partição Ano=AAAA) por vez: o pico de memória fica em um ano."""
+    if pa is None or not os.path.isdir(pasta):
+        return
+    anos = sorted(int(nome.split('=', 1)[1]) for nome in os.listdir(pasta) if nome.startswith('Ano='))
+    for ano in anos:
+        df = ler_base_parquet(pasta, colunas=colunas, anos=[ano])
+        if df is not None and len(df) > 0:
+            yield df
+
+def carregar_base_final(destino_base, colunas=None, anos=None):
+    """
+    Carrega a base tratada de `destino_base`, preferindo o Parquet e caindo para o CSV.
+
+    No CSV as colunas também são filtradas na leitura (usecols); o filtro de anos é
+    aplicado depois do parse.
+    """
+    df = ler_base_parquet(os.path.join(destino_base, PASTA_PARQUET), colunas=colunas, anos=anos)
+    if df is not None:
+        return df
+
+    caminho_csv = os.path.join(destino_base, ARQUIVO_CSV_FINAL)
+    df = pd.read_csv(caminho_csv, sep=';', encoding='utf-8-sig', usecols=colunas)
+    if anos is not None:
+        df = df[df['Data_Ref'].str[:4].isin({str(a) for a in anos})].reset_index(drop=True)
+    return df
+
+# =======================================================
+# CONSULTAS SQL (SQLITE EMBUTIDO)
+# =======================================================
+
+ARQUIVO_SQLITE = 'base_final.sqlite'
+LINHAS_POR_LOTE_SQLITE = 50_000  # linhas convertidas e inseridas por executemany
+
+_TIPOS_SQLITE = {'f': 'REAL', 'i': 'INTEGER', 'u': 'INTEGER', 'b': 'INTEGER'}
+
+# Consultas prontas para consultar_sql; os parâmetros vão por nome (ex.: {'inicio': '2018-T1', 'fim': '2019-T4', 'top': 10}).
+CONSULTAS_SQL = {
+    # As `top` instituições com maior valor de importação em cada trimestre do intervalo.
+    'top_importadores_trimestre': """
+        SELECT Trimestre, Posicao, Instituicao, Importacao_Valor FROM (
+            SELECT Trimestre, Instituicao, SUM(Importacao_Valor) AS Importacao_Valor,
+                   ROW_NUMBER() OVER (PARTITION BY Trimestre ORDER BY SUM(Importacao_Valor) DESC) AS Posicao
+            FROM ranking
+            WHERE Trimestre BETWEEN :inicio AND :fim
+            GROUP BY Trimestre, Instituicao
+        )
+        WHERE Posicao <= :top
+        ORDER BY Trimestre, Posicao
+    """,
+    # Totais de um ano por mês (Data_Ref).
+    'totais_mensais_do_ano': """
+        SELECT Data_Ref, SUM(Total_Geral_Valor) AS Total_Geral_Valor, SUM(Importacao_Valor) AS Importacao_Valor,
+               SUM(Exportacao_Valor) AS Exportacao_Valor, COUNT(*) AS Instituicoes
+        FROM ranking
+        WHERE Data_Ref BETWEEN :ano || '-00' AND :ano || '-12'
+        GROUP BY Data_Ref
+        ORDER BY Data_Ref
+    """,
+    # Histórico mensal de uma instituição pela raiz do CNPJ (inteiro, ex.: 60701190), com todos os nomes usados.
+    'historico_instituicao': """
+        SELECT Data_Ref, Instituicao, Rank, Total_Geral_Valor, Importacao_Valor, Exportacao_Valor
+        FROM ranking
+        WHERE Cnpj_Raiz = :cnpj_raiz
+        ORDER BY Data_Ref
+    """,
+}
+
+def _trimestre(data_ref):
+    """'2018-05' -> '2018-T2'; meses fora de 1..12 (ex.: o arquivo único de 2014, '2014-00') ficam sem trimestre."""
+    ano, mes = data_ref.str[:4], pd.to_numeric(data_ref.str[5:7], errors='coerce')
+    return (ano + '-T' + ((mes + 2) // 3).astype('Int64').astype(str)).where(mes.between(1, 12))
+
+def _preparar_sqlite(con, df):
+    """
+    Cria (ou recria, se as colunas da base mudaram) a tabela `ranking`, seus índices e a
+    tabela de controle `meses_carregados` (Data_Ref, Impressao, Linhas).
+    """
+    colunas = {col: _TIPOS_SQLITE.get(df[col].dtype.kind, 'TEXT') for col in df.columns}
+    existentes = {linha[1]: linha[2] for linha in con.execute('PRAGMA table_info(ranking)')}
+    if existentes and existentes != colunas:
+        print('⚠️ Colunas da base mudaram: o SQLite será recriado.')
+        con.execute('DROP TABLE ranking')
+        con.execute('DROP TABLE IF EXISTS meses_carregados')
+
+    definicao = ', '.join(f'"{col}" {tipo}' for col, tipo in colunas.items())
+    con.execute(f'CREATE TABLE IF NOT EXISTS ranking ({definicao})')
+    con.execute('CREATE INDEX IF NOT EXISTS idx_ranking_data_ref ON ranking (Data_Ref)')
+    con.execute('CREATE INDEX IF NOT EXISTS idx_ranking_cnpj ON ranking (Cnpj_Raiz, Data_Ref)')
+    con.execute('CREATE INDEX IF NOT EXISTS idx_ranking_trimestre ON ranking (Trimestre, Instituicao)')
+    con.execute('CREATE TABLE IF NOT EXISTS meses_carregados (Data_Ref TEXT PRIMARY KEY, Impressao TEXT, Linhas INTEGER)')
+
+def _colunas_sqlite(df):
+    """Base mais as colunas derivadas gravadas no SQLite (Ano, Trimestre e Cnpj_Raiz)."""
+    return df.assign(
+        Ano=df['Data_Ref'].str[:4],
+        Trimestre=_trimestre(df['Data_Ref']),
+        Cnpj_Raiz=cnpj_raiz_para_inteiro(df['Codigo_Instituicao']),
+    )
+
+def _sincronizar_meses_sqlite(con, df, anteriores, resumo):
+    """Regrava os meses de `df` cuja impressão difere de `anteriores` (que perde os meses vistos)."""
+    registro_atual()['linhas'] = registro_atual().get('linhas', 0) + len(df)
+    # Colunas derivadas e hash de cada linha calculados uma vez; cada mês usa só as suas posições.
+    completo = _colunas_sqlite(df)
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    nomes = ', '.join(f'"{col}"' for col in completo.columns)
+    inserir = f'INSERT INTO ranking ({nomes}) VALUES ({", ".join("?" * len(completo.columns))})'
+
+    pendentes = []
+    for data_ref, posicoes in sorted(df.groupby('Data_Ref').indices.items()):
+        impressao = hashlib.sha256(hashes[posicoes].tobytes()).hexdigest()
+        if anteriores.pop(data_ref, None) == impressao:
+            resumo['inalterados'] += 1
+            continue
+        con.execute('DELETE FROM ranking WHERE Data_Ref = ?', (data_ref,))
+        con.execute('INSERT OR REPLACE INTO meses_carregados VALUES (?, ?, ?)', (data_ref, impressao, len(posicoes)))
+        pendentes.append(posicoes)
+        resumo['gravados'] += 1
+
+    # As linhas dos meses pendentes entram em lotes (conversão para objetos Python + executemany).
+    posicoes = np.concatenate(pendentes) if pendentes else np.array([], dtype='int64')
+    for inicio in range(0, len(posicoes), LINHAS_POR_LOTE_SQLITE):
+        linhas = completo.iloc[posicoes[inicio:inicio + LINHAS_POR_LOTE_SQLITE]].astype(object)
+        con.executemany(inserir, linhas.where(linhas.notna(), None).itertuples(index=False, name=None))
+
+@instrumentar()
+def atualizar_base_sqlite(caminho_db, df):
+    """
+    Sincroniza a base tratada com o SQLite de consulta (`caminho_db`), mês a mês.
+
+    Cada Data_Ref tem uma impressão (SHA-256 do hash das linhas) em `meses_carregados`:
+    só meses novos ou alterados são regravados (DELETE + INSERT), e meses que sumiram
+    da base são apagados, tudo em uma única transação. Além das colunas da base, a
+    tabela `ranking` guarda Ano, Trimestre ('AAAA-Tn') e Cnpj_Raiz (inteiro), com
+    índices em Data_Ref, Cnpj_Raiz e Trimestre.
+    `df` também pode ser um iterável de partes com meses disjuntos (ex.: um ano por vez,
+    iterar_base_parquet_por_ano), para o pico de memória ficar em uma parte.
+    Devolve {'gravados', 'inalterados', 'removidos'} (número de meses).
+    """
+    partes = iter([df] if isinstance(df, pd.DataFrame) else df)
+    resumo = {'gravados': 0, 'inalterados': 0, 'removidos': 0}
+
+    con = sqlite3.connect(caminho_db)
+    try:
+        with con:  # uma transação: commit no fim, rollback em caso de erro
+            anteriores = None
+            for parte in partes:
+                parte = parte.drop(columns='Ano', errors='ignore')
+                if anteriores is None:
+                    _preparar_sqlite(con, _colunas_sqlite(parte.head(0)))
+                    anteriores = dict(con.execute('SELECT Data_Ref, Impressao FROM meses_carregados'))
+                _sincronizar_meses_sqlite(con, parte, anteriores, resumo)
+            anteriores = anteriores or {}
+
+            for data_ref in anteriores:
+                con.execute('DELETE FROM ranking WHERE Data_Ref = ?', (data_ref,))
+                con.execute('DELETE FROM meses_carregados WHERE Data_Ref = ?', (data_ref,))
+                resumo['removidos'] += 1
+    except Exception as e:
+        print(f'❌ Erro ao atualizar o SQLite {caminho_db}: {e}')
+        return None
+    finally:
+        con.close()
+
+    print(f"✅ SQLite atualizado: {resumo['gravados']} meses gravados, {resumo['inalterados']} inalterados, "
+          f"{resumo['removidos']} removidos ({caminho_db}).")
+    return resumo
+
+def consultar_sql(caminho_db, sql, parametros=(), lote=None):
+    """
+    Executa uma consulta (somente leitura) no SQLite de atualizar_base_sqlite.
+
+    `sql` pode ser o nome de uma consulta de CONSULTAS_SQL. Filtros em Data_Ref,
+    Cnpj_Raiz e Trimestre usam os índices: só as linhas pedidas são lidas do disco.
+    Devolve um DataFrame ou, com `lote`, um iterador de DataFrames de até `lote`
+    linhas, para resultados que não cabem de uma vez na memória.
+    """
+    sql = CONSULTAS_SQL.get(sql, sql)
+    con = sqlite3.connect(pathlib.Path(os.path.abspath(caminho_db)).as_uri() + '?mode=ro', uri=True)
+    if lote is None:
+        try:
+            return pd.read_sql_query(sql, con, params=parametros)
+        finally:
+            con.close()
+
+    def lotes():
+        try:
+            yield from pd.read_sql_query(sql, con, params=parametros, chunksize=lote)
+        finally:
+            con.close()
+    return lotes()
+
+# =======================================================
+# CONSOLIDAÇÃO EM STREAMING (MEMÓRIA LIMITADA)
+# =======================================================
+
+LINHAS_POR_LOTE_STREAMING = 2_000  # linhas lidas por lote de tratamento e por row group Parquet
+
+class EscritorBaseStreaming:
+    """
+    Destino incremental da base tratada: CSV (mesmo formato de base_final_tratada_unica.csv)
+    e/ou Parquet particionado por ano (mesmo layout de salvar_base_parquet).
+
+    Cada lote recebido é gravado e descartado. No Parquet as linhas de um ano são
+    acumuladas até `linhas_por_lote` por row group, e a chegada de outro ano grava o
+    que estava pendente. Tudo é escrito ao lado ('.parcial') e só promovido em fechar().
+    """
+
+    def __init__(self, caminho_csv=None, pasta_parquet=None, linhas_por_lote=LINHAS_POR_LOTE_STREAMING):
+        if pasta_parquet and pa is None:
+            print('⚠️ pyarrow não instalado: saída Parquet ignorada (apenas o CSV foi gerado).')
+            pasta_parquet = None
+        self.caminho_csv = caminho_csv
+        self.pasta_parquet = pasta_parquet
+        self.linhas_por_lote = linhas_por_lote
+        self.linhas = 0
+        self._esquema = None
+        self._escritores = {}  # ano -> ParquetWriter
+        self._pendentes = {}   # ano -> [DataFrame]
+
+        self._csv = open(caminho_csv + '.parcial', 'w', encoding='utf-8-sig', newline='') if caminho_csv else None
+        if pasta_parquet:
+            self._pasta_tmp = pasta_parquet.rstrip(os.sep) + '.parcial'
+            shutil.rmtree(self._pasta_tmp, ignore_errors=True)
+
+    def escrever(self, df):
+        df = df.drop(columns='Ano', errors='ignore')
+        if self._csv is not None:
+            df.to_csv(self._csv, index=False, sep=';', header=self.linhas == 0)
+
+        if self.pasta_parquet:
+            for ano, df_ano in df.groupby(df['Data_Ref'].str[:4], sort=True):
+                for outro in [a for a in self._pendentes if a != ano]:
+                    self._gravar_parquet(outro)
+                self._pendentes.setdefault(ano, []).append(df_ano)
+                if sum(len(d) for d in self._pendentes[ano]) >= self.linhas_por_lote:
+                    self._gravar_parquet(ano)
+
+        self.linhas += len(df)
+
+    def _gravar_parquet(self, ano):
+        df_ano = pd.concat(self._pendentes.pop(ano), ignore_index=True)
+        if self._esquema is None:
+            # Esquema fixo desde o primeiro lote: um mês com a coluna toda vazia não vira tipo null.
+            self._esquema = pa.schema([
+                (c, pa.string() if df_ano[c].dtype == object else pa.from_numpy_dtype(df_ano[c].dtype))
+                for c in df_ano.columns
+            ])
+
+        escritor = self._escritores.get(ano)
+        if escritor is None:
+            pasta_ano = os.path.join(self._pasta_tmp, f'Ano={ano}')
+            os.makedirs(pasta_ano, exist_ok=True)
+            escritor = pq.ParquetWriter(os.path.join(pasta_ano, 'parte-0.parquet'), self._esquema, compression='zstd')
+            self._escritores[ano] = escritor
+        escritor.write_table(pa.Table.from_pandas(df_ano, schema=self._esquema, preserve_index=False))
+
+    def fechar(self):
+        """Grava o que falta e promove as saídas para os caminhos finais."""
+        for ano in list(self._pendentes):
+            self._gravar_parquet(ano)
+        for escritor in self._escritores.values():
+            escritor.close()
+        if self._csv is not None:
+            self._csv.close()
+            os.replace(self.caminho_csv + '.parcial', self.caminho_csv)
+        if self.pasta_parquet:
+            _promover_pasta(self._pasta_tmp, self.pasta_parquet)
+
+    def descartar(self):
+        """Fecha e apaga as saídas parciais; os arquivos finais anteriores ficam intactos."""
+        for escritor in self._escritores.values():
+            try:
+                escritor.close()
+            except Exception:
+                pass
+        if self._csv is not None:
+            self._csv.close()
+            if os.path.exists(self.caminho_csv + '.parcial'):
+                os.remove(self.caminho_csv + '.parcial')
+        if self.pasta_parquet:
+            shutil.rmtree(self._pasta_tmp, ignore_errors=True)
+
+@instrumentar()
+def consolidar_em_streaming(pasta_csv, caminho_csv=None, pasta_parquet=None, caminho_cache_encoding=None,
+                            linhas_por_lote=LINHAS_POR_LOTE_STREAMING):
+    """
+    Grava o mesmo que tratar_dados(unificar_bases(pasta_csv)) salvo em CSV/Parquet,
+    sem montar a base em memória: os arquivos são lidos em lotes de ~`linhas_por_lote`
+    linhas, tratados e entregues ao EscritorBaseStreaming, que grava e descarta. O pico
+    de memória fica limitado a um lote (ou ao maior mês), e não ao histórico inteiro.
+
+    O tratamento é linha a linha, então tratar lote a lote dá o mesmo resultado
+    (o CSV sai idêntico ao de df.to_csv da base inteira). Retorna {arquivos, linhas},
+    ou None se nada for gravado; nesse caso as saídas anteriores são preservadas.
+    """
+    arquivos = listar_arquivos_mensais(pasta_csv)
+    if not arquivos:
+        print(f'❌ Nenhum DataFrame CSV encontrado para unificar.')
+        return None
+
+    caminhos = [os.path.join(pasta_csv, f) for f in arquivos]
+    registro_atual().update(arquivos=len(caminhos), bytes=sum(tamanho_arquivo(c) for c in caminhos))
+    encodings = resolver_encodings(caminhos, caminho_cache_encoding)
+
+    print(f'Consolidação em streaming de {len(caminhos)} arquivos...')
+    escritor = EscritorBaseStreaming(caminho_csv, pasta_parquet, linhas_por_lote)
+    try:
+        # Arquivos lidos em lotes de ~linhas_por_lote: um tratar_dados por lote dilui o custo fixo por chamada.
+        lote, linhas_lote = [], 0
+        for i, (caminho, enc) in enumerate(zip(caminhos, encodings)):
+            df = ler_arquivo_ranking(caminho, enc)
+            if df is not None:
+                lote.append(df)
+                linhas_lote += len(df)
+            if lote and (linhas_lote >= linhas_por_lote or i == len(caminhos) - 1):
+                df_tratado = tratar_dados(pd.concat(lote, ignore_index=True), verboso=False)
+                if df_tratado is not None:
+                    escritor.escrever(df_tratado)
+                lote, linhas_lote = [], 0
+
+        if escritor.linhas == 0:
+            escritor.descartar()
+            print(f'❌ Nenhum DataFrame válido encontrado para unificar.')
+            return None
+        escritor.fechar()
+
+    except Exception as e:
+        escritor.descartar()
+        print(f'❌ Erro na consolidação em streaming: {e}')
+        return None
+
+    registro_atual()['linhas'] = escritor.linhas
+    print(f'✅ Base gravada em streaming: {len(caminhos)} arquivos, {escritor.linhas} linhas.')
+    return {'arquivos': len(caminhos), 'linhas': escritor.linhas}
+
+# =======================================================
+# CUBO DE AGREGADOS
+# =======================================================
+
+PASTA_CUBO = 'cubo_agregados'
+
+def _colunas_metricas(df):
+    return [col for col in df.columns if col.endswith('_Valor') or col.endswith('_Quant')]
+
+def _inicios_de_grupo(codigos_ordenados):
+    """Posições onde começa cada sequência de códigos iguais em um array ordenado."""
+    if len(codigos_ordenados) == 0:
+        return np.array([], dtype='int64')
+    return np.flatnonzero(np.r_[True, codigos_ordenados[1:] != codigos_ordenados[:-1]])
+
+def _reduzir_grupos(ufunc, matriz, inicios):
+    """Aplica `ufunc` por grupo ao longo das colunas de uma matriz (métricas x linhas)."""
+    if len(inicios) == 0:
+        return matriz[:, :0]
+    return ufunc.reduceat(matriz, inicios, axis=1)
+
+@instrumentar()
+def construir_cubo(df, dimensao=None):
+    """
+    Agrega a base tratada uma única vez, para analisar_dados e o dashboard.
+
+    Com a `dimensao` de separar_dimensao_instituicoes, `df` é o fato (Id_Instituicao)
+    e as tabelas usam o nome canônico de cada instituição, somando juntas as grafias
+    e os nomes antigos de um mesmo CNPJ; a dimensão vai junto no cubo
+    ('dimensao_instituicoes').
+
+    Devolve um dict de DataFrames pequenos:
+      - 'mes_instituicao': por Data_Ref x Instituicao (ordenado), a soma (nome original)
+        e a contagem de valores preenchidos (<col>_N) de cada coluna _Valor/_Quant, mais
+        o máximo (<col>_Max) das colunas _Quant;
+      - 'ano': por Ano, somas, contagens e o número de meses na base (Meses);
+      - 'instituicao': por Instituicao, somas, contagens e médias (<col>_Media).
+
+    Data_Ref e Instituicao viram códigos inteiros e as linhas são ordenadas uma única
+    vez pela chave mês x instituição; somas, contagens e máximos de todas as colunas
+    saem juntos por reduceat sobre a matriz de valores. 'ano' e 'instituicao' são
+    somados a partir desse resultado (reduceat e bincount), sem reler as linhas.
+    """
+    metricas = _colunas_metricas(df)
+    quant = [k for k, col in enumerate(metricas) if col.endswith('_Quant')]
+    registro_atual()['linhas'] = len(df)
+
+    codigos_mes, meses = pd.factorize(df['Data_Ref'], sort=True)
+    if dimensao is not None:
+        # Ids densos, já em ordem alfabética do nome canônico: dispensam o factorize do texto.
+        codigos_inst, instituicoes = df['Id_Instituicao'].to_numpy(dtype='int64'), dimensao['Instituicao']
+    else:
+        codigos_inst, instituicoes = pd.factorize(df['Instituicao'], sort=True)
+    # Na base compacta (compactar_base) os códigos já existem; as tabelas do cubo usam texto.
+    meses, instituicoes = data_ref_texto(meses), pd.Index(np.asarray(instituicoes, dtype=object))
+    # Uma linha por métrica (métricas x linhas): cada coluna da base fica contígua.
+    valores = np.vstack([df[col].to_numpy(dtype='float64', na_value=np.nan) for col in metricas]) if metricas else np.empty((0, len(df)))
+
+    # Linhas sem Data_Ref/Instituicao (código -1) ficam de fora, como no groupby.
+    validas = (codigos_mes >= 0) & (codigos_inst >= 0)
+    if not validas.all():
+        codigos_mes, codigos_inst, valores = codigos_mes[validas], codigos_inst[validas], valores[:, validas]
+
+    chave = codigos_mes.astype('int64') * len(instituicoes) + codigos_inst
+    ordem = np.argsort(chave, kind='stable')
+    chave, valores = chave[ordem], valores[:, ordem]
+    inicios = _inicios_de_grupo(chave)
+
+    # Mesma semântica do groupby: soma ignora NaN (grupo todo NaN soma 0), max ignora NaN.
+    preenchidos = ~np.isnan(valores)
+    somas = _reduzir_grupos(np.add, np.where(preenchidos, valores, 0.0), inicios)
+    contagens = _reduzir_grupos(np.add, preenchidos.astype('int64'), inicios)
+    maximos = _reduzir_grupos(np.fmax, valores[quant], inicios)
+
+    chaves = chave[inicios]
+    mes_de_cada, inst_de_cada = chaves // len(instituicoes), chaves % len(instituicoes)
+    anos_dos_meses = pd.Index(meses.str[:4])
+    codigos_ano, anos = pd.factorize(anos_dos_meses[mes_de_cada], sort=True)
+
+    nomes_n = [f'{col}_N' for col in metricas]
+    mes_inst = pd.concat([
+        pd.DataFrame({'Ano': anos[codigos_ano], 'Data_Ref': meses[mes_de_cada], 'Instituicao': instituicoes[inst_de_cada]}),
+        pd.DataFrame(somas.T, columns=metricas),
+        pd.DataFrame(contagens.T, columns=nomes_n),
+        pd.DataFrame(maximos.T, columns=[f'{metricas[k]}_Max' for k in quant]),
+    ], axis=1)
+
+    def tabela_somada(matriz_somas, matriz_contagens):
+        return pd.concat([pd.DataFrame(matriz_somas.T, columns=metricas),
+                          pd.DataFrame(matriz_contagens.T, columns=nomes_n)], axis=1)
+
+    # Os anos já vêm ordenados junto com os meses: basta reduceat nas fronteiras de ano.
+    limites_ano = _inicios_de_grupo(codigos_ano)
+    ano = tabela_somada(_reduzir_grupos(np.add, somas, limites_ano), _reduzir_grupos(np.add, contagens, limites_ano))
+    ano.insert(0, 'Meses', pd.Series(anos_dos_meses).value_counts().reindex(anos).to_numpy())
+    ano.insert(0, 'Ano', anos)
+
+    # Instituições se repetem ao longo dos meses: soma por código com bincount.
+    n_inst = len(instituicoes)
+    presentes = np.flatnonzero(np.bincount(inst_de_cada, minlength=n_inst))
+    somas_inst = np.array([np.bincount(inst_de_cada, weights=linha, minlength=n_inst) for linha in somas]).reshape(len(metricas), n_inst)
+    contagens_inst = np.array([np.bincount(inst_de_cada, weights=linha, minlength=n_inst) for linha in contagens]).reshape(len(metricas), n_inst)
+    instituicao = tabela_somada(somas_inst[:, presentes], contagens_inst[:, presentes].astype('int64'))
+    instituicao.insert(0, 'Instituicao', instituicoes[presentes])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        medias = instituicao[metricas].to_numpy() / instituicao[nomes_n].to_numpy()
+    instituicao = pd.concat([instituicao, pd.DataFrame(medias, columns=[f'{col}_Media' for col in metricas])], axis=1)
+
+    cubo = {'mes_instituicao': mes_inst, 'ano': ano, 'instituicao': instituicao}
+    if dimensao is not None:
+        cubo['dimensao_instituicoes'] = dimensao
+    return cubo
+
+def salvar_cubo(cubo, pasta_destino):
+    """Grava cada tabela do cubo em pasta_destino (Parquet com pyarrow; senão CSV)."""
+    try:
+        criar_pasta(pasta_destino)
+        for nome, tabela in cubo.items():
+            if pa is not None:
+                tabela.to_parquet(os.path.join(pasta_destino, f'{nome}.parquet'), index=False)
+            else:
+                tabela.to_csv(os.path.join(pasta_destino, f'{nome}.csv'), index=False, sep=';', encoding='utf-8-sig')
+        print(f'✅ Cubo de agregados salvo em: {pasta_destino}')
+        return True
+    except Exception as e:
+        print(f'❌ Erro ao salvar o cubo de agregados: {e}')
+        return False
+
+def carregar_cubo(pasta):
+    """Lê o cubo gravado por salvar_cubo. Retorna None se alguma tabela estiver faltando."""
+    cubo = {}
+    for nome in ('mes_instituicao', 'ano', 'instituicao', 'dimensao_instituicoes'):
+        caminho_parquet = os.path.join(pasta, f'{nome}.parquet')
+        caminho_csv = os.path.join(pasta, f'{nome}.csv')
+        if pa is not None and os.path.exists(caminho_parquet):
+            cubo[nome] = pd.read_parquet(caminho_parquet)
+        elif os.path.exists(caminho_csv):
+            cubo[nome] = pd.read_csv(caminho_csv, sep=';', encoding='utf-8-sig',
+                                     dtype={'Ano': str, 'Data_Ref': str, 'Primeiro_Mes': str, 'Ultimo_Mes': str})
+        elif nome != 'dimensao_instituicoes':  # a dimensão é opcional (cubos antigos)
+            return None
+    return cubo
+
+def obter_cubo(origem):
+    """
+    Aceita o cubo pronto, a base tratada (DataFrame) ou a pasta de dados.
+
+    Na pasta, usa o cubo gravado (PASTA_CUBO) e, se ele não existir, agrega a base final.
+    """
+    if isinstance(origem, dict):
+        return origem
+    if isinstance(origem, str):
+        cubo = carregar_cubo(os.path.join(origem, PASTA_CUBO))
+        if cubo is not None:
+            return cubo
+        origem = carregar_base_final(origem, colunas=COLUNAS_ANALISE)
+    if origem is None or origem.empty:
+        return None
+    return construir_cubo(*separar_dimensao_instituicoes(compactar_base(origem, relatorio=False)))
+
+def assinatura_dados(pasta):
+    """
+    Assinatura barata dos dados que obter_cubo(pasta) leria: nome, tamanho e mtime de
+    cada arquivo do cubo, da base Parquet e do CSV final. Muda sempre que o main.py
+    regrava alguma saída, sem ler o conteúdo (serve de chave para caches do dashboard).
+    """
+    partes = []
+    for alvo in (PASTA_CUBO, PASTA_PARQUET, ARQUIVO_CSV_FINAL):
+        caminho = os.path.join(pasta, alvo)
+        if os.path.isdir(caminho):
+            arquivos = sorted(os.path.join(raiz, nome) for raiz, _, nomes in os.walk(caminho) for nome in nomes)
+        else:
+            arquivos = [caminho] if os.path.exists(caminho) else []
+        for arquivo in arquivos:
+            estado = os.stat(arquivo)
+            partes.append(f'{os.path.relpath(arquivo, pasta)}:{estado.st_size}:{estado.st_mtime_ns}')
+    return hashlib.sha256('\n'.join(partes).encode('utf-8')).hexdigest()
+
+def filtrar_cubo(cubo, anos=None, instituicoes=None):
+    """
+    Restringe o cubo a um intervalo de anos (ano_inicial, ano_final) e/ou a uma lista de
+    instituições, devolvendo um cubo no mesmo formato (responder_perguntas funciona igual).
+
+    O intervalo de anos é uma fatia contígua de 'mes_instituicao' (ordenado por Data_Ref,
+    como em _fatia_ano); 'ano' e 'instituicao' são somados de novo só sobre as linhas
+    que sobraram. Meses continua sendo o número de meses do ano na base completa, para
+    que o "último ano completo" não mude por causa do filtro de instituições.
+    """
+    if anos is None and not instituicoes:
+        return cubo
+
+    mes_inst = cubo['mes_instituicao']
+    if anos is not None:
+        datas = mes_inst['Data_Ref']
+        inicio, fim = datas.searchsorted(f'{anos[0]}-'), datas.searchsorted(f'{anos[1]}-~')
+        mes_inst = mes_inst.iloc[inicio:fim]
+    if instituicoes:
+        mes_inst = mes_inst[mes_inst['Instituicao'].isin(instituicoes)]
+    mes_inst = mes_inst.reset_index(drop=True)
+
+    metricas = _colunas_metricas(cubo['ano'])
+    nomes_n = [f'{col}_N' for col in metricas]
+    somadas = metricas + nomes_n
+
+    ano = mes_inst.groupby('Ano', sort=True)[somadas].sum().reset_index()
+    ano.insert(1, 'Meses', cubo['ano'].set_index('Ano')['Meses'].reindex(ano['Ano']).to_numpy())
+
+    instituicao = mes_inst.groupby('Instituicao', sort=True)[somadas].sum().reset_index()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        medias = instituicao[metricas].to_numpy() / instituicao[nomes_n].to_numpy()
+    instituicao = pd.concat([instituicao, pd.DataFrame(medias, columns=[f'{col}_Media' for col in metricas])], axis=1)
+
+    return dict(cubo, mes_instituicao=mes_inst, ano=ano, instituicao=instituicao)
+
+def formatar_moeda_br(valores, prefixo='US$ ', casas=2):
+    """
+    Formata números no padrão brasileiro ('US$ 1.234,56').
+
+    Aceita um número, uma Series ou um DataFrame; NaN vira None. O milhar sai do format
+    como '_' (format(x, '_.2f')), então bastam dois replace por valor, sem apply.
+    Deve ser aplicada só às linhas exibidas, depois do nlargest/head.
+    """
+    if isinstance(valores, pd.DataFrame):
+        return valores.apply(formatar_moeda_br, prefixo=prefixo, casas=casas)
+    especificacao = f'_.{casas}f'
+    if isinstance(valores, pd.Series):
+        numeros = valores.to_numpy(dtype='float64', na_value=np.nan).tolist()
+        texto = [None if x != x else prefixo + format(x, especificacao).replace('.', ',').replace('_', '.')
+                 for x in numeros]  # x != x: NaN
+        return pd.Series(texto, index=valores.index, name=valores.name, dtype=object)
+    if pd.isna(valores):
+        return None
+    return prefixo + format(valores, especificacao).replace('.', ',').replace('_', '.')
+
+@dataclass
+class ResultadoAnalise:
+    """Respostas às 9 perguntas do case, em valores numéricos (a formatação fica para quem exibe)."""
+    valor_por_ano: pd.Series                 # 1. Total_Geral_Valor por Ano
+    top_5_instituicoes: pd.Series            # 2. Total_Geral_Valor no período, 5 maiores
+    importacao_exportacao_por_ano: pd.DataFrame  # 3.
+    ano_exportacao: str                      # 4. último ano completo
+    maior_exportacao: pd.Series              # 4. instituição (índice) e valor, vazia se o ano não existe
+    maior_importacao_2018: pd.Series         # 5.
+    transferencias_por_ano: pd.DataFrame     # 6.
+    maior_quant_exportacao_2020: dict        # 7. Data_Ref, Instituicao, Exportacao_Quant (ou None)
+    media_por_instituicao: pd.Series         # 8. ordenada do maior para o menor
+    total_mercado_primario: float            # 9.
+
+def _fatia_ano(mes_inst, ano):
+    # mes_instituicao é ordenado por Data_Ref: as linhas de um ano são contíguas.
+    datas = mes_inst['Data_Ref']
+    inicio, fim = datas.searchsorted(f'{ano}-'), datas.searchsorted(f'{ano}-~')
+    return mes_inst.iloc[inicio:fim]
+
+def responder_perguntas(cubo):
+    """Responde às 9 perguntas do case a partir do cubo, devolvendo um ResultadoAnalise."""
+    mes_inst, ano, instituicao = cubo['mes_instituicao'], cubo['ano'], cubo['instituicao']
+    por_ano = ano.set_index('Ano')
+    por_inst = instituicao.set_index('Instituicao')
+
+    # 4. Último ano completo: se o ano mais recente não tem 12 meses, usa o anterior.
+    ultimo_ano_base = por_ano.index.max()
+    ano_exportacao = str(int(ultimo_ano_base) - 1) if por_ano.loc[ultimo_ano_base, 'Meses'] < 12 else ultimo_ano_base
+
+    def maior_no_ano(ano_alvo, coluna):
+        return _fatia_ano(mes_inst, ano_alvo).groupby('Instituicao')[coluna].sum().nlargest(1)
+
+    mes_2020 = _fatia_ano(mes_inst, '2020')
+    maior_quant_2020 = None
+    if not mes_2020.empty:
+        linha = mes_2020.loc[mes_2020['Exportacao_Quant_Max'].idxmax()]
+        maior_quant_2020 = {'Data_Ref': linha['Data_Ref'], 'Instituicao': linha['Instituicao'],
+                            'Exportacao_Quant': linha['Exportacao_Quant_Max']}
+
+    return ResultadoAnalise(
+        valor_por_ano=por_ano['Total_Geral_Valor'],
+        top_5_instituicoes=por_inst['Total_Geral_Valor'].nlargest(5),
+        importacao_exportacao_por_ano=por_ano[['Importacao_Valor', 'Exportacao_Valor']],
+        ano_exportacao=ano_exportacao,
+        maior_exportacao=maior_no_ano(ano_exportacao, 'Exportacao_Valor'),
+        maior_importacao_2018=maior_no_ano('2018', 'Importacao_Valor'),
+        transferencias_por_ano=por_ano[['Transf_Exterior_Valor', 'Transf_pExterior_Valor']],
+        maior_quant_exportacao_2020=maior_quant_2020,
+        media_por_instituicao=por_inst['Total_Geral_Valor_Media'].sort_values(ascending=False).rename('Total_Geral_Valor'),
+        total_mercado_primario=por_ano['Mercado_Primario_Valor'].sum(),
+    )
+
+# =======================================================
+# ÍNDICE TEMPORAL (SOMAS ACUMULADAS INSTITUIÇÃO x MÊS)
+# =======================================================
+
+class IndiceTemporal:
+    """
+    Matriz densa instituição x mês de cada métrica _Valor/_Quant (e da contagem <col>_N),
+    acumulada ao longo dos meses, para consultas de período arbitrário.
+
+    Com uma coluna de zeros antes do primeiro mês, o total de cada instituição entre os
+    meses i e j é acumulado[:, j] - acumulado[:, i]: totais, médias e top-N de qualquer
+    intervalo saem de uma subtração de colunas, sem varrer linhas. `origem` é o que
+    obter_cubo aceita (cubo, base tratada ou pasta de dados).
+    """
+
+    def __init__(self, origem):
+        mes_inst = obter_cubo(origem)['mes_instituicao']
+        self.metricas = _colunas_metricas(mes_inst)
+        codigos_mes, self.meses = pd.factorize(mes_inst['Data_Ref'], sort=True)
+        codigos_inst, self.instituicoes = pd.factorize(mes_inst['Instituicao'], sort=True)
+        self.meses, self.instituicoes = pd.Index(self.meses), pd.Index(self.instituicoes)
+
+        # Camadas: métricas, contagens (<col>_N) e a presença da instituição no mês (linha no cubo).
+        colunas = self.metricas + [f'{col}_N' for col in self.metricas]
+        self._camada = {col: k for k, col in enumerate(colunas)}
+        densa = np.zeros((len(colunas) + 1, len(self.instituicoes), len(self.meses) + 1))
+        # np.add.at acumula pares (Instituicao, Data_Ref) repetidos em vez de manter só o último.
+        np.add.at(densa, (slice(0, -1), codigos_inst, codigos_mes + 1), mes_inst[colunas].to_numpy(dtype='float64').T)
+        densa[-1, codigos_inst, codigos_mes + 1] = 1
+        self._acumulado = np.cumsum(densa, axis=2)
+
+    def _intervalo(self, inicio=None, fim=None):
+        """Colunas (i, j) do acumulado para Data_Ref de `inicio` a `fim` (inclusive; 'AAAA' ou 'AAAA-MM')."""
+        i = 0 if inicio is None else int(self.meses.searchsorted(str(inicio)))
+        j = len(self.meses) if fim is None else int(self.meses.searchsorted(f'{fim}~'))
+        return i, max(i, j)
+
+    def _periodo(self, camada, inicio, fim, instituicoes):
+        i, j = self._intervalo(inicio, fim)
+        somas = self._acumulado[camada][:, j] - self._acumulado[camada][:, i]
+        presentes = self._acumulado[-1][:, j] > self._acumulado[-1][:, i]
+        if instituicoes is not None:
+            escolhidas = np.zeros(len(presentes), dtype=bool)
+            posicoes = self.instituicoes.get_indexer(list(instituicoes))
+            escolhidas[posicoes[posicoes >= 0]] = True
+            presentes &= escolhidas
+        return pd.Series(somas[presentes], index=self.instituicoes[presentes])
+
+    def totais(self, coluna, inicio=None, fim=None, instituicoes=None):
+        """Soma de `coluna` por instituição no período (só instituições presentes nele)."""
+        return self._periodo(self._camada[coluna], inicio, fim, instituicoes).rename(coluna)
+
+    def medias(self, coluna, inicio=None, fim=None, instituicoes=None):
+        """Média de `coluna` por instituição no período (soma / valores preenchidos, como no cubo)."""
+        contagens = self._periodo(self._camada[f'{coluna}_N'], inicio, fim, instituicoes)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (self.totais(coluna, inicio, fim, instituicoes) / contagens.where(contagens > 0)).rename(coluna)
+
+    def top(self, coluna, inicio=None, fim=None, n=5, instituicoes=None):
+        """As `n` instituições com maior soma de `coluna` no período."""
+        return self.totais(coluna, inicio, fim, instituicoes).nlargest(n)
+
+    def total(self, coluna, inicio=None, fim=None, instituicoes=None):
+        """Soma de `coluna` de todas as instituições (ou das escolhidas) no período."""
+        return float(self.totais(coluna, inicio, fim, instituicoes).sum())
+
+    def comparar_periodos(self, coluna, periodo_a, periodo_b, instituicoes=None):
+        """
+        Totais de `coluna` por instituição em dois períodos (inicio, fim), lado a lado, com a
+        variação absoluta e percentual; ordenado pelo segundo período.
+        """
+        comparacao = pd.concat([self.totais(coluna, *periodo_a, instituicoes=instituicoes).rename('Periodo_A'),
+                                self.totais(coluna, *periodo_b, instituicoes=instituicoes).rename('Periodo_B')],
+                               axis=1).fillna(0.0)
+        comparacao['Variacao'] = comparacao['Periodo_B'] - comparacao['Periodo_A']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            comparacao['Variacao_%'] = (comparacao['Variacao'] / comparacao['Periodo_A'].where(comparacao['Periodo_A'] != 0)) * 100
+        comparacao.index.name = 'Instituicao'
+        return comparacao.sort_values('Periodo_B', ascending=False)
+
 # =======================================================
 # FASE DE ANÁLISE DE DADOS (9 PERGUNTAS)
 # =======================================================
 
+@instrumentar()
 def analisar_dados(df):
-    """Realiza a análise dos dados e responde às 9 perguntas do case."""
-    
-    if df is None or df.empty:
+    """
+    Realiza a análise dos dados e responde às 9 perguntas do case.
+
+    `df` pode ser a base tratada, o cubo de construir_cubo ou a pasta de dados (nesse
+    caso usa o cubo gravado, ou agrega só as COLUNAS_ANALISE da base final). As
+    respostas vêm de responder_perguntas e só as linhas exibidas são formatadas.
+    Devolve o ResultadoAnalise (ou None se não houver dados).
+    """
+    cubo = obter_cubo(df)
+    if cubo is None:
         print("\n🛑 ERRO: DataFrame vazio ou nulo para a fase de análise.")
-        return
+        return None
+
+    resultado = responder_perguntas(cubo)
+    registro_atual()['linhas'] = len(cubo['mes_instituicao'])
 
     print("\n" + "="*70)
     print("INICIANDO FASE DE ANÁLISE: RANKING DE CÂMBIO")
@@ -355,85 +2834,215 @@ def analisar_dados(df):
     
     # 1. Qual é o valor total de operações de câmbio (Total_Geral_Valor) por ano?
     print("\n1. Valor total de operações de câmbio por ano:")
-    df['Ano'] = df['Data_Ref'].str[:4]
-    valor_por_ano = df.groupby('Ano')['Total_Geral_Valor'].sum().apply(lambda x: f"US$ {x:,.2f}").str.replace(',', '_').str.replace('.', ',').str.replace('_', '.')
-    print(valor_por_ano)
+    print(formatar_moeda_br(resultado.valor_por_ano))
     print("-" * 50)
     
     # 2. Qual o ranking das 5 instituições financeiras com maior valor total de operações em todo o período?
     print("\n2. Top 5 instituições com maior valor total de operações (Período Completo):")
-    top_5_inst = df.groupby('Instituicao')['Total_Geral_Valor'].sum().nlargest(5).apply(lambda x: f"US$ {x:,.2f}").str.replace(',', '_').str.replace('.', ',').str.replace('_', '.')
-    print(top_5_inst)
+    print(formatar_moeda_br(resultado.top_5_instituicoes))
     print("-" * 50)
     
     # 3. Qual o valor total de Importação e Exportação (Valor) ao longo dos anos?
     print("\n3. Valor total de Importação e Exportação (Valor) por ano:")
-    df_impexp = df.groupby('Ano')[['Importacao_Valor', 'Exportacao_Valor']].sum()
-    df_impexp['Importacao_Valor'] = df_impexp['Importacao_Valor'].apply(lambda x: f"US$ {x:,.2f}").str.replace(',', '_').str.replace('.', ',').str.replace('_', '.')
-    df_impexp['Exportacao_Valor'] = df_impexp['Exportacao_Valor'].apply(lambda x: f"US$ {x:,.2f}").str.replace(',', '_').str.replace('.', ',').str.replace('_', '.')
-    print(df_impexp)
+    print(formatar_moeda_br(resultado.importacao_exportacao_por_ano))
     print("-" * 50)
     
     # 4. Qual a Instituição com maior valor de Exportação no último ano completo?
     # O último ano completo é o penúltimo ano, caso o ano atual não esteja finalizado.
-    ultimo_ano_base = df['Ano'].max()
-    # Verifica se há meses completos no ano atual; se não houver 12 meses, usa o ano anterior
-    if df[df['Ano'] == ultimo_ano_base]['Data_Ref'].nunique() < 12:
-         penultimo_ano = str(int(ultimo_ano_base) - 1)
-    else:
-         penultimo_ano = ultimo_ano_base # Se o ano atual estiver completo (12 meses)
-    
-    df_penultimo = df[df['Ano'] == penultimo_ano]
-    if not df_penultimo.empty:
-        top_exp_penultimo = df_penultimo.groupby('Instituicao')['Exportacao_Valor'].sum().nlargest(1)
-        valor_formatado = f"US$ {top_exp_penultimo.iloc[0]:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.')
+    penultimo_ano = resultado.ano_exportacao
+    top_exp_penultimo = resultado.maior_exportacao
+    if not top_exp_penultimo.empty:
         print(f"\n4. Instituição com maior Exportação em {penultimo_ano}:")
-        print(f"{top_exp_penultimo.index[0]} | Valor: {valor_formatado}")
+        print(f"{top_exp_penultimo.index[0]} | Valor: {formatar_moeda_br(top_exp_penultimo.iloc[0])}")
     else:
         print(f"\n4. Não foi possível encontrar dados para o ano {penultimo_ano}.")
     print("-" * 50)
     
     # 5. Qual a Instituição com maior valor de Importação no ano de 2018?
     print("\n5. Instituição com maior Importação em 2018:")
-    df_2018 = df[df['Ano'] == '2018']
-    if not df_2018.empty:
-        top_imp_2018 = df_2018.groupby('Instituicao')['Importacao_Valor'].sum().nlargest(1)
-        valor_formatado = f"US$ {top_imp_2018.iloc[0]:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.')
-        print(f"{top_imp_2018.index[0]} | Valor: {valor_formatado}")
+    top_imp_2018 = resultado.maior_importacao_2018
+    if not top_imp_2018.empty:
+        print(f"{top_imp_2018.index[0]} | Valor: {formatar_moeda_br(top_imp_2018.iloc[0])}")
     else:
         print("\n5. Não há dados para 2018.")
     print("-" * 50)
     
     # 6. Qual o valor total de Transferências do Exterior e Transferências para o Exterior por ano?
     print("\n6. Valor total de Transferências (Entrada/Saída) por ano:")
-    df_transf = df.groupby('Ano')[['Transf_Exterior_Valor', 'Transf_pExterior_Valor']].sum()
-    df_transf['Transf_Exterior_Valor'] = df_transf['Transf_Exterior_Valor'].apply(lambda x: f"US$ {x:,.2f}").str.replace(',', '_').str.replace('.', ',').str.replace('_', '.')
-    df_transf['Transf_pExterior_Valor'] = df_transf['Transf_pExterior_Valor'].apply(lambda x: f"US$ {x:,.2f}").str.replace(',', '_').str.replace('.', ',').str.replace('_', '.')
-    print(df_transf)
+    print(formatar_moeda_br(resultado.transferencias_por_ano))
     print("-" * 50)
     
     # 7. Qual o maior volume de Transações (Quantidade) de Exportação em 2020 (mês/instituição)?
     print("\n7. Maior volume (Quantidade) de Exportação em 2020 (Mês/Instituição):")
-    df_2020 = df[df['Ano'] == '2020']
-    if not df_2020.empty:
-        idx_max = df_2020['Exportacao_Quant'].idxmax()
-        resultado = df_2020.loc[idx_max, ['Data_Ref', 'Instituicao', 'Exportacao_Quant']]
-        quant_formatada = f"{resultado['Exportacao_Quant']:,.0f}".replace(',', '_').replace('.', ',').replace('_', '.')
-        print(f"Mês/Ano: {resultado['Data_Ref']} | Instituição: {resultado['Instituicao']} | Quantidade: {quant_formatada}")
+    maior_quant = resultado.maior_quant_exportacao_2020
+    if maior_quant is not None:
+        quant_formatada = formatar_moeda_br(maior_quant['Exportacao_Quant'], prefixo='', casas=0)
+        print(f"Mês/Ano: {maior_quant['Data_Ref']} | Instituição: {maior_quant['Instituicao']} | Quantidade: {quant_formatada}")
     else:
         print("\n7. Não há dados para 2020.")
     print("-" * 50)
     
     # 8. Qual a média de valor de operações de câmbio por instituição ao longo de todo o período?
     print("\n8. Média de valor de operações de câmbio por instituição (Período Completo):")
-    media_por_inst = df.groupby('Instituicao')['Total_Geral_Valor'].mean().sort_values(ascending=False).apply(lambda x: f"US$ {x:,.2f}").str.replace(',', '_').str.replace('.', ',').str.replace('_', '.')
-    print(media_por_inst.head(5))
+    print(formatar_moeda_br(resultado.media_por_instituicao.head(5)))
     print("[... Exibindo apenas as 5 maiores médias ...]")
     print("-" * 50)
 
     # 9. Qual o total de operações (Valor) do Mercado Primário de Câmbio em todo o período?
     print("\n9. Valor Total de Operações do Mercado Primário de Câmbio (Período Completo):")
-    total_primario = df['Mercado_Primario_Valor'].sum()
-    valor_formatado = f"US$ {total_primario:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.')
-    print(f"Valor Total: {valor_formatado}")
-    print("="*70)
\ No newline at end of file
+    print(f"Valor Total: {formatar_moeda_br(resultado.total_mercado_primario)}")
+    print("="*70)
+
+    return resultado
+
+# =======================================================
+# CAMINHO ANUAL (ACUMULADOS DO ANO PUBLICADOS PELO BACEN)
+# =======================================================
+
+# Diferença relativa aceita entre o acumulado e a soma dos meses: o BACEN revisa meses já publicados e o
+# acumulado traz os números revisados (na base real, até ~4% nos _Valor); um mês faltando passa de ~8%.
+TOLERANCIA_ACUMULADOS = 0.05
+
+_MESES_ABREVIADOS = {'jan': 1, 'fev': 2, 'mar': 3, 'abr': 4, 'mai': 5, 'jun': 6,
+                     'jul': 7, 'ago': 8, 'set': 9, 'out': 10, 'nov': 11, 'dez': 12}
+_REGEX_PERIODO_ACUMULADO = re.compile(r'acumulado\s+([a-z]+)\s*-\s*([a-z]+)\s*/\s*(\d{4})')
+
+@dataclass
+class ResultadoAnual:
+    """Perguntas por ano (1, 3 e 6) respondidas só com os acumulados do BACEN."""
+    valor_por_ano: pd.Series                     # 1.
+    importacao_exportacao_por_ano: pd.DataFrame  # 3.
+    transferencias_por_ano: pd.DataFrame         # 6.
+    meses_por_ano: pd.Series                     # meses cobertos pelo acumulado de cada ano
+
+def listar_acumulados_anuais(pasta_csv):
+    """
+    {ano: arquivo} com o acumulado mais recente de cada ano (ranking_AAAA-MM_acumulado.csv,
+    extraído ou dentro de um ZIP armazenado; o extraído tem prioridade).
+    """
+    arquivos = [f for f in os.listdir(pasta_csv) if PADRAO_ARQUIVO_ACUMULADO.match(f)]
+    extraidos = set(arquivos)
+    for nome_zip in sorted(f for f in os.listdir(pasta_csv) if PADRAO_ZIP_ARMAZENADO.match(f)):
+        arquivos += [m for m in membros_mensais_do_zip(pasta_csv, nome_zip, PADRAO_ARQUIVO_ACUMULADO)
+                     if os.path.basename(m) not in extraidos]
+
+    ultimos = {}
+    for arquivo in sorted(arquivos, key=os.path.basename):
+        ultimos[PADRAO_ARQUIVO_ACUMULADO.match(os.path.basename(arquivo)).group(1)] = arquivo
+    return ultimos
+
+def meses_do_acumulado(caminho):
+    """
+    Último mês coberto por um acumulado, lido do preâmbulo ('Acumulado Jan-Dez/2020',
+    'acumulado janeiro-setembro/2025') e, na falta dele, do mês no nome do arquivo.
+    """
+    preambulo = ler_bytes(caminho, 2048).decode('latin-1')
+    texto = unicodedata.normalize('NFKD', preambulo).encode('ascii', 'ignore').decode('ascii').lower()
+    match = _REGEX_PERIODO_ACUMULADO.search(texto)
+    if match and match.group(2)[:3] in _MESES_ABREVIADOS:
+        return _MESES_ABREVIADOS[match.group(2)[:3]]
+    mes = int(PADRAO_ARQUIVO_ACUMULADO.match(os.path.basename(caminho)).group(2))
+    return mes or None
+
+@instrumentar()
+def ler_acumulados_anuais(pasta_csv, caminho_cache_encoding=None):
+    """
+    Caminho anual: lê só o acumulado mais recente de cada ano (um arquivo por ano, em vez
+    de doze mensais) e devolve (base tratada, {ano: meses cobertos}). As linhas ficam
+    com o Data_Ref do nome do arquivo. `caminho_cache_encoding` é o mesmo cache da unificação.
+    """
+    ultimos = listar_acumulados_anuais(pasta_csv)
+    if not ultimos:
+        print('❌ Nenhum arquivo acumulado encontrado.')
+        return None, {}
+
+    caminhos = [os.path.join(pasta_csv, ultimos[ano]) for ano in sorted(ultimos)]
+    registro_atual().update(arquivos=len(caminhos), bytes=sum(tamanho_arquivo(c) for c in caminhos))
+    meses = {ano: meses_do_acumulado(caminho) for ano, caminho in zip(sorted(ultimos), caminhos)}
+    encodings = resolver_encodings(caminhos, caminho_cache_encoding)
+    lidos = [df for df in ler_arquivos_ranking(caminhos, encodings) if df is not None]
+    if not lidos:
+        return None, meses
+    return tratar_dados(pd.concat(lidos, ignore_index=True), verboso=False), meses
+
+def tabela_anual_acumulada(df, meses):
+    """Tabela por Ano no formato de cubo['ano'] (Ano, Meses, somas) a partir dos acumulados tratados."""
+    metricas = _colunas_metricas(df)
+    tabela = df.groupby(df['Data_Ref'].str[:4].rename('Ano'), sort=True)[metricas].sum().reset_index()
+    tabela.insert(1, 'Meses', tabela['Ano'].map(meses).astype('Int64'))
+    return tabela
+
+def responder_perguntas_anuais(tabela):
+    """Perguntas 1, 3 e 6 a partir da tabela anual (dos acumulados ou o cubo['ano'])."""
+    por_ano = tabela.set_index('Ano')
+    return ResultadoAnual(
+        valor_por_ano=por_ano['Total_Geral_Valor'],
+        importacao_exportacao_por_ano=por_ano[['Importacao_Valor', 'Exportacao_Valor']],
+        transferencias_por_ano=por_ano[['Transf_Exterior_Valor', 'Transf_pExterior_Valor']],
+        meses_por_ano=por_ano['Meses'],
+    )
+
+def conferir_acumulados(tabela, cubo, tolerancia=TOLERANCIA_ACUMULADOS):
+    """
+    Compara, ano a ano, as somas _Valor dos acumulados com as somas dos meses da base (cubo['ano']).
+
+    Devolve um DataFrame por Ano com os meses de cada lado, a maior diferença relativa (%)
+    entre as métricas, a métrica em que ela ocorre e a Situacao: 'confere', 'diverge'
+    (acima de `tolerancia`) ou 'meses diferentes' (a base não tem todos os meses do acumulado).
+    """
+    acumulado, base = tabela.set_index('Ano'), cubo['ano'].set_index('Ano')
+    anos = acumulado.index.intersection(base.index)
+    metricas = [col for col in acumulado.columns if col.endswith('_Valor') and col in base.columns]
+    a, b = acumulado.loc[anos, metricas], base.loc[anos, metricas]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        diferencas = ((a - b).abs() / np.maximum(a.abs(), b.abs())).fillna(0.0)
+    conferencia = pd.DataFrame({
+        'Meses_Acumulado': acumulado.loc[anos, 'Meses'],
+        'Meses_Base': base.loc[anos, 'Meses'],
+        'Maior_Diferenca_%': diferencas.max(axis=1) * 100,
+        'Metrica': diferencas.idxmax(axis=1),
+    })
+    meses_diferentes = conferencia['Meses_Acumulado'].ne(conferencia['Meses_Base']).fillna(True).to_numpy(dtype=bool)
+    conferencia['Situacao'] = np.where(
+        meses_diferentes, 'meses diferentes',
+        np.where(diferencas.max(axis=1) <= tolerancia, 'confere', 'diverge'))
+    return conferencia
+
+@instrumentar()
+def analisar_acumulados(pasta_csv, cubo=None, tolerancia=TOLERANCIA_ACUMULADOS, caminho_cache_encoding=None):
+    """
+    Caminho anual rápido: responde às perguntas por ano (1, 3 e 6) lendo só o acumulado
+    mais recente de cada ano e, com o `cubo` da base mensal, confere as somas ano a ano
+    (conferir_acumulados). Devolve (ResultadoAnual, conferência ou None).
+    """
+    df, meses = ler_acumulados_anuais(pasta_csv, caminho_cache_encoding)
+    if df is None:
+        return None, None
+
+    tabela = tabela_anual_acumulada(df, meses)
+    resultado = responder_perguntas_anuais(tabela)
+
+    print("\n" + "="*70)
+    print(f"CAMINHO ANUAL: ACUMULADOS DO BACEN ({len(tabela)} arquivos)")
+    print("="*70)
+    print("\n1. Valor total de operações de câmbio por ano (acumulados):")
+    print(formatar_moeda_br(resultado.valor_por_ano))
+    print("\n3. Valor total de Importação e Exportação (Valor) por ano (acumulados):")
+    print(formatar_moeda_br(resultado.importacao_exportacao_por_ano))
+    print("\n6. Valor total de Transferências (Entrada/Saída) por ano (acumulados):")
+    print(formatar_moeda_br(resultado.transferencias_por_ano))
+
+    conferencia = None
+    if cubo is not None:
+        conferencia = conferir_acumulados(tabela, cubo, tolerancia)
+        print("\nConferência com a base mensal (acumulado x soma dos meses):")
+        print(conferencia.to_string(float_format=lambda x: f'{x:.3f}'))
+        divergentes = conferencia.index[conferencia['Situacao'] != 'confere'].tolist()
+        if divergentes:
+            print(f"⚠️ Anos que não conferem: {', '.join(divergentes)}")
+        else:
+            print("✅ Todos os anos conferem com a base mensal.")
+    print("="*70)
+
+    return resultado, conferencia